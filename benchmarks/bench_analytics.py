@@ -0,0 +1,68 @@
+"""
+Benchmark das análises de portifólio vetorizadas (project/analytics)
+
+Mede o tempo de cada métrica para portifólios de 10 até 1.000 tickets com 10
+anos de fechamentos diários (2.520 pregões).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_analytics --symbols 10 100 1000 --years 10
+"""
+import argparse
+import json
+import time
+import numpy as np
+from project.analytics import (TRADING_DAYS_PER_YEAR, correlation_matrix, covariance_matrix,
+                               daily_returns, drawdowns, holdings_from_lots, portfolio_returns,
+                               position_weights, volatility)
+
+
+def timed(function, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def run(n_symbols, n_days, lots_per_symbol, rng):
+    symbols = np.array([f'S{i:04d}' for i in range(n_symbols)])
+    lot_symbols = np.repeat(symbols, lots_per_symbol)
+    lot_shares = rng.integers(1, 1000, size=lot_symbols.size)
+    lot_prices = rng.integers(100, 50000, size=lot_symbols.size)
+    closes = 100 * np.cumprod(1 + rng.normal(0.0003, 0.02, size=(n_days, n_symbols)), axis=0)
+
+    timings = {}
+    holdings, timings['holdings_from_lots'] = timed(holdings_from_lots, lot_symbols, lot_shares, lot_prices)
+    weights, timings['position_weights'] = timed(position_weights, holdings.shares, closes[-1])
+    returns, timings['daily_returns'] = timed(daily_returns, closes)
+    _, timings['volatility'] = timed(volatility, returns)
+    _, timings['covariance_matrix'] = timed(covariance_matrix, returns)
+    _, timings['correlation_matrix'] = timed(correlation_matrix, returns)
+    portfolio, timings['portfolio_returns'] = timed(portfolio_returns, returns, weights)
+    _, timings['drawdowns'] = timed(drawdowns, closes)
+    return {
+        'symbols': n_symbols,
+        'days': n_days,
+        'lots': int(lot_symbols.size),
+        'seconds': {name: round(seconds, 6) for name, seconds in timings.items()},
+        'total_seconds': round(sum(timings.values()), 6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--lots-per-symbol', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n_days = args.years * TRADING_DAYS_PER_YEAR
+    results = [run(n_symbols, n_days, args.lots_per_symbol, rng) for n_symbols in args.symbols]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark da compressão das respostas: CPU gasta vs bytes economizados
+
+Renderiza as páginas existentes (/, /about, /stocks/, /stocks/?stream=1 e um
+css) de um portifólio com --stocks lotes em um banco SQLite temporário e
+comprime o html de cada uma com compress_chunks, para cada algoritmo e nível,
+usando os mesmos pedaços gerados pela aplicação (o streaming faz um flush por
+pedaço, o que custa alguma taxa de compressão).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_compression --stocks 20000 --levels 1 6 9
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def render_pages(n_stocks):
+    """Retorna {página: [pedaços do corpo da resposta]} sem compressão"""
+    database_file = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['CONFIG_TYPE'] = 'config.TestingConfig'
+    os.environ['TEST_DATABASE_URI'] = f'sqlite:///{database_file}'
+    from project import create_app, database
+    from project.models import User
+    from project.stocks.bulk import insert_stocks
+
+    app = create_app()
+    with app.app_context():
+        database.create_all()
+        user = User('bench@email.com', 'FlaskIsAwesome123')
+        database.session.add(user)
+        database.session.commit()
+        symbols = ['PETR', 'VALE', 'WEGE', 'AAPL', 'MSFT', 'GOOG']
+        insert_stocks([{'stock_symbol': symbols[i % len(symbols)], 'number_of_shares': i % 100 + 1,
+                        'purchase_price': 1000 + i % 5000, 'user_id': user.id} for i in range(n_stocks)])
+        database.session.commit()
+
+    client = app.test_client()
+    client.post('/users/login', data={'email': 'bench@email.com', 'password': 'FlaskIsAwesome123'})
+    pages = {}
+    for url in ('/', '/about', '/stocks/', '/stocks/?stream=1', '/static/css/base_style.css'):
+        response = client.get(url, buffered=False)
+        pages[url] = [chunk for chunk in response.response if chunk]
+        response.close()
+    return pages
+
+
+def main():
+    from project.compression import compress_chunks
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stocks', type=int, default=20000, help='lotes no portifólio do usuário')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 6, 9], help='níveis de compressão')
+    parser.add_argument('--repeat', type=int, default=5, help='repetições (vale a melhor)')
+    args = parser.parse_args()
+
+    pages = render_pages(args.stocks)
+    results = []
+    for url, chunks in pages.items():
+        size = sum(len(chunk) for chunk in chunks)
+        for encoding in ('gzip', 'deflate'):
+            for level in args.levels:
+                best = float('inf')
+                for _ in range(args.repeat):
+                    start = time.process_time()
+                    compressed = sum(len(part) for part in compress_chunks(chunks, encoding, level))
+                    best = min(best, time.process_time() - start)
+                results.append({
+                    'page': url,
+                    'chunks': len(chunks),
+                    'encoding': encoding,
+                    'level': level,
+                    'bytes': size,
+                    'compressed_bytes': compressed,
+                    'saved_pct': round(100 * (1 - compressed / size), 1),
+                    'cpu_ms': round(best * 1000, 3),
+                    # bytes economizados por milissegundo de CPU
+                    'saved_per_cpu_ms': round((size - compressed) / max(best * 1000, 1e-6)),
+                })
+                print(f'{url:28} {encoding:7} nível {level}: {size:>10} -> {compressed:>9} bytes '
+                      f'({results[-1]["saved_pct"]:5.1f}% menor) em {results[-1]["cpu_ms"]:8.3f}ms de CPU')
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Benchmark dos endpoints HTTP contra um servidor WSGI real
+
+Cria um banco SQLite temporário com --users usuários e --stocks-per-user lotes
+cada, sobe a aplicação no servidor WSGI do Werkzeug (com threads) em outro
+processo e dispara cada cenário com --concurrency clientes simultâneos, cada um
+com a própria conexão HTTP e logado com um usuário diferente:
+    index        GET  /
+    list_stocks  GET  /stocks/
+    add_stock    POST /add_stock
+    login        POST /users/login
+    register     POST /users/register (um email novo por requisição)
+O resultado (latências p50/p95/p99 e vazão de cada cenário) é impresso em JSON
+junto com o commit atual; com --output ele é gravado em um arquivo, e com
+--compare as diferenças para um resultado anterior são mostradas.
+
+Os hashes de senha usam PASSWORD_HASH_ITERATIONS de produção, a menos que
+--hash-iterations seja informado.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_http --users 200 --stocks-per-user 100 --concurrency 8 --output base.json
+    python -m benchmarks.bench_http --users 200 --stocks-per-user 100 --concurrency 8 --compare base.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+from config import BASEDIR, ProductionConfig
+
+
+SCENARIOS = ('index', 'list_stocks', 'add_stock', 'login', 'register')
+PASSWORD = 'FlaskIsAwesome123'
+
+
+# as configurações são lidas quando create_app as importa (no processo do
+# servidor), depois de main() definir as variáveis de ambiente
+class BenchConfig(ProductionConfig):
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCH_DATABASE_URI')
+    LOG_FILE = os.getenv('BENCH_LOG_FILE')
+    PASSWORD_HASH_ITERATIONS = int(os.getenv('BENCH_HASH_ITERATIONS', ProductionConfig.PASSWORD_HASH_ITERATIONS))
+    # os clientes do benchmark não leem o token dos formulários e todos vêm do mesmo IP
+    WTF_CSRF_ENABLED = False
+    LOGIN_THROTTLE_ENABLED = False
+    QUOTES_FILE = os.path.join(BASEDIR, 'tests', 'fixtures', 'quotes.json')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def seed(app, users, stocks_per_user):
+    """Cria os usuários bench<i>@example.com com os lotes, em lotes de inserts"""
+    from werkzeug.security import generate_password_hash
+    from project import database
+    from project.models import User
+    from project.stocks.bulk import batched, insert_stocks
+
+    symbols = ['PETR', 'VALE', 'WEGE', 'ITUB', 'BBDC', 'AAPL', 'MSFT', 'GOOG']
+    with app.app_context():
+        database.create_all()
+        # o hash é o mesmo para todos: calculado uma vez
+        method = f"{app.config['PASSWORD_HASH_ALGORITHM']}:{app.config['PASSWORD_HASH_ITERATIONS']}"
+        password_hash = generate_password_hash(PASSWORD, method=method)
+        database.session.execute(User.__table__.insert(), [
+            {'email': f'bench{index}@example.com', 'password_hashed': password_hash, 'email_confirmed': True}
+            for index in range(users)
+        ])
+        user_ids = database.session.scalars(database.select(User.id).order_by(User.id)).all()
+        lots = ({'stock_symbol': symbols[index % len(symbols)], 'number_of_shares': index % 100 + 1,
+                 'purchase_price': 1000 + index * 37 % 5000, 'user_id': user_id}
+                for user_id in user_ids for index in range(stocks_per_user))
+        for batch in batched(lots, app.config['STOCKS_IMPORT_BATCH_SIZE']):
+            insert_stocks(batch)
+            database.session.commit()
+        database.session.commit()
+
+
+def serve(port_queue):
+    """Processo do servidor: aplicação no servidor WSGI do Werkzeug, em uma porta livre"""
+    from werkzeug.serving import make_server
+    from project import create_app, passwords
+
+    # terminate() envia SIGTERM: sai normalmente, encerrando o pool de
+    # processos do hash de senhas em vez de deixá-lo órfão
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    app = create_app()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    port_queue.put(server.server_port)
+    try:
+        server.serve_forever()
+    finally:
+        with app.app_context():
+            passwords.hasher.shutdown()
+
+
+class Client:
+    """Uma conexão HTTP com o servidor, com os cookies de um usuário logado"""
+
+    def __init__(self, port):
+        self.port = port
+        self.connection = None
+        self.cookies = ''
+
+    def request(self, method, path, form=None, cookies=True):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        headers = {'Accept-Encoding': 'gzip'}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if cookies and self.cookies:
+            headers['Cookie'] = self.cookies
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            self.close()
+            raise
+        if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+            self.close()
+        return response
+
+    def log_in(self, email):
+        response = self.request('POST', '/users/login', {'email': email, 'password': PASSWORD}, cookies=False)
+        assert response.status == 302, f'login de {email}: {response.status}'
+        cookie = SimpleCookie()
+        for header in response.headers.get_all('Set-Cookie'):
+            cookie.load(header)
+        # a sessão é mantida fixa: as mensagens flash das respostas não se acumulam
+        self.cookies = '; '.join(f'{name}={morsel.value}' for name, morsel in cookie.items())
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def scenario_request(name, index, users):
+    """(método, caminho, form, usa cookies, status esperado) da requisição `index` do cenário"""
+    if name == 'index':
+        return 'GET', '/', None, True, 200
+    if name == 'list_stocks':
+        return 'GET', '/stocks/', None, True, 200
+    if name == 'add_stock':
+        form = {'stock_symbol': 'BENCH', 'number_of_shares': str(index % 100 + 1), 'purchase_price': '12.34'}
+        return 'POST', '/add_stock', form, True, 302
+    if name == 'login':
+        form = {'email': f'bench{index % users}@example.com', 'password': PASSWORD}
+        return 'POST', '/users/login', form, False, 302
+    form = {'email': f'new{time.time_ns()}-{index}@example.com', 'password': PASSWORD}
+    return 'POST', '/users/register', form, False, 302
+
+
+def run_scenario(name, clients, requests, users):
+    latencies = []
+    errors = []
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def worker(client):
+        local = []
+        while (index := next(counter)) < requests:
+            method, path, form, cookies, expected = scenario_request(name, index, users)
+            start = time.perf_counter()
+            try:
+                status = client.request(method, path, form, cookies).status
+            except (http.client.HTTPException, OSError) as e:
+                status = repr(e)
+            local.append(time.perf_counter() - start)
+            if status != expected:
+                with lock:
+                    errors.append(status)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_samples': sorted({str(error) for error in errors})[:5],
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
+
+
+def compare(results, baseline):
+    """Variação percentual de cada métrica em relação a um resultado anterior"""
+    changes = {}
+    for name, result in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if not previous:
+            continue
+        changes[name] = {
+            metric: f'{100 * (result[metric] - previous[metric]) / previous[metric]:+.1f}%'
+            for metric in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms') if previous[metric]
+        }
+    return {'baseline_commit': baseline.get('commit'), 'changes': changes}
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASEDIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100, help='usuários criados no banco')
+    parser.add_argument('--stocks-per-user', type=int, default=50, help='lotes de cada usuário')
+    parser.add_argument('--concurrency', type=int, default=8, help='clientes simultâneos')
+    parser.add_argument('--requests', type=int, default=400, help='requisições por cenário')
+    parser.add_argument('--warmup', type=int, default=20, help='requisições descartadas antes de cada cenário')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--hash-iterations', type=int, help='iterações do PBKDF2 (padrão: as de produção)')
+    parser.add_argument('--output', help='grava o resultado em JSON neste arquivo')
+    parser.add_argument('--compare', help='resultado anterior (JSON) para comparação')
+    args = parser.parse_args()
+    if args.concurrency > args.users:
+        parser.error('--concurrency não pode ser maior que --users (um usuário por cliente)')
+
+    directory = tempfile.mkdtemp()
+    os.environ['CONFIG_TYPE'] = 'benchmarks.bench_http.BenchConfig'
+    os.environ['BENCH_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ['BENCH_LOG_FILE'] = os.path.join(directory, 'bench.log')
+    if args.hash_iterations:
+        os.environ['BENCH_HASH_ITERATIONS'] = str(args.hash_iterations)
+    from project import create_app
+
+    seed_start = time.perf_counter()
+    seed(create_app(), args.users, args.stocks_per_user)
+    seed_seconds = time.perf_counter() - seed_start
+
+    # o servidor roda em outro processo para não disputar o GIL com os clientes
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    # não é daemon: o servidor cria o pool de processos do hash de senhas
+    server = context.Process(target=serve, args=(port_queue,))
+    server.start()
+    try:
+        port = port_queue.get(timeout=60)
+        clients = [Client(port) for _ in range(args.concurrency)]
+        for index, client in enumerate(clients):
+            client.log_in(f'bench{index}@example.com')
+
+        scenarios = {}
+        for name in args.scenarios:
+            if args.warmup:
+                run_scenario(name, clients, args.warmup, args.users)
+            scenarios[name] = run_scenario(name, clients, args.requests, args.users)
+            print(f'{name}: {json.dumps(scenarios[name])}')
+        for client in clients:
+            client.close()
+    finally:
+        server.terminate()
+        server.join()
+
+    from config import Config
+    results = {
+        'commit': current_commit(),
+        'cpus': os.cpu_count(),
+        'users': args.users,
+        'stocks_per_user': args.stocks_per_user,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'hash_iterations': args.hash_iterations or Config.PASSWORD_HASH_ITERATIONS,
+        'seed_seconds': round(seed_seconds, 2),
+        'scenarios': scenarios,
+    }
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            results['comparison'] = compare(results, json.load(file))
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark do custo do logging nas threads das requisições
+
+Compara o tempo gasto pela thread que loga, para o mesmo volume de mensagens:
+    sync-16k: RotatingFileHandler na própria thread, rotação a cada 16KB e
+              mensagens em f-string (a configuração anterior)
+    queued-text / queued-json: fila + thread de fundo (project/logs.py), com
+              rotação a cada LOG_MAX_BYTES e formatação preguiçosa
+Cada "requisição" emite --lines mensagens INFO e --debug-lines mensagens DEBUG
+(abaixo do nível configurado, então descartadas), a partir de --threads threads.
+O tempo de escrita da fila até o disco é medido separadamente (drain).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_logging --requests 5000 --threads 8
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from config import Config
+from project.logs import TEXT_FORMAT, build_file_handler, queued_handler
+
+
+class Stock:
+    """Objeto com __repr__ como os modelos, cujo custo só é pago se a mensagem for formatada"""
+
+    def __init__(self, index):
+        self.stock_symbol = f'SYM{index % 100}'
+        self.number_of_shares = index
+
+    def __repr__(self):
+        return f'{self.stock_symbol} - {self.number_of_shares} ações'
+
+
+def emit_fstring(logger, index, lines, debug_lines):
+    stock = Stock(index)
+    for line in range(lines):
+        logger.info(f'Added new stock ({stock}) for user{index}@email.com line {line}')
+    for line in range(debug_lines):
+        logger.debug(f'stock_symbol: {stock} line {line}')
+
+
+def emit_lazy(logger, index, lines, debug_lines):
+    stock = Stock(index)
+    for line in range(lines):
+        logger.info('Added new stock (%s) for user%d@email.com line %d', stock, index, line)
+    for line in range(debug_lines):
+        logger.debug('stock_symbol: %s line %d', stock, line)
+
+
+def run(name, handler, emit, args):
+    logger = logging.getLogger(f'bench.{name}')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(indexes):
+        local = []
+        for index in indexes:
+            start = time.perf_counter()
+            emit(logger, index, args.lines, args.debug_lines)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(range(offset, args.requests, args.threads),))
+               for offset in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    # close() do handler da fila espera a thread de fundo gravar o que falta
+    handler.close()
+    drained = time.perf_counter() - start
+    logger.removeHandler(handler)
+    latencies.sort()
+    return {
+        'request_mean_us': round(statistics.mean(latencies) * 1e6, 1),
+        'request_p99_us': round(latencies[int(0.99 * (len(latencies) - 1))] * 1e6, 1),
+        'requests_per_second': round(args.requests / elapsed),
+        'drain_s': round(drained, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000, help='requisições simuladas')
+    parser.add_argument('--threads', type=int, default=8, help='threads emitindo logs')
+    parser.add_argument('--lines', type=int, default=3, help='mensagens INFO por requisição')
+    parser.add_argument('--debug-lines', type=int, default=3, help='mensagens DEBUG (descartadas) por requisição')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+
+    def config(log_format):
+        return {'LOG_FILE': os.path.join(directory, f'{log_format}.log'), 'LOG_FORMAT': log_format,
+                'LOG_ROTATION': 'size', 'LOG_MAX_BYTES': Config.LOG_MAX_BYTES,
+                'LOG_BACKUP_COUNT': Config.LOG_BACKUP_COUNT, 'LOG_ROTATION_WHEN': Config.LOG_ROTATION_WHEN}
+
+    sync_handler = RotatingFileHandler(os.path.join(directory, 'sync.log'), maxBytes=16384, backupCount=20)
+    sync_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    results = {
+        'sync-16k': run('sync', sync_handler, emit_fstring, args),
+        'queued-text': run('text', queued_handler(build_file_handler(config('text'))), emit_lazy, args),
+        'queued-json': run('json', queued_handler(build_file_handler(config('json'))), emit_lazy, args),
+    }
+    for name, result in results.items():
+        print(f'{name}: {json.dumps(result)}')
+    print(json.dumps({'requests': args.requests, 'threads': args.threads, 'lines': args.lines,
+                      'debug_lines': args.debug_lines, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
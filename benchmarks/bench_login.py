@@ -0,0 +1,119 @@
+"""
+Benchmark de latência do login sob concorrência: hash na thread da requisição
+vs pool de processos (project/passwords.py)
+
+Dispara --concurrency threads fazendo login ao mesmo tempo, enquanto outra
+thread requisita uma página barata (/about), e mede as latências de cada
+tipo de requisição. Os hashes usam as iterações de produção
+(Config.PASSWORD_HASH_ITERATIONS), em um banco SQLite temporário.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_login --concurrency 16 --logins 4 --workers 0 2 4
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summary(latencies):
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1),
+    }
+
+
+def run(app, concurrency, logins):
+    login_latencies = []
+    page_latencies = []
+    done = threading.Event()
+
+    def log_in(index):
+        client = app.test_client()
+        for _ in range(logins):
+            start = time.perf_counter()
+            response = client.post('/users/login', data={'email': f'bench{index}@email.com',
+                                                         'password': 'FlaskIsAwesome123'})
+            login_latencies.append(time.perf_counter() - start)
+            assert response.status_code == 302, response.status_code
+            client.get('/users/logout')
+
+    def browse():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/about')
+            page_latencies.append(time.perf_counter() - start)
+
+    browser = threading.Thread(target=browse)
+    browser.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=log_in, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    browser.join()
+    return {
+        'logins_per_second': round(len(login_latencies) / elapsed, 1),
+        'login': summary(login_latencies),
+        'about': summary(page_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16, help='threads fazendo login ao mesmo tempo')
+    parser.add_argument('--logins', type=int, default=4, help='logins por thread')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4],
+                        help='processos do pool (0 = hash na thread da requisição)')
+    args = parser.parse_args()
+
+    os.environ['CONFIG_TYPE'] = 'config.TestingConfig'
+    os.environ['TEST_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    from config import Config
+    from project import create_app, database
+    from project.models import User
+    from project.passwords import PasswordHasher
+
+    app = create_app()
+    method = f'{Config.PASSWORD_HASH_ALGORITHM}:{Config.PASSWORD_HASH_ITERATIONS}'
+    app.config['PASSWORD_HASH_ITERATIONS'] = Config.PASSWORD_HASH_ITERATIONS
+    app.extensions['passwords'] = PasswordHasher(method, workers=0)
+    with app.app_context():
+        database.create_all()
+        # o hash é o mesmo para todos: calculado uma vez
+        password_hash = User('bench@email.com', 'FlaskIsAwesome123').password_hashed
+        for index in range(args.concurrency):
+            user = User(f'bench{index}@email.com', 'x')
+            user.password_hashed = password_hash
+            database.session.add(user)
+        database.session.commit()
+
+    results = {}
+    for workers in args.workers:
+        hasher = PasswordHasher(method, workers=workers, queue_size=args.concurrency, queue_timeout=60)
+        app.extensions['passwords'] = hasher
+        if workers:
+            hasher.hash('aquecimento')  # inicia os processos do pool fora da medição
+        results[f'workers={workers}'] = run(app, args.concurrency, args.logins)
+        hasher.shutdown()
+        print(f'workers={workers}: {json.dumps(results[f"workers={workers}"])}')
+    print(json.dumps({'method': method, 'cpus': os.cpu_count(), 'concurrency': args.concurrency,
+                      'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
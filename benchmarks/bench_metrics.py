@@ -0,0 +1,93 @@
+"""
+Benchmark do custo da instrumentação das requisições (project/metrics.py)
+
+Mede a latência de --requests requisições a páginas existentes (/about, que não
+usa o banco, e /stocks/ de um usuário com --stocks lotes) com METRICS_ENABLED
+ligado e desligado, alternando as rodadas para reduzir o efeito de ruído.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_metrics --requests 2000 --stocks 50
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from config import TestingConfig
+
+
+# TestingConfig lê TEST_DATABASE_URI ao ser importada: as configurações do
+# benchmark leem o banco temporário quando create_app as importa
+class MetricsEnabledConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCH_DATABASE_URI')
+    METRICS_ENABLED = True
+
+
+class MetricsDisabledConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCH_DATABASE_URI')
+    METRICS_ENABLED = False
+
+
+def create(config_name, database_uri):
+    os.environ['CONFIG_TYPE'] = f'benchmarks.bench_metrics.{config_name}'
+    os.environ['BENCH_DATABASE_URI'] = database_uri
+    from project import create_app
+
+    return create_app()
+
+
+def measure(client, url, requests):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='requisições por página e configuração')
+    parser.add_argument('--stocks', type=int, default=50, help='lotes no portifólio do usuário')
+    parser.add_argument('--rounds', type=int, default=4, help='rodadas alternando as configurações')
+    args = parser.parse_args()
+
+    database_uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    apps = {'enabled': create('MetricsEnabledConfig', database_uri),
+            'disabled': create('MetricsDisabledConfig', database_uri)}
+    from project import database
+    from project.models import Stock, User
+
+    with apps['enabled'].app_context():
+        database.create_all()
+        user = User('bench@email.com', 'FlaskIsAwesome123')
+        database.session.add(user)
+        database.session.flush()
+        database.session.add_all([Stock(f'SYM{index % 20}', '10', '12.34', user.id) for index in range(args.stocks)])
+        database.session.commit()
+
+    clients = {}
+    for name, app in apps.items():
+        clients[name] = app.test_client()
+        clients[name].post('/users/login', data={'email': 'bench@email.com', 'password': 'FlaskIsAwesome123'})
+
+    latencies = {(name, url): [] for name in apps for url in ('/about', '/stocks/')}
+    for _ in range(args.rounds):
+        for name, client in clients.items():
+            for url in ('/about', '/stocks/'):
+                latencies[(name, url)] += measure(client, url, args.requests // args.rounds)
+
+    results = {}
+    for url in ('/about', '/stocks/'):
+        enabled = statistics.median(latencies[('enabled', url)]) * 1e6
+        disabled = statistics.median(latencies[('disabled', url)]) * 1e6
+        results[url] = {'enabled_p50_us': round(enabled, 1), 'disabled_p50_us': round(disabled, 1),
+                        'overhead_us': round(enabled - disabled, 1)}
+        print(f'{url}: {json.dumps(results[url])}')
+    print(json.dumps({'requests': args.requests, 'stocks': args.stocks, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
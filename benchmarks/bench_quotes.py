@@ -0,0 +1,43 @@
+"""
+Benchmark da precificação de portifólios: busca sequencial vs QuoteCache.get_many
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_quotes --symbols 300 --latency 0.02 --workers 16
+"""
+import argparse
+import time
+from project.quotes import QuoteCache, SimulatedQuoteProvider
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=300, help='tickets distintos no portifólio')
+    parser.add_argument('--lots-per-symbol', type=int, default=3, help='lotes (tickets repetidos) por ticket')
+    parser.add_argument('--latency', type=float, default=0.02, help='latência simulada por consulta (s)')
+    parser.add_argument('--jitter', type=float, default=0.005, help='variação da latência (s)')
+    parser.add_argument('--workers', type=int, default=16, help='threads do get_many')
+    args = parser.parse_args()
+
+    symbols = [f'S{i:04d}' for i in range(args.symbols)] * args.lots_per_symbol
+    provider = SimulatedQuoteProvider(args.latency, args.jitter)
+
+    start = time.perf_counter()
+    sequential_cache = QuoteCache(provider, maxsize=len(symbols))
+    for symbol in symbols:
+        sequential_cache.get(symbol)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_cache = QuoteCache(provider, maxsize=len(symbols), max_workers=args.workers, fetch_timeout=60)
+    prices = batch_cache.get_many(symbols)
+    batch = time.perf_counter() - start
+
+    assert len(prices) == args.symbols and None not in prices.values()
+    print(f'{len(symbols)} lotes, {args.symbols} tickets distintos, latência {args.latency * 1000:.0f}ms')
+    print(f'sequencial (com cache): {sequential:.3f}s')
+    print(f'get_many ({args.workers} threads): {batch:.3f}s')
+    print(f'speedup: {sequential / batch:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark de leituras e escritas concorrentes no SQLite, antes e depois das
+PRAGMAs de project/sqlite.py
+
+Para cada perfil, cria um banco SQLite novo com `flask dev seed` e inicia
+--writers processos adicionando ações (POST /add_stock) e --readers processos
+listando portifólios (GET /stocks/) durante --duration segundos, cada processo
+com a própria aplicação e as próprias conexões, como os workers de um servidor
+WSGI. Os leitores listam os portifólios que os escritores estão alterando.
+    default: SQLite sem PRAGMAs e pool padrão (journal de rollback)
+    tuned:   SQLITE_PRAGMAS e SQLALCHEMY_ENGINE_OPTIONS de ProductionConfig
+Reporta, por perfil e papel, requisições por segundo, latências e erros
+(respostas 500, em geral "database is locked").
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.bench_sqlite --writers 4 --readers 4 --duration 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from config import BASEDIR, ProductionConfig
+
+
+# as configurações são lidas quando create_app as importa, depois de main()
+# definir BENCH_DIR; cada perfil usa um banco próprio
+class TunedConfig(ProductionConfig):
+    SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(os.getenv('BENCH_DIR', ''), 'tuned.db')}"
+    LOG_FILE = os.path.join(os.getenv('BENCH_DIR', ''), 'bench.log')
+    WTF_CSRF_ENABLED = False
+    LOGIN_THROTTLE_ENABLED = False
+    PASSWORD_HASH_ITERATIONS = 1000
+    PASSWORD_HASH_WORKERS = 0
+    # toda leitura vai ao banco
+    FRAGMENT_CACHE_ENABLED = False
+    QUOTES_FILE = os.path.join(BASEDIR, 'tests', 'fixtures', 'quotes.json')
+
+
+class DefaultConfig(TunedConfig):
+    SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(os.getenv('BENCH_DIR', ''), 'default.db')}"
+    SQLITE_PRAGMAS = {}
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+
+PROFILES = {'default': 'DefaultConfig', 'tuned': 'TunedConfig'}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def worker(profile, role, index, users, start_at, duration, results):
+    os.environ['CONFIG_TYPE'] = f'benchmarks.bench_sqlite.{PROFILES[profile]}'
+    from project import create_app
+
+    app = create_app()
+    client = app.test_client()
+    # escritor e leitor de mesmo índice usam o mesmo portifólio
+    response = client.post('/users/login', data={'email': f'seed{index % users}@example.com',
+                                                 'password': 'FlaskIsAwesome123'})
+    assert response.status_code == 302, response.status_code
+
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = start_at + duration
+    count = 0
+    while time.time() < deadline:
+        start = time.perf_counter()
+        if role == 'writer':
+            response = client.post('/add_stock', data={'stock_symbol': 'BENCH', 'number_of_shares': str(count % 100 + 1),
+                                                       'purchase_price': '12.34'})
+            ok = response.status_code == 302
+        else:
+            response = client.get('/stocks/')
+            ok = response.status_code == 200
+        latencies.append(time.perf_counter() - start)
+        errors += not ok
+        count += 1
+    results.put((role, latencies, errors))
+
+
+def run_profile(profile, args):
+    os.environ['CONFIG_TYPE'] = f'benchmarks.bench_sqlite.{PROFILES[profile]}'
+    from project import create_app, database
+
+    app = create_app()
+    with app.app_context():
+        database.create_all()
+    result = app.test_cli_runner().invoke(args=['dev', 'seed', '--users', str(args.users), '--lots-per-user',
+                                                str(args.lots_per_user), '--symbols', '100'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        database.engine.dispose()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    # todos começam juntos, depois de criar a aplicação e fazer login
+    start_at = time.time() + 5
+    processes = [context.Process(target=worker, args=(profile, role, index, args.users, start_at,
+                                                      args.duration, results))
+                 for role, count in (('writer', args.writers), ('reader', args.readers))
+                 for index in range(count)]
+    for process in processes:
+        process.start()
+    collected = {'writer': ([], 0), 'reader': ([], 0)}
+    for _ in processes:
+        role, latencies, errors = results.get()
+        collected[role] = (collected[role][0] + latencies, collected[role][1] + errors)
+    for process in processes:
+        process.join()
+
+    summary = {}
+    for role, (latencies, errors) in collected.items():
+        summary[role] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'per_second': round(len(latencies) / args.duration, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(max(latencies, default=0) * 1000, 1),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4, help='processos adicionando ações')
+    parser.add_argument('--readers', type=int, default=4, help='processos listando portifólios')
+    parser.add_argument('--duration', type=float, default=10, help='segundos de carga por perfil')
+    parser.add_argument('--users', type=int, default=50, help='usuários no banco')
+    parser.add_argument('--lots-per-user', type=int, default=200, help='lotes de cada usuário')
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    args = parser.parse_args()
+
+    os.environ['BENCH_DIR'] = tempfile.mkdtemp()
+    results = {}
+    for profile in args.profiles:
+        results[profile] = run_profile(profile, args)
+        print(f'{profile}: {json.dumps(results[profile])}')
+    print(json.dumps({'cpus': os.cpu_count(), 'writers': args.writers, 'readers': args.readers,
+                      'duration': args.duration, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
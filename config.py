@@ -20,8 +20,126 @@ class Config(object):
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL',
                                          default=f"sqlite:///{os.path.join(BASEDIR, 'instance', 'app.db')}")
     SQLALCHEMY_TRACK_MODIFICATIONS = False # emite sinais quando ocorrem modificações
+    # Réplicas somente leitura (project/replicas.py), separadas por vírgula.
+    # list_stocks, load_user e os relatórios leem delas; escritas vão ao principal
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('DATABASE_REPLICA_URLS', default='').split(',') if uri]
+    # após uma escrita, o cliente lê do principal por esse tempo (atraso de replicação)
+    REPLICA_STICKY_SECONDS = 5
+    # PRAGMAs executadas em cada nova conexão SQLite (project/sqlite.py): com WAL
+    # leitores e escritor não se bloqueiam; busy_timeout (ms) é a espera pelo
+    # lock de escrita antes de "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+    }
     WTF_CSRF_ENABLED = True # proteção contra CSRF do Flask-WTF
     REMEMBER_COOKIE_DURATION = timedelta(days=14)
+    # Paginação por keyset (seek) da lista de ações
+    STOCKS_PER_PAGE = 50
+    # no modo streaming, número de linhas buscadas do banco por vez (yield_per)
+    STOCKS_STREAM_BATCH_SIZE = 500
+    # linhas por lote (INSERT executemany + commit) no comando `flask stocks import`
+    STOCKS_IMPORT_BATCH_SIZE = 5000
+    # Cotações de mercado: provider (nome registrado em project.quotes.PROVIDERS
+    # ou caminho de importação da classe) e cache em memória na frente dele
+    QUOTES_PROVIDER = os.getenv('QUOTES_PROVIDER', default='file')
+    QUOTES_FILE = os.getenv('QUOTES_FILE', default=os.path.join(BASEDIR, 'instance', 'quotes.json'))
+    QUOTES_CACHE_TTL = 60  # segundos
+    QUOTES_CACHE_SIZE = 1024  # número máximo de tickets no cache
+    QUOTES_MAX_WORKERS = 16  # threads para buscar cotações de um portifólio em paralelo
+    QUOTES_FETCH_TIMEOUT = 2.0  # segundos; tickets mais lentos ficam sem preço
+    QUOTES_SIMULATED_LATENCY = 0.05  # latência do provider 'simulated' (segundos)
+    # cotações gravadas pelo job de atualização são usadas enquanto forem mais
+    # novas que QUOTES_MAX_AGE segundos; as demais são buscadas no provider
+    QUOTES_MAX_AGE = 300
+    # Jobs periódicos (project/scheduler.py). Em produção, rode `flask worker`
+    # em um processo separado; JOBS_RUN_IN_APP inicia o agendador em uma
+    # thread de cada processo do servidor
+    JOBS_RUN_IN_APP = os.getenv('JOBS_RUN_IN_APP', default='false').lower() == 'true'
+    JOBS_MAX_WORKERS = 4  # threads que executam os jobs
+    JOBS_POLL_INTERVAL = 5  # segundos entre verificações de jobs vencidos
+    JOBS_LEASE_SECONDS = 300  # após esse tempo, um job 'running' é considerado abandonado
+    JOBS_BACKOFF_BASE = 5  # segundos de espera após a primeira falha (dobra a cada falha)
+    JOBS_BACKOFF_MAX = 600
+    PRICE_REFRESH_INTERVAL = 60  # segundos entre atualizações das cotações
+    # Atualizações em tempo real (SSE) em /stocks/live
+    LIVE_POLL_INTERVAL = 2  # segundos entre consultas por mudanças de preços e posições
+    # segundos relidos antes da última mudança vista em cada consulta: cobre
+    # transações que gravaram updated_on antes, mas fizeram commit depois
+    LIVE_POLL_OVERLAP = 10
+    LIVE_QUEUE_SIZE = 100  # eventos pendentes por cliente antes de descartá-lo
+    LIVE_HEARTBEAT = 15  # segundos sem eventos até enviar um comentário de keep-alive
+    # tempo máximo de uma conexão; o EventSource reconecta sozinho, liberando
+    # periodicamente o worker em servidores com um worker por conexão
+    LIVE_STREAM_MAX_SECONDS = 300
+    # Histórico de preços diários: um arquivo memory-mapped por ticket
+    PRICE_HISTORY_DIR = os.getenv('PRICE_HISTORY_DIR', default=os.path.join(BASEDIR, 'instance', 'history'))
+    # Cache de fragmentos de html renderizados (project/fragments.py)
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_SIZE = 1024  # número máximo de fragmentos no cache
+    FRAGMENT_CACHE_TTL = 300  # segundos
+    # Arquivos estáticos com hash no nome, gerados por `flask assets build`
+    # (project/assets.py) na pasta static/ASSETS_DIR
+    ASSETS_USE_MANIFEST = True  # url_for('static') usa o manifest, se ele existir
+    ASSETS_SOURCES = ('css', 'img')  # pastas de static incluídas no build
+    ASSETS_DIR = 'dist'
+    ASSETS_MAX_AGE = 365 * 24 * 60 * 60  # um ano; a url muda quando o conteúdo muda
+    ASSETS_GZIP_LEVEL = 9  # comprimido uma vez no build, então vale o nível máximo
+    # Compressão das respostas (project/compression.py)
+    COMPRESS_ENABLED = True
+    COMPRESS_LEVEL = 6  # 1 (mais rápido) a 9 (menor); ver benchmarks/bench_compression.py
+    COMPRESS_MIN_SIZE = 500  # bytes; respostas menores são enviadas sem compressão
+    COMPRESS_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/csv',
+                          'application/json', 'application/javascript', 'image/svg+xml')
+    # Cache das identidades carregadas pelo user_loader do Flask-Login
+    # (project/identity.py). Alterações feitas em outro processo só aparecem
+    # depois do TTL; desligue para deployments que não aceitam essa janela
+    LOGIN_CACHE_ENABLED = os.getenv('LOGIN_CACHE_ENABLED', default='true').lower() == 'true'
+    LOGIN_CACHE_TTL = 30  # segundos
+    LOGIN_CACHE_SIZE = 10000  # número máximo de usuários no cache
+    # Hash de senhas (project/passwords.py): algoritmo e iterações do Werkzeug
+    # (hashes com outros parâmetros são regerados no próximo login) e pool de
+    # processos onde o hash é calculado, com fila limitada
+    PASSWORD_HASH_ALGORITHM = 'pbkdf2:sha256'
+    PASSWORD_HASH_ITERATIONS = 600000
+    PASSWORD_HASH_WORKERS = 2  # processos; 0 calcula na thread da requisição
+    PASSWORD_HASH_QUEUE_SIZE = 16  # operações aguardando um processo livre
+    PASSWORD_HASH_QUEUE_TIMEOUT = 5.0  # segundos esperando vaga antes de responder 503
+    # Limite de tentativas de login (project/throttle.py): (tentativas, segundos)
+    # por IP e por email. 'memory' guarda os contadores em cada processo; um
+    # caminho de arquivo os compartilha entre processos em um banco SQLite
+    LOGIN_THROTTLE_ENABLED = True
+    LOGIN_THROTTLE_STORAGE = os.getenv('LOGIN_THROTTLE_STORAGE', default='memory')
+    LOGIN_THROTTLE_IP_LIMIT = (30, 60)
+    LOGIN_THROTTLE_EMAIL_LIMIT = (5, 60)
+    LOGIN_THROTTLE_MAX_KEYS = 100000  # chaves em memória (LRU)
+    # Logging (project/logs.py): arquivo escrito por uma thread de fundo
+    LOG_FILE = os.getenv('LOG_FILE', default=os.path.join(BASEDIR, 'instance', 'flask-stonks.log'))
+    LOG_LEVEL = os.getenv('LOG_LEVEL', default='INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', default='text')  # 'text' ou 'json' (JSON lines)
+    LOG_ROTATION = 'size'  # 'size' (LOG_MAX_BYTES) ou 'time' (LOG_ROTATION_WHEN)
+    LOG_MAX_BYTES = 10 * 1024 * 1024
+    LOG_ROTATION_WHEN = 'midnight'
+    LOG_BACKUP_COUNT = 10  # máximo de cópias
+    # Métricas das requisições em /metrics, no formato Prometheus
+    # (project/metrics.py). Restrinja o acesso à rota no proxy reverso.
+    # Com vários processos, METRICS_DIR deve ser uma pasta compartilhada por eles
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='true').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR')  # None = apenas o processo que responde
+    METRICS_FLUSH_INTERVAL = 5  # segundos entre gravações do snapshot do processo
+    # snapshots sem atualização há esse tempo são de processos encerrados: são
+    # somados ao snapshot de um processo vivo e removidos. Deve ser bem maior que
+    # METRICS_FLUSH_INTERVAL, ou um processo apenas lento seria contado em dobro
+    METRICS_RETIRE_AFTER = 300
+    METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # segundos
+    # Log de queries lentas e detector de N+1 (project/queries.py)
+    QUERY_MONITOR_ENABLED = True
+    SLOW_QUERY_THRESHOLD = 0.1  # segundos; None desliga o log de queries lentas
+    SLOW_QUERY_EXPLAIN = True  # inclui o plano de execução das queries lentas
+    # os parâmetros podem conter dados pessoais (emails, hashes de senha)
+    SLOW_QUERY_LOG_PARAMETERS = True
+    N_PLUS_ONE_THRESHOLD = 10  # repetições do mesmo statement em uma requisição; 0 desliga
     # Flask-Mail Configuration
     MAIL_SERVER = 'smtp.googlemail.com'
     MAIL_PORT = 465
@@ -30,14 +148,38 @@ class Config(object):
     MAIL_USERNAME = os.getenv('MAIL_USERNAME', default='')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', default='')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_USERNAME', default='')
+    MAIL_MAX_EMAILS = 100  # emails por conexão SMTP antes de reconectar
+    # Outbox (project/outbox.py): emails são gravados no banco e enviados
+    # pelo job deliver-mail, em lotes por uma conexão SMTP reutilizada
+    MAIL_OUTBOX_INTERVAL = 10  # segundos entre execuções do job
+    MAIL_OUTBOX_BATCH_SIZE = 100  # emails por execução
+    MAIL_OUTBOX_RATE_LIMIT = 5  # emails por segundo (limite do provedor SMTP)
+    MAIL_OUTBOX_MAX_ATTEMPTS = 5  # tentativas antes de marcar o email como failed
+    MAIL_OUTBOX_RETRY_BASE = 60  # segundos de espera após a primeira falha (dobra a cada falha)
 
 
 class ProductionConfig(Config):
     FLASK_ENV = 'production'
+    SQLITE_PRAGMAS = {
+        **Config.SQLITE_PRAGMAS,
+        'busy_timeout': 10000,
+        'cache_size': -65536,  # KiB por conexão (64MB)
+        'mmap_size': 268435456,  # 256MB do arquivo lidos via memory map
+    }
+    # pool de conexões (opções do create_engine): pool_size deve acompanhar o
+    # número de threads do servidor WSGI por processo
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 10,  # segundos esperando uma conexão livre
+        'pool_recycle': 3600,
+    }
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    # alterações nos arquivos de static aparecem sem precisar refazer o build
+    ASSETS_USE_MANIFEST = False
 
 
 class TestingConfig(Config):
@@ -46,3 +188,15 @@ class TestingConfig(Config):
                                          default=f"sqlite:///{os.path.join(BASEDIR, 'instance', 'test.db')}")
     # em ambiente de testes, o POST é feito diretamente, não atraves do form
     WTF_CSRF_ENABLED = False 
+    # cotações fixas, lidas de um arquivo versionado junto com os testes
+    QUOTES_FILE = os.path.join(BASEDIR, 'tests', 'fixtures', 'quotes.json')
+    # sem réplicas de produção apontando para o banco de testes
+    SQLALCHEMY_REPLICA_URIS = []
+    # o banco de testes é descartável: sem fsync
+    SQLITE_PRAGMAS = {**Config.SQLITE_PRAGMAS, 'synchronous': 'OFF'}
+    # hashes rápidos e sem processos extras nos testes
+    PASSWORD_HASH_ITERATIONS = 1000
+    PASSWORD_HASH_WORKERS = 0
+    # os testes fazem muitos logins seguidos com o mesmo email
+    LOGIN_THROTTLE_ENABLED = False
+
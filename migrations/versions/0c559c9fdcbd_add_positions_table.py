@@ -0,0 +1,39 @@
+"""add positions table
+
+Revision ID: 0c559c9fdcbd
+Revises: 6e5228e437cf
+Create Date: 2026-10-18 11:02:47.518930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c559c9fdcbd'
+down_revision = '6e5228e437cf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('positions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('stock_symbol', sa.String(), nullable=False),
+    sa.Column('number_of_shares', sa.Integer(), nullable=True),
+    sa.Column('total_cost', sa.Integer(), nullable=True),
+    sa.Column('updated_on', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_positions_user_id_users')),
+    sa.PrimaryKeyConstraint('user_id', 'stock_symbol', name=op.f('pk_positions'))
+    )
+
+    # popula o resumo com as ações já existentes (equivale a `flask stocks rebuild-positions`)
+    op.execute(
+        'INSERT INTO positions (user_id, stock_symbol, number_of_shares, total_cost, updated_on) '
+        'SELECT user_id, stock_symbol, SUM(number_of_shares), SUM(number_of_shares * purchase_price), '
+        'CURRENT_TIMESTAMP FROM stocks WHERE user_id IS NOT NULL GROUP BY user_id, stock_symbol'
+    )
+
+
+def downgrade():
+    op.drop_table('positions')
@@ -0,0 +1,54 @@
+"""add user_id to stocks
+
+Revision ID: 6e5228e437cf
+Revises: f3db1e8d2357
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e5228e437cf'
+down_revision = 'f3db1e8d2357'
+branch_labels = None
+depends_on = None
+
+# número de linhas atualizadas por UPDATE durante o backfill
+BACKFILL_CHUNK_SIZE = 10000
+
+
+def upgrade():
+    with op.batch_alter_table('stocks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(batch_op.f('fk_stocks_user_id_users'), 'users', ['user_id'], ['id'])
+
+    # ações cadastradas antes da existência de donos passam a pertencer ao
+    # primeiro usuário registrado. O backfill é feito em faixas de id, cada uma
+    # confirmada no seu próprio commit (autocommit_block): cada UPDATE percorre
+    # apenas um trecho da chave primária e o lock de escrita é liberado entre
+    # as faixas, em vez de ficar preso até o fim da migration
+    connection = op.get_bind()
+    owner_id = connection.execute(sa.text('SELECT MIN(id) FROM users')).scalar()
+    max_stock_id = connection.execute(sa.text('SELECT MAX(id) FROM stocks')).scalar()
+    if owner_id is not None and max_stock_id is not None:
+        with op.get_context().autocommit_block():
+            for first_id in range(0, max_stock_id + 1, BACKFILL_CHUNK_SIZE):
+                connection.execute(
+                    sa.text('UPDATE stocks SET user_id = :owner_id '
+                            'WHERE id >= :first_id AND id < :last_id AND user_id IS NULL'),
+                    {'owner_id': owner_id, 'first_id': first_id, 'last_id': first_id + BACKFILL_CHUNK_SIZE}
+                )
+
+    # o índice é criado depois do backfill: uma única construção em vez de
+    # atualizá-lo a cada faixa
+    op.create_index('ix_stocks_user_id_id', 'stocks', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stocks_user_id_id', table_name='stocks')
+
+    with op.batch_alter_table('stocks', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_stocks_user_id_users'), type_='foreignkey')
+        batch_op.drop_column('user_id')
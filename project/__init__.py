@@ -6,8 +6,22 @@ from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
 from sqlalchemy import MetaData
-from logging.handlers import RotatingFileHandler
-import logging
+from project.assets import Assets
+from project.compression import CompressionMiddleware
+from project.fragments import Fragments
+from project.history import PriceHistory
+from project.identity import Identities
+from project.live import LiveUpdates
+from project.logs import LocalQueueHandler, build_file_handler, queued_handler
+from project.metrics import Metrics
+from project.passwords import Passwords
+from project.queries import QueryMonitor
+from project.replicas import ReadReplicas, RoutingSession
+from project.quotes import Quotes
+from project.scheduler import Scheduler
+from project.sqlite import SQLitePragmas
+from project.throttle import LoginThrottle
+import atexit
 from markupsafe import escape
 import os
 
@@ -27,12 +41,26 @@ convention = {
 metadata = MetaData(naming_convention=convention)
 
 # cria instância da extensão no contexto global, mas ainda não foi adicionado na aplicação
-database = SQLAlchemy(metadata=metadata)
+# a sessão envia as leituras marcadas com project.replicas.reading às réplicas
+database = SQLAlchemy(metadata=metadata, session_options={'class_': RoutingSession})
+replicas = ReadReplicas()
+sqlite_pragmas = SQLitePragmas()
 db_migration = Migrate()
 csrf_protection = CSRFProtect()
 login = LoginManager()
 login.login_view = "users.login"
 mail = Mail()
+quotes = Quotes()
+price_history = PriceHistory()
+scheduler = Scheduler()
+live = LiveUpdates()
+fragments = Fragments()
+assets = Assets()
+identities = Identities()
+passwords = Passwords()
+login_throttle = LoginThrottle()
+metrics = Metrics()
+query_monitor = QueryMonitor()
 
 
 ########################
@@ -50,8 +78,22 @@ def create_app():
     register_blueprints(app)
     register_global_routes(app)
     register_error_pages(app)
+    register_cli_commands(app)
     configure_logging(app)
 
+    # comprime as respostas (gzip/deflate) quando o cliente aceita
+    if app.config['COMPRESS_ENABLED']:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            level=app.config['COMPRESS_LEVEL'],
+            min_size=app.config['COMPRESS_MIN_SIZE'],
+            mimetypes=app.config['COMPRESS_MIMETYPES']
+        )
+
+    # jobs periódicos na própria aplicação (alternativa ao comando `flask worker`)
+    if app.config['JOBS_RUN_IN_APP']:
+        scheduler.start(app)
+
     return app
 
 
@@ -64,9 +106,21 @@ def register_blueprints(app):
     app.register_blueprint(users_blueprint, url_prefix='/users')
 
 
+def register_cli_commands(app):
+    # importa os comandos evitando circular imports
+    from project.seed import dev_cli
+
+    # flask dev seed: dados sintéticos para testes de escala
+    app.cli.add_command(dev_cli)
+
+
 def initialize_extensions(app):
+    # réplicas de leitura: registradas como binds antes dos engines serem criados
+    replicas.init_app(app, database)
     # faz o bind da extensão à aplicação
     database.init_app(app)
+    # PRAGMAs das conexões SQLite: registrado antes de qualquer conexão ser aberta
+    sqlite_pragmas.init_app(app, database)
     db_migration.init_app(app, database)
     csrf_protection.init_app(app)
     login.init_app(app)
@@ -74,14 +128,24 @@ def initialize_extensions(app):
     # uma página que requer login, se não estiver logado
     login.login_view = "users.login" 
     mail.init_app(app)
-
-    from project.models import User
+    quotes.init_app(app)
+    price_history.init_app(app)
+    scheduler.init_app(app, database)
+    live.init_app(app, database)
+    fragments.init_app(app)
+    assets.init_app(app)
+    identities.init_app(app, database)
+    passwords.init_app(app)
+    login_throttle.init_app(app)
+    metrics.init_app(app)
+    query_monitor.init_app(app, database)
 
     # função callback que flask-login usa para recarregar o usuário da sessão
+    # retorna só as colunas usadas por current_user, a partir de um cache em
+    # memória de curta duração (project/identity.py). None = usuário removido
     @login.user_loader
     def load_user(user_id): #user_id é uma string unicode
-        query = database.select(User).where(User.id == int(user_id))
-        return database.session.execute(query).scalar_one()
+        return identities.load(int(user_id))
 
 
 
@@ -92,18 +156,10 @@ def configure_logging(app):
     # sem rotação de logs
     # log_file_handler = logging.FileHandler('flask-stonks.log')
 
-    # quando o arquivo chega no tamanho determinado, move o arquivo para
-    # arquivo.1 e outro arquivo com o mesmo nome original é criado
-    # de forma que o arquivo com o nome original é sempre o mais recente
-    log_file_handler = RotatingFileHandler(
-        'instance/flask-stonks.log',
-        maxBytes=16384, # tamanho máxima
-        backupCount=20  # máximo de cópias
-    )
-    log_file_formatter = logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(filename)s:%(lineno)d]'
-    )
-    log_file_handler.setFormatter(log_file_formatter)
+    # o arquivo é rotacionado por tamanho ou por tempo e escrito por uma thread
+    # de fundo: as requisições só colocam os registros em uma fila em memória
+    # (project/logs.py)
+    log_file_handler = build_file_handler(app.config)
     # Nível mínimo de log a ser mostrado
     # É indicado que quanto mais cedo no ciclo de desenvolvimento
     # mais informações sejam logadas, mas na medida em que avançamos na maturidade
@@ -111,8 +167,19 @@ def configure_logging(app):
     # DEBUG -> INFO -> WARNING -> ERROR -> CRITICAL
     # também podemos definir o nível de log com base no ambiente
     # log_level = logging.DEBUG if DEBUG else logging.INFO
-    log_file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(log_file_handler)
+    log_file_handler.setLevel(app.config['LOG_LEVEL'])
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+
+    # app.logger é compartilhado por todas as instâncias da aplicação no
+    # processo (ex.: testes): a fila de uma instância anterior é encerrada
+    for handler in list(app.logger.handlers):
+        if isinstance(handler, LocalQueueHandler):
+            app.logger.removeHandler(handler)
+            handler.close()
+    queue_handler = queued_handler(log_file_handler)
+    app.logger.addHandler(queue_handler)
+    # grava os registros pendentes ao encerrar o processo
+    atexit.register(queue_handler.close)
 
     app.logger.info('Starting the Stonks App')
 
@@ -0,0 +1,22 @@
+"""
+Análises de portifólio vetorizadas com NumPy
+
+Os lotes de ações de um usuário e o histórico de preços são convertidos em
+arrays, e todas as métricas (pesos, retornos, volatilidade, covariância,
+correlação e drawdowns) são calculadas com operações vetorizadas, sem laços
+Python por linha ou por objeto do ORM.
+"""
+from .portfolio import (
+    TRADING_DAYS_PER_YEAR,
+    Holdings,
+    correlation_matrix,
+    covariance_matrix,
+    daily_returns,
+    drawdowns,
+    holdings_from_lots,
+    load_holdings,
+    max_drawdown,
+    portfolio_returns,
+    position_weights,
+    volatility,
+)
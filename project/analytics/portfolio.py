@@ -0,0 +1,115 @@
+"""
+Funções de análise de portifólio
+
+Convenções:
+    * preços e custos seguem o padrão de Stock.purchase_price (inteiros x100)
+    * históricos de preço são matrizes (dias x tickets), uma coluna por ticket,
+      na mesma ordem de Holdings.symbols
+"""
+from typing import NamedTuple
+import numpy as np
+from project import database
+from project.models import Position
+from project.replicas import reading
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class Holdings(NamedTuple):
+    """Posições de um portifólio em forma de arrays alinhados por ticket"""
+    symbols: np.ndarray  # tickets ordenados (str)
+    shares: np.ndarray  # total de ações por ticket (int64)
+    total_cost: np.ndarray  # custo total por ticket, x100 (int64)
+
+
+def holdings_from_lots(symbols, shares, prices):
+    """
+    Agrega lotes (arrays paralelos de ticket, número de ações e preço de compra
+    x100) em um Holdings, com np.unique + np.bincount em vez de um dict
+    montado linha a linha
+    """
+    symbols = np.asarray(symbols)
+    shares = np.asarray(shares, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.int64)
+    unique_symbols, index = np.unique(symbols, return_inverse=True)
+    return Holdings(
+        unique_symbols,
+        np.bincount(index, weights=shares, minlength=len(unique_symbols)).astype(np.int64),
+        np.bincount(index, weights=shares * prices, minlength=len(unique_symbols)).astype(np.int64),
+    )
+
+
+def load_holdings(user_id):
+    """
+    Carrega as posições de `user_id` a partir do resumo materializado (tabela
+    positions), buscando apenas as colunas necessárias, sem criar objetos do ORM
+    """
+    query = (database.select(Position.stock_symbol, Position.number_of_shares, Position.total_cost)
+             .where(Position.user_id == user_id)
+             .order_by(Position.stock_symbol))
+    with reading(database.session) as session:
+        rows = session.execute(query).all()
+    if not rows:
+        return Holdings(np.array([], dtype=str), np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    symbols, shares, total_cost = zip(*rows)
+    return Holdings(np.array(symbols), np.array(shares, dtype=np.int64), np.array(total_cost, dtype=np.int64))
+
+
+def position_weights(shares, prices):
+    """Peso de cada posição no valor total do portifólio (soma 1)"""
+    values = np.asarray(shares, dtype=np.float64) * np.asarray(prices, dtype=np.float64)
+    total = values.sum()
+    if total == 0:
+        return np.zeros_like(values)
+    return values / total
+
+
+def daily_returns(closes):
+    """
+    Retornos simples diários a partir de uma matriz de fechamentos
+    (dias x tickets). O resultado tem um dia a menos que a entrada
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    return closes[1:] / closes[:-1] - 1.0
+
+
+def volatility(returns, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """Desvio padrão amostral dos retornos de cada coluna, anualizado"""
+    return np.std(returns, axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+
+def covariance_matrix(returns, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """Matriz de covariância anualizada (tickets x tickets) dos retornos"""
+    returns = np.asarray(returns, dtype=np.float64)
+    centered = returns - returns.mean(axis=0)
+    # equivale a np.cov(returns, rowvar=False), mas com um único produto matricial
+    return (centered.T @ centered) / (returns.shape[0] - 1) * periods_per_year
+
+
+def correlation_matrix(returns):
+    """Matriz de correlação (tickets x tickets) dos retornos"""
+    covariance = covariance_matrix(returns, periods_per_year=1)
+    std = np.sqrt(np.diag(covariance))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = covariance / np.outer(std, std)
+    np.fill_diagonal(correlation, 1.0)
+    return correlation
+
+
+def portfolio_returns(returns, weights):
+    """Retornos diários do portifólio para pesos fixos"""
+    return np.asarray(returns, dtype=np.float64) @ np.asarray(weights, dtype=np.float64)
+
+
+def drawdowns(values):
+    """
+    Queda de cada ponto em relação ao maior valor anterior (0 no topo, -0.25
+    para 25% abaixo do topo). Aceita uma série ou uma matriz (dias x tickets)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return values / np.maximum.accumulate(values, axis=0) - 1.0
+
+
+def max_drawdown(values):
+    """Maior queda em relação ao topo anterior (valor negativo)"""
+    return drawdowns(values).min(axis=0)
@@ -0,0 +1,150 @@
+"""
+Arquivos estáticos com hash do conteúdo no nome e versões pré-comprimidas
+
+O comando `flask assets build` copia os arquivos de ASSETS_SOURCES (dentro da
+pasta static) para ASSETS_DIR, acrescentando ao nome um hash do conteúdo
+(css/base_style.css -> dist/css/base_style.3f2a9c1b7d4e.css), grava uma versão
+.gz de cada arquivo que fica menor comprimido e um manifest.json que relaciona
+o nome original ao nome final.
+
+Com o manifest carregado, `url_for('static', filename='css/base_style.css')`
+passa a gerar a url do arquivo com hash. Como o nome muda sempre que o conteúdo
+muda, esses arquivos podem ser guardados pelo navegador por um ano sem
+revalidação (Cache-Control immutable). Quando o cliente aceita gzip, a versão
+.gz é enviada diretamente, sem comprimir a cada requisição.
+
+Arquivos de builds anteriores não são removidos (exceto com --clean), para que
+páginas já renderizadas com as urls antigas continuem funcionando.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+
+MANIFEST_NAME = 'manifest.json'
+# formatos que já são comprimidos não ganham nada com gzip
+COMPRESSED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.woff', '.woff2', '.gz'}
+
+
+def build_assets(static_folder, sources=('css', 'img'), output='dist', level=9, clean=False):
+    """
+    Gera os arquivos com hash, as versões .gz e o manifest em
+    `static_folder`/`output`. Retorna o manifest (nome original -> nome com hash,
+    ambos relativos à pasta static)
+    """
+    output_folder = os.path.join(static_folder, output)
+    if clean and os.path.isdir(output_folder):
+        shutil.rmtree(output_folder)
+
+    manifest = {}
+    for source in sources:
+        for directory, _, filenames in os.walk(os.path.join(static_folder, source)):
+            for filename in sorted(filenames):
+                path = os.path.join(directory, filename)
+                relative = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                with open(path, 'rb') as file:
+                    content = file.read()
+
+                name, extension = os.path.splitext(relative)
+                digest = hashlib.sha256(content).hexdigest()[:12]
+                hashed = f'{output}/{name}.{digest}{extension}'
+                target = os.path.join(static_folder, hashed)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, 'wb') as file:
+                    file.write(content)
+
+                if extension.lower() not in COMPRESSED_EXTENSIONS:
+                    # mtime=0 deixa o .gz idêntico entre builds do mesmo conteúdo
+                    compressed = gzip.compress(content, compresslevel=level, mtime=0)
+                    if len(compressed) < len(content):
+                        with open(target + '.gz', 'wb') as file:
+                            file.write(compressed)
+                manifest[relative] = hashed
+
+    # o manifest é gravado por último e de forma atômica: um processo que o
+    # leia durante o build vê o manifest anterior, cujos arquivos ainda existem
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    os.makedirs(output_folder, exist_ok=True)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def load_manifest(static_folder, output='dist'):
+    try:
+        with open(os.path.join(static_folder, output, MANIFEST_NAME), encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+class Assets:
+    """
+    Extensão Flask que resolve url_for('static') pelo manifest e serve os
+    arquivos com hash com cache longo e versão pré-comprimida
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        manifest = {}
+        if app.config['ASSETS_USE_MANIFEST']:
+            manifest = load_manifest(app.static_folder, app.config['ASSETS_DIR'])
+        app.extensions['assets'] = manifest
+        app.url_defaults(self.static_url_defaults)
+        if 'static' in app.view_functions:
+            app.view_functions['static'] = self.send_static_file
+        app.cli.add_command(assets_cli)
+
+    @staticmethod
+    def static_url_defaults(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            hashed = current_app.extensions['assets'].get(values['filename'])
+            if hashed is not None:
+                values['filename'] = hashed
+
+    @staticmethod
+    def send_static_file(filename):
+        app = current_app
+        if not filename.startswith(app.config['ASSETS_DIR'] + '/'):
+            return app.send_static_file(filename)
+
+        compressed = filename + '.gz'
+        path = safe_join(app.static_folder, compressed)
+        use_gzip = request.accept_encodings['gzip'] > 0 and path is not None and os.path.isfile(path)
+        response = send_from_directory(app.static_folder, compressed if use_gzip else filename,
+                                       max_age=app.config['ASSETS_MAX_AGE'])
+        if use_gzip:
+            response.content_encoding = 'gzip'
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        # o conteúdo de uma url com hash nunca muda
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+assets_cli = AppGroup('assets', help='Arquivos estáticos com hash e pré-comprimidos')
+
+
+@assets_cli.command('build')
+@click.option('--clean', is_flag=True, help='Remove os arquivos de builds anteriores')
+def build_command(clean):
+    """Gera os arquivos estáticos com hash, as versões .gz e o manifest"""
+    app = current_app._get_current_object()
+    manifest = build_assets(app.static_folder, app.config['ASSETS_SOURCES'], app.config['ASSETS_DIR'],
+                            app.config['ASSETS_GZIP_LEVEL'], clean)
+    app.extensions['assets'] = manifest
+    for original, hashed in sorted(manifest.items()):
+        click.echo(f'{original} -> {hashed}')
+    click.echo(f'{len(manifest)} arquivos no manifest')
@@ -0,0 +1,136 @@
+"""
+Compressão das respostas (gzip/deflate) como middleware WSGI
+
+O algoritmo é negociado pelo cabeçalho Accept-Encoding. Só são comprimidas
+respostas com content-type na lista permitida (html, css, json etc - imagens e
+arquivos .gz já são comprimidos) e com pelo menos `min_size` bytes: para
+respostas pequenas o custo de CPU não compensa os poucos bytes economizados.
+
+A compressão é incremental: cada pedaço gerado pela aplicação é comprimido e
+enviado em seguida (Z_SYNC_FLUSH), então respostas em streaming, como
+/stocks/?stream=1, continuam chegando aos poucos no navegador. Quando a
+resposta não tem Content-Length, os primeiros pedaços são acumulados até
+atingir `min_size` (ou o fim da resposta) para decidir se vale comprimir.
+"""
+import zlib
+from itertools import chain
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+
+DEFAULT_MIMETYPES = (
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'application/json',
+    'application/javascript',
+    'image/svg+xml',
+)
+
+# wbits de cada formato: gzip tem cabeçalho e trailer próprios; o "deflate" do
+# HTTP é o formato zlib (RFC 1950), não o deflate sem cabeçalho
+WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def compress_chunks(chunks, encoding='gzip', level=6):
+    """Comprime os pedaços de `chunks`, gerando a saída comprimida de cada um assim que possível"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[encoding])
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    """Middleware WSGI que comprime as respostas de `app` quando o cliente aceita"""
+
+    def __init__(self, app, level=6, min_size=500, mimetypes=DEFAULT_MIMETYPES, encodings=('gzip', 'deflate')):
+        self.app = app
+        self.level = level
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        self.encodings = list(encodings)
+
+    def __call__(self, environ, start_response):
+        encoding = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', '')).best_match(self.encodings)
+        if encoding is None or environ['REQUEST_METHOD'] == 'HEAD':
+            return self.app(environ, start_response)
+
+        captured = []
+        written = []  # dados enviados pelo callable write() (PEP 3333)
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        app_iter = self.app(environ, capture_start_response)
+        chunks = iter(app_iter)
+        body = written
+        if not captured:
+            # a aplicação pode chamar start_response só na primeira iteração
+            body.append(next(chunks, b''))
+        status, headers, exc_info = captured
+        close = getattr(app_iter, 'close', None)
+        callbacks = [close] if close is not None else []
+
+        if not self._compressible(status, headers):
+            start_response(status, headers, exc_info)
+            return ClosingIterator(chain(body, chunks), callbacks)
+
+        # sem Content-Length, lê a resposta até saber se ela atinge min_size
+        size = sum(len(chunk) for chunk in body)
+        if size < self.min_size:
+            for chunk in chunks:
+                body.append(chunk)
+                size += len(chunk)
+                if size >= self.min_size:
+                    break
+            else:
+                start_response(status, headers, exc_info)
+                return ClosingIterator(body, callbacks)
+
+        start_response(status, self._compressed_headers(headers, encoding), exc_info)
+        return ClosingIterator(compress_chunks(chain(body, chunks), encoding, self.level), callbacks)
+
+    def _compressible(self, status, headers):
+        code = int(status[:3])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        values = {}
+        for name, value in headers:
+            values[name.lower()] = value
+        mimetype = values.get('content-type', '').split(';')[0].strip().lower()
+        if mimetype not in self.mimetypes or 'content-encoding' in values:
+            return False
+        if 'no-transform' in values.get('cache-control', ''):
+            return False
+        length = values.get('content-length')
+        return length is None or int(length) >= self.min_size
+
+    @staticmethod
+    def _compressed_headers(headers, encoding):
+        result = []
+        vary = None
+        for name, value in headers:
+            lower = name.lower()
+            if lower == 'content-length':
+                continue
+            if lower == 'etag' and not value.startswith('W/'):
+                # a representação comprimida é outra sequência de bytes: a
+                # ETag passa a ser fraca (If-None-Match usa comparação fraca)
+                value = f'W/{value}'
+            if lower == 'vary':
+                vary = value
+                continue
+            result.append((name, value))
+        if vary is None:
+            vary = 'Accept-Encoding'
+        elif 'accept-encoding' not in vary.lower():
+            vary = f'{vary}, Accept-Encoding'
+        result.append(('Vary', vary))
+        result.append(('Content-Encoding', encoding))
+        return result
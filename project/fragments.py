@@ -0,0 +1,132 @@
+"""
+Cache de fragmentos de html renderizados
+
+Partes de páginas que mudam raramente (conteúdo da página inicial, about,
+páginas de erro, tabela de ações) são renderizadas uma vez e reutilizadas.
+Cada fragmento é identificado pelo nome, pelos argumentos que alteram o seu
+conteúdo (por exemplo, a versão do portifólio) e pode depender de tags, como
+'portfolio:<user_id>', que permitem invalidar explicitamente todas as entradas
+relacionadas quando os dados mudam.
+
+Nos templates:
+    {% call cache_fragment('about', developer) %} ... {% endcall %}
+
+Nas views:
+    fragments.get_or_render('stocks_table', render, args=(etag,), depends_on=['portfolio:1'])
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from flask import current_app
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """Cache LRU em memória (por processo) com TTL por entrada e invalidação por tag"""
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # chave -> (html, expira em, tags)
+        self._tags = defaultdict(set)  # tag -> chaves
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)  # nome do fragmento -> acertos
+        self._misses = defaultdict(int)
+        self.evictions = 0
+
+    def get_or_render(self, name, render, args=(), depends_on=(), ttl=None):
+        """
+        Retorna o html do fragmento `name` para `args`, chamando `render()` e
+        guardando o resultado se não estiver no cache (ou tiver expirado)
+        """
+        key = (name, *args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self._entries.move_to_end(key)
+                self._hits[name] += 1
+                return entry[0]
+            self._misses[name] += 1
+
+        # renderiza fora do lock: outros fragmentos continuam disponíveis
+        html = Markup(render())
+        expires = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (html, expires, tuple(depends_on))
+            for tag in depends_on:
+                self._tags[tag].add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return html
+
+    def invalidate(self, tag):
+        """Remove todas as entradas que dependem de `tag`. Retorna quantas foram removidas"""
+        with self._lock:
+            keys = list(self._tags.pop(tag, ()))
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        """Acertos, falhas e taxa de acerto de cada fragmento"""
+        with self._lock:
+            return {
+                name: {
+                    'hits': self._hits[name],
+                    'misses': self._misses[name],
+                    'hit_rate': self._hits[name] / (self._hits[name] + self._misses[name]),
+                }
+                for name in sorted(set(self._hits) | set(self._misses))
+            }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for tag in entry[2]:
+                keys = self._tags.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tags[tag]
+
+
+class Fragments:
+    """Extensão Flask que cria o FragmentCache e o disponibiliza aos templates"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['fragments'] = FragmentCache(
+            maxsize=app.config['FRAGMENT_CACHE_SIZE'],
+            ttl=app.config['FRAGMENT_CACHE_TTL']
+        )
+        app.add_template_global(self.template_fragment, 'cache_fragment')
+
+    @property
+    def cache(self):
+        return current_app.extensions['fragments']
+
+    def get_or_render(self, name, render, args=(), depends_on=(), ttl=None):
+        if not current_app.config['FRAGMENT_CACHE_ENABLED']:
+            return Markup(render())
+        return self.cache.get_or_render(name, render, args, depends_on, ttl)
+
+    def template_fragment(self, name, *args, depends_on=(), ttl=None, caller=None):
+        """Usada com {% call cache_fragment(nome, *args) %}: o corpo do bloco é o fragmento"""
+        return self.get_or_render(name, caller, args, depends_on, ttl)
+
+    def invalidate(self, tag):
+        return self.cache.invalidate(tag)
+
+    def stats(self):
+        return self.cache.stats()
@@ -0,0 +1,196 @@
+"""
+Armazenamento em disco do histórico de preços diários
+
+Cada ticket tem um arquivo binário próprio com barras diárias de tamanho fixo
+(date, open, high, low, close, volume), lido com np.memmap: o sistema
+operacional carrega sob demanda apenas as páginas acessadas, e fatias por
+intervalo de datas são views sobre o arquivo, sem parsing nem cópia.
+
+Os arquivos só crescem no final (append-only): uma atualização diária grava
+as novas barras no fim do arquivo e atualiza o índice (index.json), que guarda
+o número de barras e a primeira/última data de cada ticket.
+
+O índice é o ponto de confirmação de um append: as barras são gravadas (com
+fsync) antes, e o índice é substituído atomicamente depois. Leitores só
+enxergam as barras contadas no índice, e barras além dele (de um append
+interrompido) são descartadas no próximo append. Appends de processos
+diferentes são serializados por um lock de arquivo (fcntl.flock).
+
+Assim como em Stock.purchase_price, os preços são inteiros multiplicados por 100.
+"""
+import fcntl
+import json
+import os
+import threading
+import numpy as np
+from flask import current_app
+
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', '<i8'),
+    ('high', '<i8'),
+    ('low', '<i8'),
+    ('close', '<i8'),
+    ('volume', '<i8'),
+])
+
+INDEX_FILENAME = 'index.json'
+LOCK_FILENAME = '.lock'
+
+
+class PriceHistoryStore:
+    """Histórico de preços em um diretório, com um arquivo memory-mapped por ticket"""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._maps = {}  # symbol -> (tamanho do arquivo, memmap)
+        self._index = None
+
+    def symbols(self):
+        return sorted(self._load_index())
+
+    def info(self, symbol):
+        """Número de barras e primeira/última data de `symbol` (None se ausente)"""
+        return self._load_index().get(symbol.upper())
+
+    def read(self, symbol, start=None, end=None):
+        """
+        Barras de `symbol` com data entre `start` e `end` (inclusive), como uma
+        view somente leitura sobre o arquivo. As datas podem ser strings ISO,
+        datetime.date ou np.datetime64
+        """
+        bars = self._memmap(symbol.upper())
+        if len(bars) == 0 or (start is None and end is None):
+            return bars
+        # busca binária na coluna de datas: toca apenas as páginas necessárias
+        dates = bars['date']
+        first = 0 if start is None else np.searchsorted(dates, np.datetime64(start, 'D'), side='left')
+        last = len(bars) if end is None else np.searchsorted(dates, np.datetime64(end, 'D'), side='right')
+        return bars[first:last]
+
+    def append(self, symbol, bars):
+        """
+        Adiciona barras ao fim do histórico de `symbol`. `bars` pode ser um
+        array com dtype BAR_DTYPE ou um dict de colunas. As datas devem ser
+        crescentes e posteriores à última barra gravada. Retorna o número de
+        barras adicionadas
+        """
+        symbol = symbol.upper()
+        bars = _to_bars(bars)
+        if len(bars) == 0:
+            return 0
+        if np.any(np.diff(bars['date']).astype(np.int64) <= 0):
+            raise ValueError('as datas das barras devem ser estritamente crescentes')
+
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, LOCK_FILENAME), 'a') as lock_file:
+            # o lock de threads não vale entre processos
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # outro processo pode ter atualizado o índice no mesmo instante (mtime igual)
+            self._index = None
+            index = dict(self._load_index())
+            info = index.get(symbol)
+            if info is not None and bars['date'][0] <= np.datetime64(info['last'], 'D'):
+                raise ValueError(f'{symbol} já possui barras até {info["last"]}')
+
+            with open(self._path(symbol), 'ab') as file:
+                # descarta barras de um append interrompido antes de atualizar o índice
+                file.truncate((info['rows'] if info else 0) * BAR_DTYPE.itemsize)
+                file.write(bars.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+
+            index[symbol] = {
+                'rows': (info['rows'] if info else 0) + len(bars),
+                'first': info['first'] if info else str(bars['date'][0]),
+                'last': str(bars['date'][-1]),
+            }
+            self._write_index(index)
+        return len(bars)
+
+    def close_matrix(self, symbols, start=None, end=None):
+        """
+        Datas em comum e matriz de fechamentos (dias x tickets) para `symbols`
+        no intervalo, no formato esperado por project.analytics. Apenas os
+        dias presentes em todos os tickets são mantidos
+        """
+        series = [self.read(symbol, start, end) for symbol in symbols]
+        if not series:
+            return np.array([], dtype='datetime64[D]'), np.empty((0, 0), dtype=np.int64)
+        dates = series[0]['date']
+        for bars in series[1:]:
+            dates = np.intersect1d(dates, bars['date'], assume_unique=True)
+        matrix = np.empty((len(dates), len(series)), dtype=np.int64)
+        for column, bars in enumerate(series):
+            matrix[:, column] = bars['close'][np.searchsorted(bars['date'], dates)]
+        return np.asarray(dates), matrix
+
+    def _path(self, symbol):
+        return os.path.join(self.root, f'{symbol}.bars')
+
+    def _memmap(self, symbol):
+        path = self._path(symbol)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return np.empty(0, dtype=BAR_DTYPE)
+        # considera apenas as barras confirmadas no índice (um append pode estar
+        # em andamento ou ter sido interrompido)
+        info = self._load_index().get(symbol)
+        rows = min(size // BAR_DTYPE.itemsize, info['rows'] if info else 0)
+        if rows == 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+        with self._lock:
+            cached = self._maps.get(symbol)
+            if cached is None or cached[0] != rows:
+                # o arquivo cresceu: um novo mapeamento cobre as barras adicionadas
+                cached = self._maps[symbol] = (rows, np.memmap(path, dtype=BAR_DTYPE, mode='r', shape=(rows,)))
+            return cached[1]
+
+    def _load_index(self):
+        path = os.path.join(self.root, INDEX_FILENAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return {}
+        if self._index is None or self._index[0] != mtime:
+            with open(path, encoding='utf-8') as file:
+                self._index = (mtime, json.load(file))
+        return self._index[1]
+
+    def _write_index(self, index):
+        # grava em um arquivo temporário e substitui: leitores nunca veem um índice pela metade
+        path = os.path.join(self.root, INDEX_FILENAME)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(index, file, indent=2, sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+        self._index = None
+
+
+def _to_bars(bars):
+    if isinstance(bars, np.ndarray) and bars.dtype == BAR_DTYPE:
+        return bars
+    columns = {name: np.atleast_1d(np.asarray(bars[name])) for name in BAR_DTYPE.names}
+    result = np.empty(len(columns['date']), dtype=BAR_DTYPE)
+    for name, values in columns.items():
+        result[name] = values
+    return result
+
+
+class PriceHistory:
+    """Extensão Flask que abre o PriceHistoryStore em PRICE_HISTORY_DIR"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['price_history'] = PriceHistoryStore(app.config['PRICE_HISTORY_DIR'])
+
+    @property
+    def store(self):
+        return current_app.extensions['price_history']
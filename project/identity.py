@@ -0,0 +1,140 @@
+"""
+Cache da identidade do usuário logado (user_loader do Flask-Login)
+
+O Flask-Login recarrega o usuário da sessão a cada requisição autenticada. Em
+vez de um objeto User completo, o loader retorna uma UserIdentity com apenas
+as colunas usadas por current_user (id, email e email_confirmed), guardada em
+um cache em memória (por processo) com TTL curto.
+
+Alterações em usuários gravadas pelo ORM removem a identidade do cache quando
+a transação é confirmada. Outros processos só enxergam a mudança quando a
+entrada expira (LOGIN_CACHE_TTL); deployments que não toleram essa janela
+podem desligar o cache com LOGIN_CACHE_ENABLED = False.
+"""
+import threading
+import time
+from collections import OrderedDict
+import flask_login
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from project.replicas import reading
+
+
+class UserIdentity(flask_login.UserMixin):
+    """Dados do usuário logado disponíveis em current_user (somente leitura)"""
+    __slots__ = ('id', 'email', 'email_confirmed')
+
+    def __init__(self, id, email, email_confirmed):
+        self.id = id
+        self.email = email
+        self.email_confirmed = email_confirmed
+
+    def __repr__(self):
+        return f'<UserIdentity: {self.email}>'
+
+
+class IdentityCache:
+    """Cache LRU de UserIdentity por id de usuário, com TTL por entrada"""
+
+    def __init__(self, ttl=30, maxsize=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries = OrderedDict()  # user_id -> (UserIdentity, expira em)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > self._clock():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def set(self, identity):
+        with self._lock:
+            self._entries[identity.id] = (identity, self._clock() + self.ttl)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids=None):
+        """Remove as identidades de `user_ids` (ou todas, se None)"""
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+            for user_id in user_ids or ():
+                self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+class Identities:
+    """Extensão Flask com o cache de identidades usado pelo user_loader"""
+
+    def __init__(self, app=None, database=None):
+        self.database = database
+        if app is not None:
+            self.init_app(app, database)
+
+    def init_app(self, app, database=None):
+        self.database = database or self.database
+        app.extensions['identity'] = IdentityCache(app.config['LOGIN_CACHE_TTL'], app.config['LOGIN_CACHE_SIZE'])
+
+    @property
+    def cache(self):
+        return current_app.extensions['identity']
+
+    def load(self, user_id):
+        """UserIdentity do usuário `user_id` ou None se ele não existir"""
+        if not current_app.config['LOGIN_CACHE_ENABLED']:
+            return self._query(user_id)
+        identity = self.cache.get(user_id)
+        if identity is None:
+            identity = self._query(user_id)
+            if identity is not None:
+                self.cache.set(identity)
+        return identity
+
+    def _query(self, user_id):
+        from project.models import User
+
+        query = (self.database.select(User.id, User.email, User.email_confirmed)
+                 .where(User.id == user_id))
+        # o user_loader roda em toda requisição autenticada: lê de uma réplica
+        with reading(self.database.session) as session:
+            row = session.execute(query).first()
+        return UserIdentity(*row) if row is not None else None
+
+    def stats(self):
+        return self.cache.stats()
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_changed_users(flush_session, flush_context):
+    from project.models import User
+
+    changed = {instance.id for instance in (*flush_session.dirty, *flush_session.deleted)
+               if isinstance(instance, User)}
+    if changed:
+        flush_session.info.setdefault('changed_users', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_changed_users(commit_session):
+    # a identidade só é removida depois do commit: antes disso, outra
+    # requisição ainda leria do banco os valores antigos e os guardaria
+    changed = commit_session.info.pop('changed_users', None)
+    if changed and has_app_context() and 'identity' in current_app.extensions:
+        current_app.extensions['identity'].invalidate(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_changed_users(rollback_session):
+    rollback_session.info.pop('changed_users', None)
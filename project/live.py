@@ -0,0 +1,236 @@
+"""
+Atualizações em tempo real do valor dos portifólios (Server-Sent Events)
+
+Cada conexão em /stocks/live é um Subscriber, com as posições do usuário e
+uma fila limitada de eventos. O PortfolioBroker faz o fan-out: quando o preço
+de um ticket muda, o evento é calculado uma única vez e entregue apenas aos
+assinantes que possuem o ticket, cada um com a variação do valor da sua
+posição. Se a fila de um assinante lento enche, ele é descartado e o cliente
+(EventSource) reconecta, recebendo um novo snapshot.
+
+As mudanças são detectadas por uma thread por processo que consulta as tabelas
+quotes e positions (colunas updated_on), então funciona tanto no servidor de
+desenvolvimento com threads quanto com vários processos WSGI: cada processo
+observa o banco e notifica os seus próprios assinantes.
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+
+
+class Subscriber:
+    """Uma conexão SSE: posições do usuário (symbol -> ações) e fila de eventos"""
+
+    def __init__(self, user_id, holdings, max_queue):
+        self.user_id = user_id
+        self.holdings = dict(holdings)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = False
+
+    def next_event(self, timeout):
+        """Próximo evento SSE (str) ou None se nada chegar em `timeout` segundos"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def format_event(event_type, data):
+    return f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class PortfolioBroker:
+    """Distribui mudanças de preço e de posições para os assinantes do processo"""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self.prices = {}  # último preço conhecido de cada ticket
+        self._by_symbol = {}  # symbol -> set(Subscriber)
+        self._by_user = {}  # user_id -> set(Subscriber)
+        self._lock = threading.Lock()
+        self.published = self.delivered = self.dropped = 0
+
+    def subscribe(self, user_id, holdings, prices):
+        subscriber = Subscriber(user_id, holdings, self.max_queue)
+        with self._lock:
+            for symbol, price in prices.items():
+                self.prices.setdefault(symbol, price)
+            for symbol in subscriber.holdings:
+                self._by_symbol.setdefault(symbol, set()).add(subscriber)
+            self._by_user.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._remove(subscriber)
+
+    def symbols(self):
+        with self._lock:
+            return list(self._by_symbol)
+
+    def user_ids(self):
+        with self._lock:
+            return list(self._by_user)
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._by_user)
+
+    def publish_price(self, symbol, price):
+        """Envia a mudança de preço de `symbol` a quem possui o ticket"""
+        with self._lock:
+            old_price = self.prices.get(symbol)
+            self.prices[symbol] = price
+            if price is None or price == old_price:
+                return 0
+            self.published += 1
+            # as posições são lidas sob o lock: publish_holdings as altera
+            deliveries = [(subscriber, subscriber.holdings.get(symbol, 0))
+                          for subscriber in self._by_symbol.get(symbol, ())]
+        # a parte comum do evento é calculada uma vez por tick; fora do lock
+        # só a string de cada evento é montada
+        difference = price - (old_price or 0)
+        return self._deliver(
+            (subscriber, format_event('price', {'symbol': symbol, 'price': price,
+                                                'value_delta': shares * difference}))
+            for subscriber, shares in deliveries
+        )
+
+    def publish_holdings(self, user_id, symbol, shares):
+        """Envia a nova quantidade de ações de `symbol` aos assinantes de `user_id`"""
+        with self._lock:
+            price = self.prices.get(symbol) or 0
+            deltas = []
+            for subscriber in self._by_user.get(user_id, ()):
+                old_shares = subscriber.holdings.get(symbol, 0)
+                if old_shares == shares:
+                    continue
+                # posições e índice por ticket mudam juntos: _remove (sob o
+                # mesmo lock) sempre enxerga os dois consistentes
+                subscriber.holdings[symbol] = shares
+                self._by_symbol.setdefault(symbol, set()).add(subscriber)
+                deltas.append((subscriber, (shares - old_shares) * price))
+
+        return self._deliver(
+            (subscriber, format_event('holdings', {'symbol': symbol, 'shares': shares,
+                                                   'price': price, 'value_delta': delta}))
+            for subscriber, delta in deltas
+        )
+
+    def _deliver(self, events):
+        """Coloca cada evento (subscriber, str) na fila do seu assinante"""
+        delivered = 0
+        for subscriber, event in events:
+            try:
+                subscriber.queue.put_nowait(event)
+                delivered += 1
+            except queue.Full:
+                # consumidor lento: descarta em vez de acumular memória ou
+                # atrasar os demais. O cliente reconecta e recebe um snapshot
+                subscriber.dropped = True
+                with self._lock:
+                    self._remove(subscriber)
+                    self.dropped += 1
+        with self._lock:
+            self.delivered += delivered
+        return delivered
+
+    def _remove(self, subscriber):
+        for symbol in subscriber.holdings:
+            subscribers = self._by_symbol.get(symbol)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._by_symbol[symbol]
+        subscribers = self._by_user.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._by_user[subscriber.user_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': sum(len(subscribers) for subscribers in self._by_user.values()),
+                'published': self.published,
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+            }
+
+
+class LiveUpdates:
+    """Extensão Flask com o broker do processo e a thread que observa o banco"""
+
+    def __init__(self, app=None, database=None):
+        self.database = database
+        if app is not None:
+            self.init_app(app, database)
+
+    def init_app(self, app, database=None):
+        self.database = database or self.database
+        app.extensions['live'] = {
+            'broker': PortfolioBroker(app.config['LIVE_QUEUE_SIZE']),
+            'poller': None,
+            'lock': threading.Lock(),
+        }
+
+    @property
+    def broker(self):
+        return current_app.extensions['live']['broker']
+
+    def subscribe(self, user_id, holdings, prices):
+        """Registra um assinante e garante que a thread de observação está rodando"""
+        state = current_app.extensions['live']
+        with state['lock']:
+            if state['poller'] is None or not state['poller'].is_alive():
+                state['poller'] = threading.Thread(
+                    target=self._poll, args=(current_app._get_current_object(),),
+                    name='live-poller', daemon=True
+                )
+                state['poller'].start()
+        return state['broker'].subscribe(user_id, holdings, prices)
+
+    def _poll(self, app):
+        broker = app.extensions['live']['broker']
+        since = datetime.now()
+        while True:
+            time.sleep(app.config['LIVE_POLL_INTERVAL'])
+            if not broker.has_subscribers():
+                since = datetime.now()
+                continue
+            try:
+                since = self._publish_changes(app, broker, since)
+            except Exception:
+                # a thread precisa sobreviver a erros transitórios do banco
+                app.logger.exception('Erro ao buscar atualizações para os assinantes SSE')
+
+    def _publish_changes(self, app, broker, since):
+        from project.models import Position, Quote
+
+        # updated_on é preenchido antes do commit: uma transação que marcou um
+        # horário anterior pode aparecer depois de uma consulta que já passou
+        # dele. Por isso cada consulta relê os últimos LIVE_POLL_OVERLAP
+        # segundos; valores repetidos não geram eventos
+        start = since - timedelta(seconds=app.config['LIVE_POLL_OVERLAP'])
+        with app.app_context():
+            quotes = self.database.session.execute(
+                self.database.select(Quote.stock_symbol, Quote.price, Quote.updated_on)
+                .where(Quote.updated_on >= start)
+                .where(Quote.stock_symbol.in_(broker.symbols()))
+            ).all()
+            positions = self.database.session.execute(
+                self.database.select(Position.user_id, Position.stock_symbol,
+                                     Position.number_of_shares, Position.updated_on)
+                .where(Position.updated_on >= start)
+                .where(Position.user_id.in_(broker.user_ids()))
+            ).all()
+        for symbol, price, updated_on in quotes:
+            broker.publish_price(symbol, price)
+            since = max(since, updated_on)
+        for user_id, symbol, shares, updated_on in positions:
+            broker.publish_holdings(user_id, symbol, shares)
+            since = max(since, updated_on)
+        return since
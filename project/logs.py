@@ -0,0 +1,98 @@
+"""
+Logging sem I/O nas threads das requisições
+
+As threads da aplicação só colocam os registros de log em uma fila em memória
+(LocalQueueHandler). Uma thread de fundo (QueueListener) formata os registros
+e os grava no arquivo, que é rotacionado por tamanho ou por tempo. A saída
+pode ser texto ou JSON lines (um objeto JSON por linha).
+
+As mensagens devem usar formatação preguiçosa, com os argumentos separados:
+    logger.info('Logged in user: %s', user.email)
+e não f-strings: assim o texto só é montado se o nível do log estiver ativo.
+"""
+import copy
+import json
+import logging
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from flask import has_request_context, request
+
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(filename)s:%(lineno)d]'
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como um objeto JSON em uma linha"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'file': record.filename,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        for field in ('method', 'path', 'remote_addr'):
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    QueueHandler para uma fila no próprio processo: o registro não precisa ser
+    serializado, então a formatação completa fica para a thread de fundo
+    """
+
+    def __init__(self, log_queue, listener=None):
+        super().__init__(log_queue)
+        self.listener = listener
+
+    def prepare(self, record):
+        # só a mensagem é montada aqui, enquanto os argumentos ainda são
+        # válidos (podem depender da requisição); data, JSON e traceback são
+        # formatados na thread de fundo
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if has_request_context():
+            record.method = request.method
+            record.path = request.path
+            record.remote_addr = request.remote_addr
+        return record
+
+    def close(self):
+        if self.listener is not None:
+            # stop() grava os registros que ainda estão na fila
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+        super().close()
+
+
+def build_file_handler(config):
+    """Handler que grava no arquivo de log, rotacionado por tamanho ou tempo, conforme a configuração"""
+    if config['LOG_ROTATION'] == 'time':
+        handler = TimedRotatingFileHandler(config['LOG_FILE'], when=config['LOG_ROTATION_WHEN'],
+                                           backupCount=config['LOG_BACKUP_COUNT'], encoding='utf-8')
+    else:
+        # quando o arquivo chega no tamanho determinado, move o arquivo para
+        # arquivo.1 e outro arquivo com o mesmo nome original é criado
+        handler = RotatingFileHandler(config['LOG_FILE'], maxBytes=config['LOG_MAX_BYTES'],
+                                      backupCount=config['LOG_BACKUP_COUNT'], encoding='utf-8')
+    handler.setFormatter(JsonFormatter() if config['LOG_FORMAT'] == 'json' else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def queued_handler(*handlers):
+    """LocalQueueHandler cujos registros são entregues a `handlers` por uma thread de fundo já iniciada"""
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return LocalQueueHandler(log_queue, listener)
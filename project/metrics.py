@@ -0,0 +1,360 @@
+"""
+Métricas das requisições por endpoint, expostas em /metrics (formato Prometheus)
+
+Para cada endpoint (ex.: stocks.list_stocks) são registrados um histograma de
+latência, o número de respostas por status, as requisições em andamento e o
+número de queries SQL executadas. O custo por requisição é o de algumas
+operações em dicts protegidas por um lock, em memória.
+
+Cada processo mantém os próprios contadores. Com METRICS_DIR configurado, cada
+processo do servidor grava periodicamente (METRICS_FLUSH_INTERVAL) um snapshot
+em METRICS_DIR/metrics-<pid>.json e /metrics soma os snapshots de todos os
+processos, de forma que o Prometheus vê o total independente de qual processo
+respondeu. A gravação começa na primeira requisição atendida pelo processo:
+comandos (`flask db upgrade`, `flask worker`, `flask dev seed` etc) não
+deixam snapshots.
+
+Limpeza: o último snapshot de um processo, gravado ao encerrar, não tem
+requisições em andamento. Um snapshot que não é atualizado há
+METRICS_RETIRE_AFTER segundos é de um processo encerrado: o primeiro processo
+vivo que o encontra o reivindica (rename atômico), soma os contadores dele aos
+seus e o remove. Os contadores continuam no total, mas a pasta fica com cerca
+de um arquivo por processo vivo, em vez de um por processo que já existiu.
+
+Também são exportadas as estatísticas dos caches (cotações, fragmentos e
+identidades) e do limite de tentativas de login.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsRegistry:
+    """Contadores das requisições de um processo"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._requests = {}  # (endpoint, método) -> [contagem por bucket, soma, total, queries]
+        self._responses = {}  # (endpoint, método, status) -> total
+        self._in_flight = {}  # endpoint -> requisições em andamento
+        # estatísticas de caches e de login de processos encerrados absorvidos
+        self._absorbed = {'caches': {}, 'login_attempts': {}}
+        self._lock = threading.Lock()
+
+    def begin(self, endpoint):
+        with self._lock:
+            self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+
+    def end(self, endpoint, method, status, duration, queries):
+        # o bucket é calculado fora do lock; na exportação os buckets são acumulados
+        index = bisect.bisect_left(self.buckets, duration)
+        with self._lock:
+            self._in_flight[endpoint] -= 1
+            entry = self._requests.get((endpoint, method))
+            if entry is None:
+                entry = self._requests[(endpoint, method)] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0]
+            entry[0][index] += 1
+            entry[1] += duration
+            entry[2] += 1
+            entry[3] += queries
+            key = (endpoint, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def absorb(self, snapshot):
+        """Soma aos contadores os do snapshot de um processo encerrado (com os mesmos buckets)"""
+        if snapshot['buckets'] != list(self.buckets):
+            raise ValueError(f'buckets diferentes: {snapshot["buckets"]}')
+        with self._lock:
+            for endpoint, method, counts, duration, count, queries in snapshot['requests']:
+                entry = self._requests.get((endpoint, method))
+                if entry is None:
+                    entry = self._requests[(endpoint, method)] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0]
+                entry[0] = [total + value for total, value in zip(entry[0], counts)]
+                entry[1] += duration
+                entry[2] += count
+                entry[3] += queries
+            for endpoint, method, status, count in snapshot['responses']:
+                key = (endpoint, method, status)
+                self._responses[key] = self._responses.get(key, 0) + count
+            for group, totals in self._absorbed.items():
+                _add_stats(totals, snapshot.get(group, {}))
+
+    def snapshot(self):
+        """Estado atual em uma estrutura serializável em JSON"""
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'requests': [[endpoint, method, list(counts), duration, count, queries]
+                             for (endpoint, method), (counts, duration, count, queries) in self._requests.items()],
+                'responses': [[*key, count] for key, count in self._responses.items()],
+                'in_flight': dict(self._in_flight),
+                **{group: {name: dict(values) for name, values in totals.items()}
+                   for group, totals in self._absorbed.items()},
+            }
+
+
+def _add_stats(totals, stats):
+    """Soma `stats` (nome -> {campo: valor}) em `totals`"""
+    for name, values in stats.items():
+        fields = totals.setdefault(name, {})
+        for field, value in values.items():
+            fields[field] = fields.get(field, 0) + value
+
+
+def merge_snapshots(snapshots):
+    """Soma os snapshots de vários processos (com os mesmos buckets)"""
+    merged = {'buckets': [], 'requests': {}, 'responses': {}, 'in_flight': {}, 'caches': {}, 'login_attempts': {}}
+    for snapshot in snapshots:
+        merged['buckets'] = snapshot['buckets']
+        for endpoint, method, counts, duration, count, queries in snapshot['requests']:
+            entry = merged['requests'].setdefault((endpoint, method), [[0] * len(counts), 0.0, 0, 0])
+            entry[0] = [total + value for total, value in zip(entry[0], counts)]
+            entry[1] += duration
+            entry[2] += count
+            entry[3] += queries
+        for endpoint, method, status, count in snapshot['responses']:
+            key = (endpoint, method, status)
+            merged['responses'][key] = merged['responses'].get(key, 0) + count
+        for endpoint, count in snapshot['in_flight'].items():
+            merged['in_flight'][endpoint] = merged['in_flight'].get(endpoint, 0) + count
+        for group in ('caches', 'login_attempts'):
+            _add_stats(merged[group], snapshot.get(group, {}))
+    return merged
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged):
+    """Texto no formato de exposição do Prometheus"""
+    lines = [
+        '# HELP stonks_request_duration_seconds Latência das requisições por endpoint',
+        '# TYPE stonks_request_duration_seconds histogram',
+    ]
+    for (endpoint, method), (counts, duration, count, _) in sorted(merged['requests'].items()):
+        cumulative = 0
+        for bound, value in zip([*merged['buckets'], '+Inf'], counts):
+            cumulative += value
+            le = bound if bound == '+Inf' else _number(float(bound))
+            lines.append(f'stonks_request_duration_seconds_bucket{{{_labels(endpoint=endpoint, method=method, le=le)}}} {cumulative}')
+        lines.append(f'stonks_request_duration_seconds_sum{{{_labels(endpoint=endpoint, method=method)}}} {_number(duration)}')
+        lines.append(f'stonks_request_duration_seconds_count{{{_labels(endpoint=endpoint, method=method)}}} {count}')
+
+    lines += ['# HELP stonks_responses_total Respostas por endpoint e status',
+              '# TYPE stonks_responses_total counter']
+    for (endpoint, method, status), count in sorted(merged['responses'].items()):
+        lines.append(f'stonks_responses_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+
+    lines += ['# HELP stonks_requests_in_flight Requisições em andamento por endpoint',
+              '# TYPE stonks_requests_in_flight gauge']
+    for endpoint, count in sorted(merged['in_flight'].items()):
+        lines.append(f'stonks_requests_in_flight{{{_labels(endpoint=endpoint)}}} {count}')
+
+    lines += ['# HELP stonks_db_queries_total Queries SQL executadas pelas requisições de cada endpoint',
+              '# TYPE stonks_db_queries_total counter']
+    for (endpoint, method), (_, _, _, queries) in sorted(merged['requests'].items()):
+        lines.append(f'stonks_db_queries_total{{{_labels(endpoint=endpoint, method=method)}}} {queries}')
+
+    lines += ['# HELP stonks_cache_requests_total Consultas aos caches em memória, por resultado',
+              '# TYPE stonks_cache_requests_total counter']
+    for cache, values in sorted(merged['caches'].items()):
+        for result in ('hits', 'misses'):
+            lines.append(f'stonks_cache_requests_total{{{_labels(cache=cache, result=result)}}} {values.get(result, 0)}')
+
+    lines += ['# HELP stonks_login_attempts_total Tentativas de login por limitador e resultado',
+              '# TYPE stonks_login_attempts_total counter']
+    for limiter, values in sorted(merged['login_attempts'].items()):
+        for result in ('allowed', 'rejected'):
+            lines.append(f'stonks_login_attempts_total{{{_labels(limiter=limiter, result=result)}}} {values.get(result, 0)}')
+    return '\n'.join(lines) + '\n'
+
+
+def process_snapshot(registry):
+    """Snapshot de `registry` com as estatísticas das extensões do processo (requer o contexto da aplicação)"""
+    snapshot = registry.snapshot()
+    for group, stats in collect_extension_stats().items():
+        _add_stats(snapshot.setdefault(group, {}), stats)
+    return snapshot
+
+
+def collect_extension_stats():
+    """Acertos e falhas dos caches e tentativas de login do processo (requer o contexto da aplicação)"""
+    from project import fragments, identities, login_throttle, quotes
+
+    quote_stats, identity_stats = quotes.stats(), identities.stats()
+    fragment_stats = fragments.stats().values()
+    return {
+        'caches': {
+            'quotes': {'hits': quote_stats['hits'], 'misses': quote_stats['misses']},
+            'identity': {'hits': identity_stats['hits'], 'misses': identity_stats['misses']},
+            'fragments': {'hits': sum(stats['hits'] for stats in fragment_stats),
+                          'misses': sum(stats['misses'] for stats in fragment_stats)},
+        },
+        'login_attempts': login_throttle.stats(),
+    }
+
+
+class Metrics:
+    """Extensão Flask que instrumenta as requisições e registra a rota /metrics"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        registry = MetricsRegistry(app.config['METRICS_BUCKETS'])
+        app.extensions['metrics'] = registry
+        if not app.config['METRICS_ENABLED']:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        directory = app.config['METRICS_DIR']
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        started = threading.Event()
+        start_lock = threading.Lock()
+
+        # só processos que atendem requisições gravam snapshots; o pid é o do
+        # worker que atendeu (e não o do processo que criou a aplicação antes do fork)
+        @app.before_request
+        def start_flusher():
+            if started.is_set():
+                return
+            with start_lock:
+                if started.is_set():
+                    return
+                path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+                flusher = threading.Thread(target=self._flush_periodically,
+                                           args=(app, registry, path, app.config['METRICS_FLUSH_INTERVAL']),
+                                           name='metrics-flush', daemon=True)
+                flusher.start()
+                atexit.register(self._flush, app, registry, path, final=True)
+                started.set()
+
+    @property
+    def registry(self):
+        return current_app.extensions['metrics']
+
+    @staticmethod
+    def _endpoint():
+        # rotas inexistentes ficam agrupadas: a url não vira label
+        return request.endpoint or '<unmatched>'
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        self.registry.begin(self._endpoint())
+
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, exception):
+        # com stream_with_context, o teardown só acontece no fim do streaming,
+        # então a latência inclui a geração de todo o corpo da resposta
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        status = g.pop('metrics_status', 500 if exception is not None else 200)
+        self.registry.end(self._endpoint(), request.method, status,
+                          time.perf_counter() - start, g.pop('metrics_queries', 0))
+
+    def snapshot(self):
+        """Snapshot do processo atual, incluindo os caches e as tentativas de login"""
+        return process_snapshot(self.registry)
+
+    def metrics_view(self):
+        snapshots = [self.snapshot()]
+        directory = current_app.config['METRICS_DIR']
+        if directory:
+            own = os.path.join(directory, f'metrics-{os.getpid()}.json')
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path, encoding='utf-8') as file:
+                        snapshots.append(json.load(file))
+                except (OSError, ValueError):
+                    # arquivo removido ou sendo substituído: fica para a próxima coleta
+                    continue
+        return Response(render(merge_snapshots(snapshots)), content_type=CONTENT_TYPE)
+
+    def _flush(self, app, registry, path, final=False):
+        with app.app_context():
+            snapshot = process_snapshot(registry)
+        if final:
+            snapshot['in_flight'] = {}
+        # troca atômica: quem lê nunca vê um arquivo pela metade
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(snapshot, file)
+        os.replace(temporary, path)
+
+    def _flush_periodically(self, app, registry, path, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                retired = self._absorb_retired(app, registry, path)
+                self._flush(app, registry, path)
+                # só depois que os contadores absorvidos estão no snapshot deste processo
+                for retired_path in retired:
+                    os.remove(retired_path)
+            except Exception:
+                app.logger.exception('Metrics: falha ao gravar %s', path)
+
+    def _absorb_retired(self, app, registry, own_path):
+        """
+        Reivindica os snapshots não atualizados há METRICS_RETIRE_AFTER segundos
+        (de processos encerrados) e soma os seus contadores a `registry`.
+        Retorna os arquivos reivindicados, a remover depois do próximo flush
+        """
+        stale_before = time.time() - app.config['METRICS_RETIRE_AFTER']
+        retired = []
+        for path in glob.glob(os.path.join(os.path.dirname(own_path), 'metrics-*.json')):
+            if path == own_path:
+                continue
+            retired_path = f'{path}.retired-{os.getpid()}'
+            try:
+                if os.path.getmtime(path) >= stale_before:
+                    continue
+                # rename é atômico: cada snapshot é absorvido por um único processo
+                os.rename(path, retired_path)
+            except OSError:
+                continue
+            try:
+                with open(retired_path, encoding='utf-8') as file:
+                    registry.absorb(json.load(file))
+            except (OSError, ValueError, KeyError) as e:
+                app.logger.warning('Metrics: snapshot %s descartado: %s', path, e)
+            retired.append(retired_path)
+        return retired
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(connection, cursor, statement, parameters, context, executemany):
+    # conta as queries da requisição atual; fora de requisições (jobs, CLI) é ignorado
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries += 1
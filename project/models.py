@@ -1,9 +1,9 @@
 import flask_login
 from datetime import datetime
-from project import database
-from sqlalchemy import Integer, String, DateTime, Boolean
+from project import database, passwords
+from sqlalchemy import Integer, String, DateTime, Boolean, ForeignKey, Index, Text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import mapped_column
-from werkzeug.security import generate_password_hash, check_password_hash
 
 
 class Stock(database.Model):
@@ -14,6 +14,7 @@ class Stock(database.Model):
         stock symbol (string) = ticket da ação
         number of shares (integer) = número de ações
         purchased price (integer) = preço de compra
+        user id (integer) = id do usuário dono da ação (chave estrangeira)
 
     Nota: os preços de compra são definidos como inteiros para evitar problemas
           com ponto flutuante. Valores são multiplicados por 100 ao salvar
@@ -29,16 +30,162 @@ class Stock(database.Model):
     stock_symbol = mapped_column(String())
     number_of_shares = mapped_column(Integer())
     purchase_price = mapped_column(Integer())
+    user_id = mapped_column(ForeignKey('users.id'))
 
-    def __init__(self, stock_symbol: str, number_of_shares: str, purchase_price: str):
+    # índice composto: as listagens filtram por usuário e paginam por id, então
+    # o custo de ler um portifólio não depende do número de usuários na tabela
+    __table_args__ = (
+        Index('ix_stocks_user_id_id', 'user_id', 'id'),
+    )
+
+    def __init__(self, stock_symbol: str, number_of_shares: str, purchase_price: str, user_id: int):
         self.stock_symbol = stock_symbol
         self.number_of_shares = int(number_of_shares)
         self.purchase_price = int(float(purchase_price) * 100)
+        self.user_id = user_id
 
     def __repr__(self):
         return f'{self.stock_symbol} - {self.number_of_shares} ações compradas por R$ {self.purchase_price / 100}'
 
 
+class Quote(database.Model):
+    """
+    Classe que representa a última cotação conhecida de uma ação
+
+    A tabela é preenchida pelo job de atualização de cotações
+    (project/stocks/tasks.py), de forma que as requisições apenas leem preços
+    já calculados:
+        stock symbol (string) = ticket da ação
+        price (integer) = preço atual (x100, como em Stock.purchase_price)
+        updated on (datetime) = data em que o preço foi obtido
+    """
+    __tablename__ = 'quotes'
+
+    stock_symbol = mapped_column(String(), primary_key=True)
+    price = mapped_column(Integer())
+    updated_on = mapped_column(DateTime(), index=True)
+
+    def __repr__(self):
+        return f'<Quote: {self.stock_symbol} - R$ {self.price / 100}>'
+
+
+class Job(database.Model):
+    """
+    Classe que representa o estado persistido de um job periódico
+
+    Guardar o estado no banco permite que vários processos (servidor web e
+    `flask worker`) compartilhem o agendamento: um job só roda quando um
+    processo consegue marcá-lo como 'running' com um UPDATE condicional
+    (ver project/scheduler.py):
+        name (string) = nome do job
+        status (string) = idle, running ou failed
+        attempts (integer) = falhas consecutivas, usadas no backoff
+        next run on (datetime) = quando o job deve rodar novamente
+        last started on / last finished on (datetime) = última execução
+        last error (string) = mensagem da última falha
+    """
+    __tablename__ = 'jobs'
+
+    name = mapped_column(String(), primary_key=True)
+    status = mapped_column(String(), default='idle')
+    attempts = mapped_column(Integer(), default=0)
+    next_run_on = mapped_column(DateTime())
+    last_started_on = mapped_column(DateTime())
+    last_finished_on = mapped_column(DateTime())
+    last_error = mapped_column(String())
+
+    def __repr__(self):
+        return f'<Job: {self.name} ({self.status})>'
+
+
+class Position(database.Model):
+    """
+    Classe que representa a posição consolidada de um usuário em uma ação
+
+    É um resumo materializado da tabela stocks, mantido na mesma transação de
+    cada inserção de ações (ver project/stocks/positions.py):
+        user id (integer) = id do usuário dono da posição
+        stock symbol (string) = ticket da ação
+        number of shares (integer) = soma do número de ações de todos os lotes
+        total cost (integer) = soma de número de ações * preço de compra (x100)
+        updated on (datetime) = data da última alteração na posição
+    """
+    __tablename__ = 'positions'
+
+    user_id = mapped_column(ForeignKey('users.id'), primary_key=True)
+    stock_symbol = mapped_column(String(), primary_key=True)
+    number_of_shares = mapped_column(Integer(), default=0)
+    total_cost = mapped_column(Integer(), default=0)
+    updated_on = mapped_column(DateTime())
+
+    @property
+    def average_price(self):
+        """Preço médio de compra (x100), como em Stock.purchase_price"""
+        if not self.number_of_shares:
+            return 0
+        return self.total_cost / self.number_of_shares
+
+    def __repr__(self):
+        return f'<Position: {self.stock_symbol} - {self.number_of_shares} ações>'
+
+
+class PortfolioVersion(database.Model):
+    """
+    Classe que representa a versão do portifólio de um usuário
+
+    O número é incrementado em toda inserção, alteração ou remoção de ações do
+    usuário (ver project/stocks/versions.py) e serve para gerar ETags: se a
+    versão não mudou, o navegador pode reutilizar a página que já possui:
+        user id (integer) = id do usuário dono do portifólio
+        version (integer) = contador monotônico de alterações
+        updated on (datetime) = data da última alteração, em UTC
+    """
+    __tablename__ = 'portfolio_versions'
+
+    user_id = mapped_column(ForeignKey('users.id'), primary_key=True)
+    version = mapped_column(Integer(), default=0)
+    updated_on = mapped_column(DateTime())
+
+    def __repr__(self):
+        return f'<PortfolioVersion: usuário {self.user_id} - versão {self.version}>'
+
+
+class OutboxMessage(database.Model):
+    """
+    Classe que representa um email aguardando envio (outbox)
+
+    O email é gravado na mesma transação da operação que o gerou (ex.: o
+    registro do usuário) e enviado depois pelo job deliver-mail (ver
+    project/outbox.py), que reutiliza uma conexão SMTP para vários emails:
+        subject, sender, recipients (string) = assunto, remetente e
+            destinatários (separados por vírgula)
+        html, body (text) = conteúdo do email
+        status (string) = pending, sent ou failed (desistiu após várias tentativas)
+        attempts (integer) = tentativas de envio que falharam
+        next attempt on (datetime) = quando o email pode ser enviado (backoff)
+        last error (string) = mensagem da última falha
+        created on / sent on (datetime) = datas de criação e de envio
+    """
+    __tablename__ = 'outbox'
+    __table_args__ = (Index('ix_outbox_status_next_attempt_on', 'status', 'next_attempt_on'),)
+
+    id = mapped_column(Integer(), primary_key=True)
+    subject = mapped_column(String())
+    sender = mapped_column(String())
+    recipients = mapped_column(String())
+    html = mapped_column(Text())
+    body = mapped_column(Text())
+    status = mapped_column(String(), default='pending')
+    attempts = mapped_column(Integer(), default=0)
+    next_attempt_on = mapped_column(DateTime())
+    last_error = mapped_column(String())
+    created_on = mapped_column(DateTime())
+    sent_on = mapped_column(DateTime())
+
+    def __repr__(self):
+        return f'<OutboxMessage: {self.subject} -> {self.recipients} ({self.status})>'
+
+
 class User(flask_login.UserMixin, database.Model):
     """
     Classe que representa um usuário da aplicação
@@ -57,7 +204,7 @@ class User(flask_login.UserMixin, database.Model):
 
     id = mapped_column(Integer(), primary_key=True)
     email = mapped_column(String(), unique=True)
-    password_hashed = mapped_column(String(128))
+    password_hashed = mapped_column(String(256))
     registered_on = mapped_column(DateTime())
     email_confirmation_sent_on = mapped_column(DateTime())
     email_confirmed = mapped_column(Boolean(), default=False)
@@ -72,13 +219,33 @@ class User(flask_login.UserMixin, database.Model):
         self.email_confirmed_on = None
 
     def is_password_correct(self, password_plaintext: str):
-        return check_password_hash(self.password_hashed, password_plaintext)
+        return passwords.verify(self.password_hashed, password_plaintext)
+
+    def set_password(self, password_plaintext: str):
+        self.password_hashed = self._generate_password_hash(password_plaintext)
 
     # staticmethods indicam que o método não depende de alguma variável de instância
     # métodos que começam com _ são convencionalmente privados
     @staticmethod
     def _generate_password_hash(password_plaintext):
-        return generate_password_hash(password_plaintext)
+        # calculado no pool de processos de project/passwords.py
+        return passwords.hash(password_plaintext)
 
     def __repr__(self):
         return f'<User: {self.email}>'
+
+
+# os dois bancos suportados implementam INSERT ... ON CONFLICT
+_UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def upsert(model):
+    """
+    Retorna um INSERT do dialeto do banco em uso, que suporta
+    on_conflict_do_update/on_conflict_do_nothing
+    """
+    dialect = database.session.get_bind().dialect.name
+    return _UPSERT_DIALECTS[dialect](model)
@@ -0,0 +1,109 @@
+"""
+Outbox de emails: envio fora das requisições, com conexão SMTP reutilizada
+
+`enqueue` grava o email na tabela outbox, na mesma transação da operação que o
+gerou. Assim a requisição não espera o servidor de email, o email não se perde
+se o processo reiniciar e só existe se a operação foi confirmada.
+
+O job deliver-mail (project/users/tasks.py) chama `deliver_outbox`, que envia
+os emails pendentes em lotes por uma única conexão SMTP, respeitando um limite
+de emails por segundo. Um email cujo envio falha é reagendado com backoff
+exponencial, até MAIL_OUTBOX_MAX_ATTEMPTS tentativas. Se a conexão com o
+servidor cai, o lote é interrompido e o próprio job é reagendado pelo
+agendador (project/scheduler.py).
+"""
+import logging
+import smtplib
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from project import database, mail
+from project.models import OutboxMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(message):
+    """Adiciona `message` (flask_mail.Message) à outbox na sessão atual; o commit é de quem chama"""
+    outbox_message = OutboxMessage(
+        subject=message.subject,
+        sender=message.sender,
+        recipients=','.join(message.recipients),
+        html=message.html,
+        body=message.body,
+        status='pending',
+        attempts=0,
+        created_on=datetime.now(),
+        next_attempt_on=datetime.now()
+    )
+    database.session.add(outbox_message)
+    return outbox_message
+
+
+def deliver_outbox(batch_size=None):
+    """Envia um lote de emails pendentes por uma única conexão SMTP. Retorna quantos foram enviados"""
+    config = current_app.config
+    query = (database.select(OutboxMessage)
+             .where(OutboxMessage.status == 'pending')
+             .where(OutboxMessage.next_attempt_on <= datetime.now())
+             .order_by(OutboxMessage.id)
+             .limit(batch_size or config['MAIL_OUTBOX_BATCH_SIZE']))
+    pending = database.session.execute(query).scalars().all()
+    if not pending:
+        return 0
+
+    # as mensagens são montadas antes de conectar: durante o envio, o banco só
+    # é usado para marcar cada email como enviado
+    messages = [(outbox_message, Message(subject=outbox_message.subject,
+                                         sender=outbox_message.sender,
+                                         recipients=outbox_message.recipients.split(','),
+                                         html=outbox_message.html,
+                                         body=outbox_message.body))
+                for outbox_message in pending]
+    database.session.commit()
+
+    interval = 1 / config['MAIL_OUTBOX_RATE_LIMIT']
+    sent = 0
+    last_send = None
+    with mail.connect() as connection:
+        for outbox_message, message in messages:
+            if last_send is not None:
+                time.sleep(max(0.0, last_send + interval - time.monotonic()))
+            last_send = time.monotonic()
+            try:
+                connection.send(message)
+            # SMTPException herda de OSError: a queda da conexão é tratada antes
+            except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as e:
+                # a conexão caiu: os demais emails do lote esperam a próxima execução
+                _record_failure(outbox_message, e)
+                database.session.commit()
+                raise
+            except Exception as e:
+                # recusado pelo servidor (destinatário inválido etc) ou email
+                # mal formado (sem remetente): só este email é afetado
+                _record_failure(outbox_message, e)
+            else:
+                outbox_message.status = 'sent'
+                outbox_message.sent_on = datetime.now()
+                sent += 1
+            # commit por email: um email enviado nunca volta a ficar pendente
+            database.session.commit()
+    logger.info('Outbox: %d de %d emails enviados', sent, len(pending))
+    return sent
+
+
+def _record_failure(outbox_message, error):
+    config = current_app.config
+    outbox_message.attempts += 1
+    outbox_message.last_error = str(error)[:500]
+    if outbox_message.attempts >= config['MAIL_OUTBOX_MAX_ATTEMPTS']:
+        outbox_message.status = 'failed'
+        logger.error('Outbox: desistindo do email %d após %d tentativas: %s',
+                     outbox_message.id, outbox_message.attempts, error)
+    else:
+        delay = config['MAIL_OUTBOX_RETRY_BASE'] * 2 ** (outbox_message.attempts - 1)
+        outbox_message.next_attempt_on = datetime.now() + timedelta(seconds=delay)
+        logger.warning('Outbox: falha ao enviar o email %d (tentativa %d), nova tentativa em %ss: %s',
+                       outbox_message.id, outbox_message.attempts, delay, error)
@@ -0,0 +1,109 @@
+"""
+Hash de senhas em um pool de processos limitado
+
+Gerar ou conferir o hash de uma senha (PBKDF2 com centenas de milhares de
+iterações) ocupa um núcleo de CPU por dezenas ou centenas de milissegundos.
+Em vez de executar isso na thread da requisição, o PasswordHasher envia o
+trabalho a um pool com PASSWORD_HASH_WORKERS processos. No máximo
+PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE operações ficam em andamento;
+quem não conseguir uma vaga em PASSWORD_HASH_QUEUE_TIMEOUT segundos recebe
+503 (PasswordHashingBusy), em vez de acumular requisições paradas enquanto
+uma rajada de logins ocupa a CPU.
+
+O algoritmo e o número de iterações vêm da configuração. Os hashes guardam os
+parâmetros com que foram gerados (pbkdf2:sha256:600000$salt$hash), então
+`needs_rehash` detecta hashes antigos, que são regerados no próximo login.
+
+Fora de um contexto de aplicação (ex.: testes unitários dos models), o hash é
+feito na thread atual com os padrões do Werkzeug.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, has_app_context
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHashingBusy(ServiceUnavailable):
+    description = 'Muitas requisições de autenticação simultâneas. Tente novamente em instantes.'
+
+
+class PasswordHasher:
+    """Gera e confere hashes de senhas em um pool de processos com fila limitada"""
+
+    def __init__(self, method='pbkdf2:sha256:600000', workers=2, queue_size=16, queue_timeout=5.0):
+        self.method = method
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True se `password_hash` foi gerado com outro algoritmo ou número de iterações"""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _run(self, function, *args):
+        # workers = 0 executa na thread atual, sem processos extras
+        if self.workers == 0:
+            return function(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHashingBusy(retry_after=1)
+        try:
+            return self._pool().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def _pool(self):
+        # criado sob demanda; 'spawn' evita fazer fork de um processo com threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+
+class Passwords:
+    """Extensão Flask que cria o PasswordHasher configurado para a aplicação"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['passwords'] = PasswordHasher(
+            method=f"{app.config['PASSWORD_HASH_ALGORITHM']}:{app.config['PASSWORD_HASH_ITERATIONS']}",
+            workers=app.config['PASSWORD_HASH_WORKERS'],
+            queue_size=app.config['PASSWORD_HASH_QUEUE_SIZE'],
+            queue_timeout=app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        )
+
+    @property
+    def hasher(self):
+        return current_app.extensions['passwords']
+
+    def hash(self, password):
+        if not has_app_context():
+            return generate_password_hash(password)
+        return self.hasher.hash(password)
+
+    def verify(self, password_hash, password):
+        if not has_app_context():
+            return check_password_hash(password_hash, password)
+        return self.hasher.verify(password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return has_app_context() and self.hasher.needs_rehash(password_hash)
@@ -0,0 +1,139 @@
+"""
+Log de queries lentas e detector de N+1
+
+Eventos do engine do SQLAlchemy medem cada statement executado. Os mais lentos
+que SLOW_QUERY_THRESHOLD segundos são logados com os parâmetros e o plano de
+execução (EXPLAIN QUERY PLAN no SQLite, EXPLAIN no PostgreSQL), calculado na
+mesma conexão logo após a query.
+
+Durante uma requisição, os statements também são agrupados pelo formato (o SQL
+sem os valores): se um mesmo formato se repete mais que N_PLUS_ONE_THRESHOLD
+vezes, é provável que um loop esteja fazendo uma query por item (N+1), e a
+requisição é logada com o statement repetido.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+# listas de parâmetros de tamanho variável (IN (?, ?, ?)) e números literais
+_PARAMETER_LIST = re.compile(r'(\?|%\(\w+\)s|:\w+)(\s*,\s*(\?|%\(\w+\)s|:\w+))+')
+_NUMBER = re.compile(r'\b\d+\b')
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+def statement_shape(statement):
+    """SQL normalizado, sem valores, para agrupar statements iguais"""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _PARAMETER_LIST.sub('?, ...', shape)
+    return _NUMBER.sub('N', shape)
+
+
+class EngineMonitor:
+    """Listeners de um engine: tempo de cada statement, queries lentas e formatos por requisição"""
+
+    def __init__(self, threshold, explain=True, log_parameters=True):
+        self.threshold = threshold
+        self.explain = explain
+        self.log_parameters = log_parameters
+        self.slow_queries = 0
+
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        event.listen(engine, 'handle_error', self.handle_error)
+
+    def before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - connection.info['query_start'].pop()
+        if has_request_context() and 'query_shapes' in g:
+            g.query_shapes[statement_shape(statement)] += 1
+        if self.threshold is not None and duration >= self.threshold:
+            self.slow_queries += 1
+            self.log_slow_query(connection, cursor, statement, parameters, executemany, duration)
+
+    def handle_error(self, exception_context):
+        # o statement falhou e after_cursor_execute não será chamado
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_start'):
+            connection.info['query_start'].pop()
+
+    def log_slow_query(self, connection, cursor, statement, parameters, executemany, duration):
+        endpoint = request.endpoint if has_request_context() else None
+        plan = None
+        if self.explain and not executemany and _EXPLAINABLE.match(statement):
+            plan = self.query_plan(connection, cursor, statement, parameters)
+        logger.warning('Query lenta (%.1f ms, endpoint %s): %s%s%s',
+                       duration * 1000, endpoint, _WHITESPACE.sub(' ', statement).strip(),
+                       f'\n  parâmetros: {_truncate(parameters)}' if self.log_parameters else '',
+                       f'\n  plano:\n    {plan}' if plan else '')
+
+    @staticmethod
+    def query_plan(connection, cursor, statement, parameters):
+        # outro cursor da mesma conexão DBAPI: o resultado da query original
+        # ainda não foi lido e não pode ser descartado
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.dialect.name == 'sqlite' else 'EXPLAIN '
+        explain_cursor = cursor.connection.cursor()
+        try:
+            explain_cursor.execute(prefix + statement, parameters)
+            # SQLite: (id, parent, notused, detail); PostgreSQL: (linha do plano,)
+            return '\n    '.join(str(row[-1]) for row in explain_cursor.fetchall())
+        except Exception as e:
+            return f'(EXPLAIN falhou: {e})'
+        finally:
+            explain_cursor.close()
+
+
+def _truncate(value, size=500):
+    text = repr(value)
+    return text if len(text) <= size else f'{text[:size]}...'
+
+
+class QueryMonitor:
+    """Extensão Flask que instala o EngineMonitor nos engines do Flask-SQLAlchemy"""
+
+    def __init__(self, app=None, database=None):
+        self.database = database
+        if app is not None:
+            self.init_app(app, database)
+
+    def init_app(self, app, database=None):
+        self.database = database or self.database
+        if not app.config['QUERY_MONITOR_ENABLED']:
+            return
+        monitor = EngineMonitor(
+            threshold=app.config['SLOW_QUERY_THRESHOLD'],
+            explain=app.config['SLOW_QUERY_EXPLAIN'],
+            log_parameters=app.config['SLOW_QUERY_LOG_PARAMETERS']
+        )
+        # os engines são criados pelo Flask-SQLAlchemy para cada aplicação
+        with app.app_context():
+            for engine in self.database.engines.values():
+                monitor.attach(engine)
+        app.extensions['query_monitor'] = monitor
+
+        max_repeats = app.config['N_PLUS_ONE_THRESHOLD']
+        if max_repeats:
+            @app.before_request
+            def start_counting():
+                g.query_shapes = Counter()
+
+            @app.teardown_request
+            def report_repeated_statements(exception):
+                shapes = g.pop('query_shapes', None)
+                if not shapes:
+                    return
+                shape, count = shapes.most_common(1)[0]
+                if count > max_repeats:
+                    logger.warning('Possível N+1 em %s %s (endpoint %s): %d statements, '
+                                   'o mesmo executado %d vezes: %s',
+                                   request.method, request.path, request.endpoint,
+                                   sum(shapes.values()), count, shape)
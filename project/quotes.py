@@ -0,0 +1,349 @@
+"""
+Cotações de mercado das ações
+
+Um QuoteProvider sabe buscar o preço atual de um ticket em alguma fonte (um
+arquivo local, uma API de mercado etc). Na frente do provider fica um
+QuoteCache em memória, com TTL e limite de tamanho (LRU), que também agrupa
+buscas concorrentes pelo mesmo ticket (single-flight): se 500 requisições
+pedirem PETR4 ao mesmo tempo, apenas uma consulta chega ao provider e as
+outras esperam pelo resultado dela.
+
+Para precificar um portifólio inteiro, `QuoteCache.get_many` remove tickets
+repetidos e busca os ausentes do cache em paralelo, em um pool de threads
+limitado, com timeout e tolerância a falhas parciais (o ticket que falhar ou
+demorar demais fica com preço None).
+
+O timeout vale para cada busca: ele é repassado ao provider (que deve
+respeitá-lo, ex.: como timeout da requisição HTTP), quem espera por uma busca
+em andamento espera no máximo o mesmo tempo, e uma busca que passou do prazo
+deixa de ser compartilhada: a próxima requisição pelo ticket tenta de novo em
+vez de esperar por ela.
+
+Assim como em Stock.purchase_price, os preços são inteiros multiplicados por
+100 (R$ 24.10 -> 2410). Tickets desconhecidos têm preço None.
+"""
+import csv
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
+from werkzeug.utils import import_string
+
+
+class QuoteProvider:
+    """Interface para fontes de cotações"""
+
+    @classmethod
+    def from_config(cls, config):
+        """Cria o provider a partir da configuração da aplicação Flask"""
+        return cls()
+
+    def get_quote(self, symbol, timeout=None):
+        """
+        Retorna o preço atual (x100) de `symbol` ou None se desconhecido
+
+        `timeout` é o tempo máximo (segundos) que quem pediu vai esperar: depois
+        dele o provider deve desistir e levantar um erro (ex.: TimeoutError)
+        """
+        raise NotImplementedError
+
+
+class FileQuoteProvider(QuoteProvider):
+    """
+    Provider que lê as cotações de um arquivo local, útil offline e em testes
+
+    O arquivo pode ser um JSON ({"PETR4": 36.20, ...}) ou um CSV com as colunas
+    symbol,price. Ele é relido quando sua data de modificação muda, de forma
+    que um processo externo pode atualizar as cotações sem reiniciar a app
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._prices = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['QUOTES_FILE'])
+
+    def get_quote(self, symbol, timeout=None):
+        return self._load().get(symbol.upper())
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return {}
+        with self._lock:
+            if mtime != self._mtime:
+                self._prices = self._parse()
+                self._mtime = mtime
+            return self._prices
+
+    def _parse(self):
+        with open(self.path, encoding='utf-8') as file:
+            if self.path.endswith('.csv'):
+                rows = ((row['symbol'], row['price']) for row in csv.DictReader(file))
+            else:
+                rows = json.load(file).items()
+            return {symbol.upper(): round(float(price) * 100) for symbol, price in rows}
+
+
+class SimulatedQuoteProvider(QuoteProvider):
+    """
+    Provider sintético que gera um preço determinístico por ticket e demora
+    `latency` segundos (com variação de +-`jitter`) para responder, simulando
+    uma API remota. Usado em benchmarks e testes de carga
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['QUOTES_SIMULATED_LATENCY'])
+
+    def get_quote(self, symbol, timeout=None):
+        latency = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f'cotação de {symbol} não respondeu em {timeout}s')
+        time.sleep(latency)
+        # crc32 é estável entre processos, ao contrário de hash()
+        return 1000 + zlib.crc32(symbol.upper().encode()) % 50000
+
+
+# providers que podem ser escolhidos pelo nome em QUOTES_PROVIDER
+PROVIDERS = {
+    'file': FileQuoteProvider,
+    'simulated': SimulatedQuoteProvider,
+}
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Busca em andamento no provider, compartilhada entre requisições concorrentes"""
+
+    def __init__(self, deadline):
+        self.event = threading.Event()
+        self.deadline = deadline  # time.monotonic() em que a busca é abandonada
+        self.value = None
+        self.error = None
+
+
+class QuoteCache:
+    """
+    Cache em memória (por processo) com TTL por entrada, limite de tamanho LRU e
+    agrupamento de buscas concorrentes pelo mesmo ticket
+
+    Contadores:
+        hits = cotações servidas do cache
+        misses = buscas feitas no provider
+        coalesced = requisições que aguardaram uma busca já em andamento
+        evictions = entradas descartadas por exceder o tamanho máximo
+    """
+
+    def __init__(self, provider, ttl=60, maxsize=1024, clock=time.monotonic,
+                 max_workers=16, fetch_timeout=2.0):
+        self.provider = provider
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_workers = max_workers
+        self.fetch_timeout = fetch_timeout
+        self._clock = clock
+        self._executor = None
+        self._entries = OrderedDict()  # symbol -> (preço, expira em)
+        self._inflight = {}  # symbol -> _Call
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = self.evictions = 0
+
+    def get(self, symbol, timeout=None):
+        """
+        Preço de `symbol`, do cache ou do provider. Levanta TimeoutError se a
+        busca (própria ou compartilhada) não terminar em `timeout` segundos
+        (padrão: fetch_timeout)
+        """
+        symbol = symbol.upper()
+        timeout = self.fetch_timeout if timeout is None else timeout
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None and entry[1] > self._clock():
+                self._entries.move_to_end(symbol)
+                self.hits += 1
+                return entry[0]
+
+            call = self._inflight.get(symbol)
+            # uma busca que passou do prazo não é mais compartilhada: quem
+            # chega depois tenta de novo em vez de esperar por ela
+            leader = call is None or call.deadline <= time.monotonic()
+            if leader:
+                self.misses += 1
+                call = self._inflight[symbol] = _Call(time.monotonic() + timeout)
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.event.wait(max(0.0, min(timeout, call.deadline - time.monotonic()))):
+                raise TimeoutError(f'cotação de {symbol} não respondeu em {timeout}s')
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self.provider.get_quote(symbol, timeout=timeout)
+        except Exception as e:
+            # erros não são guardados no cache: a próxima requisição tenta de novo
+            call.error = e
+            raise
+        else:
+            self._store(symbol, call.value)
+        finally:
+            with self._lock:
+                # se a busca foi abandonada, a entrada pode já ser de outra
+                if self._inflight.get(symbol) is call:
+                    del self._inflight[symbol]
+            call.event.set()
+        return call.value
+
+    def get_many(self, symbols, timeout=None):
+        """
+        Retorna um dict symbol -> preço para todos os `symbols` (repetidos são
+        consultados uma única vez) em uma única rodada
+
+        Os tickets que não estão no cache são buscados em paralelo. Quem falhar
+        ou não responder dentro de `timeout` segundos (padrão: fetch_timeout)
+        fica com preço None, sem afetar os demais
+        """
+        timeout = self.fetch_timeout if timeout is None else timeout
+        prices = {}
+        missing = []
+        with self._lock:
+            now = self._clock()
+            for symbol in dict.fromkeys(symbol.upper() for symbol in symbols):
+                entry = self._entries.get(symbol)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(symbol)
+                    self.hits += 1
+                    prices[symbol] = entry[0]
+                else:
+                    missing.append(symbol)
+
+        if missing:
+            futures = {self._pool().submit(self.get, symbol, timeout): symbol for symbol in missing}
+            done, not_done = wait(futures, timeout=timeout)
+            # buscas que nem começaram saem da fila do pool: senão atrasam os
+            # próximos lotes, que esperariam por respostas que ninguém vai usar
+            for future in not_done:
+                future.cancel()
+            for future, symbol in futures.items():
+                if future in not_done:
+                    logger.warning('Timeout ao buscar a cotação de %s', symbol)
+                    prices[symbol] = None
+                elif future.exception() is not None:
+                    logger.warning('Erro ao buscar a cotação de %s: %s', symbol, future.exception())
+                    prices[symbol] = None
+                else:
+                    prices[symbol] = future.result()
+        return prices
+
+    def _pool(self):
+        # criado sob demanda: processos que nunca precificam em lote não criam threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='quotes')
+            return self._executor
+
+    def _store(self, symbol, price):
+        with self._lock:
+            self._entries[symbol] = (price, self._clock() + self.ttl)
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, symbol=None):
+        """Remove a cotação de `symbol` do cache (ou todas, se None)"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(symbol.upper(), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
+
+
+class PriceMap(dict):
+    """
+    Dicionário symbol -> preço que busca no cache os tickets ainda ausentes,
+    permitindo que templates (inclusive em streaming) consultem preços sob demanda
+    """
+
+    def __init__(self, lookup, prices=None):
+        super().__init__(prices or {})
+        self._lookup = lookup
+
+    def __missing__(self, symbol):
+        price = self[symbol] = self._lookup([symbol]).get(symbol.upper())
+        return price
+
+
+class Quotes:
+    """Extensão Flask que cria o provider e o cache configurados para a aplicação"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        provider = app.config['QUOTES_PROVIDER']
+        if isinstance(provider, str):
+            provider_class = PROVIDERS.get(provider) or import_string(provider)
+            provider = provider_class.from_config(app.config)
+        app.extensions['quotes'] = QuoteCache(
+            provider,
+            ttl=app.config['QUOTES_CACHE_TTL'],
+            maxsize=app.config['QUOTES_CACHE_SIZE'],
+            max_workers=app.config['QUOTES_MAX_WORKERS'],
+            fetch_timeout=app.config['QUOTES_FETCH_TIMEOUT']
+        )
+
+    @property
+    def cache(self):
+        return current_app.extensions['quotes']
+
+    def get_price(self, symbol):
+        return self.cache.get(symbol)
+
+    def get_prices(self, symbols):
+        return self.cache.get_many(symbols)
+
+    def price_map(self, symbols=(), prices=None):
+        """
+        PriceMap já preenchido com `prices` (preços conhecidos) e com os preços
+        de `symbols`, buscados em uma única rodada. Tickets consultados depois
+        são buscados sob demanda
+        """
+        known = dict(prices or {})
+        known.update(self.get_prices(symbol for symbol in symbols if symbol not in known))
+        return PriceMap(self.get_prices, known)
+
+    def stats(self):
+        return self.cache.stats()
@@ -0,0 +1,129 @@
+"""
+Roteamento de leituras para réplicas (SQLALCHEMY_REPLICA_URIS)
+
+Cada URI de SQLALCHEMY_REPLICA_URIS vira um bind do Flask-SQLAlchemy
+(replica0, replica1, ...), com as mesmas opções de engine e PRAGMAs do banco
+principal. Por padrão tudo continua indo ao principal: só os SELECTs
+executados dentro de `reading(session)` (ou de uma view decorada com
+@read_replica) vão para uma das réplicas, escolhida uma vez por sessão.
+
+Leia o que você escreveu (read-your-writes):
+    * a partir da primeira escrita (flush, INSERT/UPDATE/DELETE ou
+      session.connection()) a sessão inteira passa a usar o principal, inclusive
+      dentro de `reading`, já que as réplicas não enxergam a transação aberta
+    * após um commit com escritas em uma requisição, as requisições seguintes
+      do mesmo cliente (cookie de sessão do Flask) leem do principal por
+      REPLICA_STICKY_SECONDS segundos, o atraso de replicação tolerado
+
+Para testar localmente, a réplica pode ser uma conexão somente leitura ao
+mesmo arquivo SQLite:
+    DATABASE_REPLICA_URLS='sqlite:///file:/caminho/app.db?mode=ro&uri=true'
+"""
+import random
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+
+REPLICA_PREFIX = 'replica'
+# chave no cookie de sessão do Flask: até quando o cliente lê do principal
+STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(Session):
+    """
+    Sessão do Flask-SQLAlchemy que envia os SELECTs marcados com `reading` para
+    uma réplica e todo o resto para o banco principal
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or not isinstance(clause, Select):
+                # escrita: a partir daqui a sessão só usa o principal
+                self.info['wrote'] = True
+            elif self.info.get('reading') and not self.info.get('wrote') and not self.info.get('primary'):
+                replica = self._replica()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica(self):
+        keys = current_app.extensions.get('replicas')
+        if not keys:
+            return None
+        # a mesma réplica durante toda a sessão (requisição): leituras consistentes entre si
+        if 'replica' not in self.info:
+            self.info['replica'] = random.choice(keys)
+        return self._db.engines[self.info['replica']]
+
+
+@contextmanager
+def reading(session):
+    """Executa os SELECTs de `session` dentro do bloco em uma réplica, se houver"""
+    session.info['reading'] = session.info.get('reading', 0) + 1
+    try:
+        yield session
+    finally:
+        session.info['reading'] -= 1
+
+
+def read_replica(view):
+    """Decorador de views somente leitura: as consultas da view vão para uma réplica"""
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        from project import database
+
+        with reading(database.session):
+            return view(*args, **kwargs)
+    return decorated_view
+
+
+class ReadReplicas:
+    """
+    Extensão Flask que registra as réplicas como binds do Flask-SQLAlchemy e
+    mantém o cliente no banco principal logo após as suas escritas
+
+    Deve ser inicializada antes de database.init_app, que cria os engines
+    """
+
+    def __init__(self, app=None, database=None):
+        self.database = database
+        if app is not None:
+            self.init_app(app, database)
+
+    def init_app(self, app, database=None):
+        self.database = database or self.database
+        uris = app.config['SQLALCHEMY_REPLICA_URIS']
+        keys = [f'{REPLICA_PREFIX}{index}' for index in range(len(uris))]
+        app.extensions['replicas'] = keys
+        if not uris:
+            return
+        # cópia: o dict da classe de configuração é compartilhado entre aplicações
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.update(zip(keys, uris))
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+        sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        if not sticky_seconds:
+            return
+
+        @app.before_request
+        def stick_to_primary():
+            primary_until = flask_session.get(STICKY_KEY)
+            if primary_until is None:
+                return
+            if primary_until > time.time():
+                self.database.session.info['primary'] = True
+            else:
+                flask_session.pop(STICKY_KEY)
+
+
+@event.listens_for(Session, 'after_commit')
+def remember_write(commit_session):
+    # o commit pode ter sido de uma sessão fora de requisição (CLI, jobs)
+    if not commit_session.info.get('wrote') or not has_request_context():
+        return
+    if current_app.extensions.get('replicas') and current_app.config['REPLICA_STICKY_SECONDS']:
+        flask_session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
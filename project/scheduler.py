@@ -0,0 +1,164 @@
+"""
+Jobs periódicos executados fora das requisições
+
+Os jobs são registrados com o decorator `scheduler.job` e executados por um
+loop de agendamento, que pode rodar em uma thread do próprio servidor
+(JOBS_RUN_IN_APP) ou em um processo separado, com `flask worker`.
+
+O estado de cada job fica na tabela jobs. Antes de executar, o processo
+"reivindica" o job com um UPDATE condicional (só é aplicado se o job estiver
+vencido e não estiver rodando em outro lugar), então vários processos podem
+rodar o agendador ao mesmo tempo sem executar o mesmo job em dobro. Falhas
+consecutivas adiam a próxima execução com backoff exponencial.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Union
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import or_, update
+
+
+class JobSpec(NamedTuple):
+    name: str
+    function: Callable
+    interval: Union[str, float]  # segundos ou nome da configuração com os segundos
+
+
+class Scheduler:
+    """Registro de jobs periódicos e loop que os despacha para um pool de threads"""
+
+    def __init__(self, app=None, database=None):
+        self.jobs = {}
+        self.database = database
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app, database)
+
+    def init_app(self, app, database=None):
+        self.database = database or self.database
+        app.extensions['scheduler'] = self
+        app.cli.add_command(worker_command)
+
+    def job(self, name, interval):
+        """Registra a função decorada como o job `name`, executado a cada `interval`"""
+        def decorator(function):
+            self.jobs[name] = JobSpec(name, function, interval)
+            return function
+        return decorator
+
+    def start(self, app):
+        """Inicia o loop de agendamento em uma thread daemon do processo atual"""
+        self._stop.clear()
+        thread = threading.Thread(target=self.run_forever, args=(app,), name='scheduler', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self, app):
+        with ThreadPoolExecutor(max_workers=app.config['JOBS_MAX_WORKERS'],
+                                thread_name_prefix='job') as executor:
+            while True:
+                try:
+                    self.dispatch(app, executor)
+                except Exception:
+                    # o loop precisa sobreviver a erros transitórios do banco
+                    # (ex.: "database is locked"): tenta de novo no próximo ciclo
+                    app.logger.exception('Erro ao despachar os jobs')
+                if self._stop.wait(app.config['JOBS_POLL_INTERVAL']):
+                    break
+
+    def dispatch(self, app, executor=None):
+        """
+        Reivindica os jobs vencidos e os envia para `executor` (ou os executa na
+        thread atual, se None). Retorna os nomes dos jobs despachados
+        """
+        with app.app_context():
+            self._ensure_jobs()
+            claimed = [spec for spec in self.jobs.values() if self._claim(app, spec)]
+
+        for spec in claimed:
+            if executor is None:
+                self._run(app, spec)
+            else:
+                executor.submit(self._run, app, spec)
+        return [spec.name for spec in claimed]
+
+    def _ensure_jobs(self):
+        from project.models import Job, upsert
+
+        if self.jobs:
+            statement = upsert(Job).on_conflict_do_nothing(index_elements=[Job.name])
+            self.database.session.execute(statement, [{'name': name, 'status': 'idle', 'attempts': 0}
+                                                      for name in self.jobs])
+            self.database.session.commit()
+
+    def _claim(self, app, spec):
+        from project.models import Job
+
+        now = datetime.now()
+        # um job 'running' há mais tempo que o lease é considerado abandonado
+        # (processo que morreu durante a execução) e pode ser reivindicado
+        lease_expired = now - timedelta(seconds=app.config['JOBS_LEASE_SECONDS'])
+        statement = (
+            update(Job)
+            .where(Job.name == spec.name)
+            .where(or_(Job.next_run_on.is_(None), Job.next_run_on <= now))
+            .where(or_(Job.status != 'running', Job.last_started_on < lease_expired))
+            .values(status='running', last_started_on=now)
+        )
+        claimed = self.database.session.execute(statement).rowcount == 1
+        self.database.session.commit()
+        return claimed
+
+    def _run(self, app, spec):
+        from project.models import Job
+
+        with app.app_context():
+            start = time.perf_counter()
+            try:
+                spec.function()
+            except Exception as e:
+                self.database.session.rollback()
+                job = self.database.session.get(Job, spec.name)
+                job.attempts += 1
+                delay = min(app.config['JOBS_BACKOFF_BASE'] * 2 ** (job.attempts - 1),
+                            app.config['JOBS_BACKOFF_MAX'])
+                job.status = 'failed'
+                job.last_error = str(e)[:500]
+                job.next_run_on = datetime.now() + timedelta(seconds=delay)
+                app.logger.exception('Job %s falhou (tentativa %d), nova tentativa em %ss',
+                                     spec.name, job.attempts, delay)
+            else:
+                job = self.database.session.get(Job, spec.name)
+                job.status = 'idle'
+                job.attempts = 0
+                job.last_error = None
+                job.next_run_on = datetime.now() + timedelta(seconds=self._interval(app, spec))
+                app.logger.info('Job %s executado em %.3fs', spec.name, time.perf_counter() - start)
+            job.last_finished_on = datetime.now()
+            self.database.session.commit()
+
+    @staticmethod
+    def _interval(app, spec):
+        if isinstance(spec.interval, str):
+            return app.config[spec.interval]
+        return spec.interval
+
+
+@click.command('worker')
+@with_appcontext
+def worker_command():
+    """Executa os jobs periódicos (atualização de cotações etc) em primeiro plano"""
+    app = current_app._get_current_object()
+    scheduler = app.extensions['scheduler']
+    click.echo(f'Worker iniciado com os jobs: {", ".join(sorted(scheduler.jobs))}')
+    try:
+        scheduler.run_forever(app)
+    except KeyboardInterrupt:
+        scheduler.stop()
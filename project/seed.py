@@ -0,0 +1,142 @@
+"""
+Dados sintéticos para testes de escala: `flask dev seed`
+
+Gera usuários (confirmados e não confirmados) e lotes de ações com uma
+distribuição realista: a popularidade dos tickets segue uma lei de Zipf (poucos
+tickets concentram a maior parte dos lotes), o número de ações de cada lote
+segue uma distribuição log-normal e o preço de compra varia em torno de um
+preço base por ticket.
+
+Os valores são gerados com numpy, em lotes, e inseridos com um único INSERT
+executemany por lote, com um commit por lote. Todos os usuários recebem o mesmo
+hash de senha, calculado uma única vez. Em vez de atualizar as posições a cada
+lote (apply_lots), a tabela positions é recalculada uma vez no final, com um
+único GROUP BY (project/stocks/positions.py).
+"""
+import string
+import time
+from datetime import datetime, timedelta
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import AppGroup
+from project import database, passwords
+from project.models import Stock, User
+from project.stocks.positions import rebuild_positions
+from project.stocks.versions import bump_versions
+
+
+def generate_symbols(count, rng):
+    """`count` tickets distintos de 3 a 5 letras maiúsculas"""
+    letters = np.array(list(string.ascii_uppercase))
+    symbols = set()
+    while len(symbols) < count:
+        length = int(rng.integers(3, 6))
+        symbols.add(''.join(rng.choice(letters, length)))
+    return sorted(symbols)
+
+
+def zipf_weights(count, exponent):
+    """Probabilidade de cada posição de popularidade (1/k^s, normalizada)"""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_users(count, confirmed_ratio, password_hash, rng, email_prefix='seed', start=0):
+    """Dicts com as colunas da tabela users, registrados ao longo dos últimos dois anos"""
+    now = datetime.now()
+    registered_offsets = rng.integers(0, 2 * 365 * 24 * 3600, count).tolist()
+    confirmed = (rng.random(count) < confirmed_ratio).tolist()
+    users = []
+    for index, (offset, is_confirmed) in enumerate(zip(registered_offsets, confirmed), start=start):
+        registered_on = now - timedelta(seconds=offset)
+        users.append({
+            'email': f'{email_prefix}{index}@example.com',
+            'password_hashed': password_hash,
+            'registered_on': registered_on,
+            'email_confirmation_sent_on': registered_on,
+            'email_confirmed': is_confirmed,
+            'email_confirmed_on': registered_on + timedelta(hours=1) if is_confirmed else None,
+        })
+    return users
+
+
+def generate_lots(user_ids, lots_per_user, symbols, weights, base_prices, rng):
+    """Dicts com as colunas da tabela stocks: `lots_per_user` lotes para cada usuário de `user_ids`"""
+    count = len(user_ids) * lots_per_user
+    symbol_indexes = rng.choice(len(symbols), size=count, p=weights).tolist()
+    shares = np.clip(np.rint(rng.lognormal(mean=3.5, sigma=1.2, size=count)), 1, 100000).astype(np.int64).tolist()
+    # preço de compra em centavos: preço base do ticket com variação de ~25%
+    prices = np.rint(np.asarray(base_prices)[symbol_indexes] * rng.lognormal(0.0, 0.25, size=count))
+    prices = np.maximum(prices, 1).astype(np.int64).tolist()
+    owners = np.repeat(np.asarray(user_ids), lots_per_user).tolist()
+    return [
+        {'stock_symbol': symbols[symbol_index], 'number_of_shares': number_of_shares,
+         'purchase_price': purchase_price, 'user_id': user_id}
+        for symbol_index, number_of_shares, purchase_price, user_id in zip(symbol_indexes, shares, prices, owners)
+    ]
+
+
+dev_cli = AppGroup('dev', help='Ferramentas para desenvolvimento e testes de escala')
+
+
+@dev_cli.command('seed')
+@click.option('--users', 'user_count', type=int, default=1000, show_default=True, help='Usuários a criar')
+@click.option('--lots-per-user', type=int, default=100, show_default=True, help='Lotes de ações por usuário')
+@click.option('--symbols', 'symbol_count', type=int, default=500, show_default=True, help='Tickets distintos')
+@click.option('--zipf-exponent', type=float, default=1.1, show_default=True,
+              help='Expoente da lei de Zipf da popularidade dos tickets (maior = mais concentrado)')
+@click.option('--confirmed-ratio', type=float, default=0.8, show_default=True,
+              help='Fração dos usuários com email confirmado')
+@click.option('--password', default='FlaskIsAwesome123', show_default=True, help='Senha de todos os usuários')
+@click.option('--email-prefix', default='seed', show_default=True, help='Emails gerados: <prefixo><n>@example.com')
+@click.option('--batch-size', type=int, help='Lotes de ações por INSERT/commit (padrão: STOCKS_IMPORT_BATCH_SIZE)')
+@click.option('--seed', 'random_seed', type=int, default=42, show_default=True, help='Semente dos números aleatórios')
+def seed_command(user_count, lots_per_user, symbol_count, zipf_exponent, confirmed_ratio, password,
+                 email_prefix, batch_size, random_seed):
+    """Gera usuários e lotes de ações sintéticos"""
+    batch_size = batch_size or current_app.config['STOCKS_IMPORT_BATCH_SIZE']
+    existing = database.session.execute(
+        database.select(database.func.count(User.id)).where(User.email.like(f'{email_prefix}%@example.com'))
+    ).scalar_one()
+    if existing:
+        raise click.BadParameter(f'já existem {existing} usuários {email_prefix}<n>@example.com',
+                                 param_hint='--email-prefix')
+
+    rng = np.random.default_rng(random_seed)
+    symbols = generate_symbols(symbol_count, rng)
+    weights = zipf_weights(symbol_count, zipf_exponent)
+    # o mais popular não é sempre o primeiro em ordem alfabética
+    rng.shuffle(weights)
+    # preços base entre ~R$ 2 e ~R$ 500, em centavos
+    base_prices = np.rint(rng.lognormal(mean=np.log(3000), sigma=1.0, size=symbol_count)).clip(200, 50000)
+
+    start = time.perf_counter()
+    # o hash (caro de propósito) é calculado uma vez e reutilizado por todos
+    password_hash = passwords.hash(password)
+    users_per_batch = max(1, batch_size // max(lots_per_user, 1))
+    created_users = created_lots = 0
+    with click.progressbar(length=user_count, label='Gerando usuários e lotes') as progress:
+        while created_users < user_count:
+            count = min(users_per_batch, user_count - created_users)
+            users = generate_users(count, confirmed_ratio, password_hash, rng, email_prefix, start=created_users)
+            # os ids vêm do próprio INSERT (RETURNING): buscá-los de volta por
+            # email passaria do limite de parâmetros do SQLite em lotes grandes
+            user_ids = database.session.execute(
+                User.__table__.insert().returning(User.__table__.c.id, sort_by_parameter_order=True), users
+            ).scalars().all()
+            lots = generate_lots(user_ids, lots_per_user, symbols, weights, base_prices, rng)
+            if lots:
+                database.session.execute(Stock.__table__.insert(), lots)
+            bump_versions(user_ids)
+            database.session.commit()
+            created_users += count
+            created_lots += len(lots)
+            progress.update(count)
+    positions = rebuild_positions()
+    database.session.commit()
+
+    elapsed = time.perf_counter() - start
+    rate = created_lots / elapsed if elapsed > 0 else float(created_lots)
+    click.echo(f'{created_users} usuários, {created_lots} lotes de {symbol_count} tickets e {positions} '
+               f'posições criados em {elapsed:.1f}s ({rate:.0f} lotes/s)')
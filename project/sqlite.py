@@ -0,0 +1,69 @@
+"""
+Configuração das conexões SQLite (PRAGMAs) por classe de configuração
+
+Por padrão o SQLite usa o journal de rollback: enquanto um processo grava, os
+leitores esperam, e um commit espera todos os leitores terminarem. Com vários
+processos/threads atendendo requisições isso aparece como "database is locked"
+em add_stock e como leituras lentas em list_stocks.
+
+As PRAGMAs de SQLITE_PRAGMAS são executadas em toda nova conexão DBAPI (evento
+connect do engine), antes de ela ser usada:
+    journal_mode=WAL      leitores não bloqueiam o escritor e vice-versa
+    synchronous=NORMAL    no modo WAL, fsync só nos checkpoints (um commit
+                          pode ser perdido numa queda de energia, nunca corrompido)
+    busy_timeout          milissegundos esperando o lock de escrita antes do erro
+    cache_size            páginas em cache por conexão (negativo = KiB)
+    mmap_size             bytes do arquivo lidos via memory map
+O tamanho do pool de conexões fica em SQLALCHEMY_ENGINE_OPTIONS (Flask-SQLAlchemy).
+
+journal_mode e synchronous alteram o arquivo do banco, então não são aplicadas
+às réplicas (project/replicas.py) nem a conexões somente leitura (mode=ro):
+nelas, "attempt to write a readonly database" aconteceria a cada conexão. O
+modo WAL, que fica gravado no arquivo, é definido pelo banco principal.
+"""
+from sqlalchemy import event
+
+# PRAGMAs que gravam no arquivo do banco
+WRITE_PRAGMAS = ('journal_mode', 'synchronous')
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Executa as PRAGMAs (nome -> valor) em uma conexão sqlite3"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+class SQLitePragmas:
+    """Extensão Flask que aplica SQLITE_PRAGMAS às conexões dos engines SQLite do Flask-SQLAlchemy"""
+
+    def __init__(self, app=None, database=None):
+        self.database = database
+        if app is not None:
+            self.init_app(app, database)
+
+    def init_app(self, app, database=None):
+        self.database = database or self.database
+        # journal_mode primeiro: as demais PRAGMAs dependem do modo do journal
+        pragmas = dict(sorted(app.config['SQLITE_PRAGMAS'].items(), key=lambda item: item[0] != 'journal_mode'))
+        if not pragmas:
+            return
+        read_pragmas = {name: value for name, value in pragmas.items() if name not in WRITE_PRAGMAS}
+        replica_keys = app.extensions.get('replicas', ())
+        # deve ser chamado antes da primeira conexão: o evento só vale para as novas
+        with app.app_context():
+            engines = {key: engine for key, engine in self.database.engines.items() if engine.dialect.name == 'sqlite'}
+
+        for key, engine in engines.items():
+            read_only = key in replica_keys or engine.url.query.get('mode') == 'ro'
+            event.listen(engine, 'connect', pragma_listener(read_pragmas if read_only else pragmas))
+
+
+def pragma_listener(pragmas):
+    """Listener do evento connect que aplica `pragmas` a cada nova conexão"""
+    def set_pragmas(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+    return set_pragmas
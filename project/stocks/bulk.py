@@ -0,0 +1,64 @@
+"""
+Funções auxiliares para carga de ações em lote (importação de arquivos de
+corretoras, dados sintéticos etc)
+
+Os arquivos são lidos linha a linha e as inserções são feitas com um único
+INSERT executado com vários conjuntos de parâmetros (executemany), de forma que
+o uso de memória depende apenas do tamanho do lote, não do tamanho do arquivo
+"""
+import csv
+import json
+import os
+from itertools import islice
+from project import database
+from project.models import Stock
+from .positions import apply_lots
+from .versions import bump_versions
+
+
+def detect_format(filename):
+    """Deduz o formato (csv ou jsonl) a partir da extensão do arquivo"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_rows(file, file_format):
+    """
+    Gera tuplas (número da linha, dict com os campos ou None) para cada registro
+    do arquivo. Linhas que não podem ser decodificadas são retornadas com None
+    """
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(file)
+        for row in reader:
+            # line_num considera o cabeçalho, assim como um editor de texto
+            yield reader.line_num, row
+
+
+def batched(iterable, batch_size):
+    """Agrupa os itens de `iterable` em listas de até `batch_size` elementos"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def insert_stocks(rows):
+    """
+    Insere os dicts de `rows` (colunas da tabela stocks) em um único executemany
+    e atualiza as posições e versões dos portifólios afetados, tudo na
+    transação corrente. O commit fica a cargo de quem chama
+    """
+    if rows:
+        database.session.execute(Stock.__table__.insert(), rows)
+        apply_lots(rows)
+        bump_versions(row['user_id'] for row in rows)
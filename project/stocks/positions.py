@@ -0,0 +1,89 @@
+"""
+Manutenção incremental da tabela positions (resumo por usuário e ticket)
+
+Toda inserção de ações deve chamar `apply_lots` na mesma transação, assim o
+resumo nunca fica defasado em relação à tabela stocks. `rebuild_positions`
+recalcula o resumo do zero com um único GROUP BY, para corrigir divergências
+ou popular a tabela depois de uma migração
+"""
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import DateTime, delete, func, literal, select
+from project import database
+from project.models import Position, Stock, upsert
+from .versions import bump_versions
+
+
+def apply_lots(lots):
+    """
+    Soma os lotes (dicts com user_id, stock_symbol, number_of_shares e
+    purchase_price, já multiplicado por 100) às posições correspondentes
+
+    Os lotes são agregados por (usuário, ticket) antes da escrita, então um lote
+    de importação com milhares de linhas vira um upsert por posição afetada
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for lot in lots:
+        key = (lot['user_id'], lot['stock_symbol'])
+        totals[key][0] += lot['number_of_shares']
+        totals[key][1] += lot['number_of_shares'] * lot['purchase_price']
+    if not totals:
+        return
+
+    now = datetime.now()
+    rows = [
+        {'user_id': user_id, 'stock_symbol': stock_symbol, 'number_of_shares': shares,
+         'total_cost': cost, 'updated_on': now}
+        for (user_id, stock_symbol), (shares, cost) in totals.items()
+    ]
+
+    statement = upsert(Position)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Position.user_id, Position.stock_symbol],
+        set_={
+            'number_of_shares': Position.number_of_shares + statement.excluded.number_of_shares,
+            'total_cost': Position.total_cost + statement.excluded.total_cost,
+            'updated_on': statement.excluded.updated_on,
+        }
+    )
+    database.session.execute(statement, rows)
+
+
+def apply_stock(stock):
+    """Atualiza a posição de um único objeto Stock recém criado"""
+    apply_lots([{
+        'user_id': stock.user_id,
+        'stock_symbol': stock.stock_symbol,
+        'number_of_shares': stock.number_of_shares,
+        'purchase_price': stock.purchase_price,
+    }])
+
+
+def rebuild_positions():
+    """
+    Recalcula toda a tabela positions a partir da tabela stocks com um único
+    INSERT ... SELECT ... GROUP BY. Retorna o número de posições geradas
+    """
+    database.session.execute(delete(Position))
+    summary = (
+        select(
+            Stock.user_id,
+            Stock.stock_symbol,
+            func.sum(Stock.number_of_shares),
+            func.sum(Stock.number_of_shares * Stock.purchase_price),
+            literal(datetime.now(), DateTime())
+        )
+        .where(Stock.user_id.is_not(None))
+        .group_by(Stock.user_id, Stock.stock_symbol)
+    )
+    database.session.execute(
+        Position.__table__.insert().from_select(
+            ['user_id', 'stock_symbol', 'number_of_shares', 'total_cost', 'updated_on'],
+            summary
+        )
+    )
+    # as páginas de resumo em cache (ETag) dos usuários afetados ficam inválidas
+    user_ids = database.session.execute(select(Position.user_id).distinct()).scalars().all()
+    bump_versions(user_ids)
+    query = select(func.count()).select_from(Position)
+    return database.session.execute(query).scalar()
@@ -1,10 +1,19 @@
 import click
+import time
+from datetime import date, datetime, timedelta
 from . import stocks_blueprint
+from .bulk import batched, detect_format, insert_stocks, read_rows
 
-from flask import current_app, render_template, request, session, flash, redirect, url_for
+from flask import abort, current_app, g, jsonify, render_template, request, session, flash, redirect, url_for, stream_template
+from flask_login import current_user, login_required
+from jinja2.environment import TemplateStream
 from pydantic import BaseModel, validator, ValidationError
-from project import database
-from project.models import Stock
+from project import database, fragments, live, price_history, quotes
+from project.live import format_event
+from project.replicas import read_replica
+from project.models import Position, Quote, Stock, User
+from .positions import apply_stock, rebuild_positions
+from .versions import conditional_portfolio, portfolio_tag
 
 
 # quando um StockModel é criado passando os seus elementos, ocorre a tentativa
@@ -29,27 +38,197 @@ class StockModel(BaseModel):
 # ex.: /stocks/ -> retorna lista de stocks
 #      /sotcks/1 -> retorna a stock com id 1 etc
 @stocks_blueprint.route('/stocks/')
+@login_required
+@read_replica
+@conditional_portfolio
 def list_stocks():
-    query = database.select(Stock).order_by(Stock.id)
-    # execute() retorna um iterável (Result)
-    # scalars().all() consome o iterável e retorna a lista de objetos
-    # all() converte o tipo result.ScalarResult em uma lista
-    # o tipo ScalarResult é um iterável, quando consumimos uma vez, o elemento
-    # é excluído
-    stocks = database.session.execute(query).scalars().all()
+    # ?stream=1 renderiza o portifólio completo de forma incremental
+    if request.args.get('stream', type=int):
+        return stream_stocks()
+
+    # a tabela renderizada fica no cache de fragmentos, com a ETag da página
+    # como chave: ela muda junto com a versão do portifólio, as cotações e os
+    # argumentos da URL. Enquanto nada disso muda, nem a tabela stocks nem o
+    # provider de cotações são consultados
+    table = fragments.get_or_render('stocks_table', render_stocks_table,
+                                    args=(current_user.id, g.portfolio_etag),
+                                    depends_on=[portfolio_tag(current_user.id)])
+    return render_template('stocks/stocks.html', table=table)
+
+
+def render_stocks_table():
+    # paginação por keyset (seek): em vez de OFFSET, que obriga o banco a
+    # percorrer todas as linhas anteriores, filtramos a partir do último id
+    # visto (cursor). O custo de cada página é o mesmo, seja a primeira ou a
+    # milésima
+    # o filtro por usuário + ordenação por id usa o índice (user_id, id)
+    stocks, prev_cursor, next_cursor = keyset_page(
+        database.select(Stock).where(Stock.user_id == current_user.id),
+        Stock.id,
+        after=request.args.get('after', type=int),
+        before=request.args.get('before', type=int),
+        per_page=current_app.config['STOCKS_PER_PAGE']
+    )
     # dados da sessão do flask ficam disponíveis em templates
     # browsers diferentes tem sessões diferentes
-    return render_template('stocks/stocks.html', stocks=stocks)
+    # os preços de todos os tickets da página são buscados em uma única rodada
+    prices = portfolio_prices({stock.stock_symbol for stock in stocks})
+    return render_template('stocks/_stocks_table.html', stocks=stocks, prices=prices,
+                           prev_cursor=prev_cursor, next_cursor=next_cursor)
+
+
+def stream_stocks():
+    # os tickets do portifólio vêm do resumo de posições, sem percorrer os lotes
+    symbols = database.session.execute(
+        database.select(Position.stock_symbol).where(Position.user_id == current_user.id)
+    ).scalars()
+    prices = portfolio_prices(set(symbols))
+
+    query = database.select(Stock).where(Stock.user_id == current_user.id).order_by(Stock.id)
+    # yield_per faz o SQLAlchemy buscar as linhas em lotes, em vez de carregar
+    # todo o resultado em memória. Como o identity map da sessão guarda
+    # referências fracas, os objetos de lotes já renderizados são descartados
+    query = query.execution_options(yield_per=current_app.config['STOCKS_STREAM_BATCH_SIZE'])
+    stocks = database.session.execute(query).scalars()
+    # o stream_template do Flask mantém o contexto da requisição ativo durante
+    # a geração; TemplateStream agrupa pequenos pedaços de html antes de
+    # enviá-los ao servidor WSGI
+    stream = TemplateStream(stream_template('stocks/stocks.html', stocks=stocks, prices=prices, streaming=True))
+    stream.enable_buffering(100)
+    return current_app.response_class(stream)
+
+
+def portfolio_prices(symbols):
+    """
+    PriceMap com os preços de `symbols`: primeiro as cotações recentes gravadas
+    pelo job refresh-quotes (uma única consulta), e só os tickets ausentes ou
+    desatualizados são buscados no provider de cotações
+    """
+    if not symbols:
+        return quotes.price_map()
+    oldest = datetime.now() - timedelta(seconds=current_app.config['QUOTES_MAX_AGE'])
+    query = (database.select(Quote.stock_symbol, Quote.price)
+             .where(Quote.stock_symbol.in_(symbols))
+             .where(Quote.updated_on >= oldest))
+    stored = dict(database.session.execute(query).all())
+    return quotes.price_map(symbols, stored)
+
+
+def keyset_page(query, key_column, after=None, before=None, per_page=50):
+    """
+    Retorna uma página de `query` ordenada por `key_column` e os cursores
+    (prev_cursor, next_cursor) para as páginas vizinhas (None se não existir)
+
+    `after` busca os registros com chave maior que o cursor e `before` os com
+    chave menor. Uma linha extra é buscada para saber se existe outra página na
+    mesma direção, e a direção oposta é checada com uma consulta de existência
+    que usa o índice da chave
+    """
+    if before is not None:
+        page_query = query.where(key_column < before).order_by(key_column.desc())
+    else:
+        page_query = query.order_by(key_column)
+        if after is not None:
+            page_query = page_query.where(key_column > after)
+
+    rows = database.session.execute(page_query.limit(per_page + 1)).scalars().all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before is not None:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    first_key = getattr(rows[0], key_column.key)
+    last_key = getattr(rows[-1], key_column.key)
+    if before is not None:
+        prev_cursor = first_key if has_more else None
+        next_cursor = last_key if _exists(query.where(key_column > last_key)) else None
+    else:
+        next_cursor = last_key if has_more else None
+        prev_cursor = first_key if after is not None and _exists(query.where(key_column < first_key)) else None
+    return rows, prev_cursor, next_cursor
+
+
+def _exists(query):
+    return database.session.execute(query.limit(1)).first() is not None
+
+
+@stocks_blueprint.route('/stocks/positions')
+@login_required
+@read_replica
+@conditional_portfolio
+def list_positions():
+    # lê o resumo materializado em vez de agregar os lotes da tabela stocks
+    query = (database.select(Position)
+             .where(Position.user_id == current_user.id)
+             .order_by(Position.stock_symbol))
+    positions = database.session.execute(query).scalars().all()
+    return render_template('stocks/positions.html', positions=positions)
+
+
+@stocks_blueprint.route('/stocks/live')
+@login_required
+def live_portfolio():
+    # o snapshot inicial usa o resumo de posições e as cotações já conhecidas;
+    # depois disso, apenas as variações são enviadas
+    query = database.select(Position.stock_symbol, Position.number_of_shares).where(Position.user_id == current_user.id)
+    holdings = dict(database.session.execute(query).all())
+    prices = portfolio_prices(set(holdings))
+    snapshot = {
+        'value': sum(shares * (prices[symbol] or 0) for symbol, shares in holdings.items()),
+        'positions': {symbol: {'shares': shares, 'price': prices[symbol]} for symbol, shares in holdings.items()},
+    }
+    subscriber = live.subscribe(current_user.id, holdings, dict(prices))
+    broker = live.broker
+    heartbeat = current_app.config['LIVE_HEARTBEAT']
+    max_seconds = current_app.config['LIVE_STREAM_MAX_SECONDS']
+
+    # o gerador roda depois que a view retorna: não usa request nem banco
+    def events():
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield format_event('snapshot', snapshot)
+            while not subscriber.dropped and time.monotonic() < deadline:
+                event = subscriber.next_event(timeout=heartbeat)
+                yield event if event is not None else ': keep-alive\n\n'
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return current_app.response_class(events(), mimetype='text/event-stream',
+                                      headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@stocks_blueprint.route('/stocks/<symbol>/history')
+@login_required
+def price_history_data(symbol):
+    # as barras são uma view sobre o arquivo memory-mapped; só o intervalo
+    # pedido é lido do disco e convertido para JSON
+    try:
+        start, end = (date.fromisoformat(value) if value else None
+                      for value in (request.args.get('start'), request.args.get('end')))
+    except ValueError:
+        # datas fora do formato ISO (AAAA-MM-DD)
+        abort(400)
+    bars = price_history.store.read(symbol, start, end)
+    return jsonify({
+        'symbol': symbol.upper(),
+        'dates': bars['date'].astype(str).tolist(),
+        'close': (bars['close'] / 100).tolist(),
+        'volume': bars['volume'].tolist(),
+    })
 
 
 #                        permite lidar com diferentes métodos na mesma rota
 @stocks_blueprint.route('/add_stock', methods=['GET', 'POST'])
+@login_required
 def add_stock():
     if request.method == 'POST':
         # dados de formulários são disponibilizados como um dict
         # as chaves são as mesmas definidas no atributo name do form html
         for key, value in request.form.items():
-            print(f'{key}: {value}')
+            current_app.logger.debug('%s: %s', key, value)
 
         try:
             stock_data = StockModel(
@@ -57,7 +236,7 @@ def add_stock():
                 number_of_shares=request.form['number_of_shares'],
                 purchase_price=request.form['purchase_price']
             )
-            print(stock_data)
+            current_app.logger.debug('%s', stock_data)
 
             # armazena dados na sessão
             # sessões permitem armazenar dados de forma persisitente sobre
@@ -74,17 +253,21 @@ def add_stock():
             new_stock = Stock(
                 stock_data.stock_symbol,
                 stock_data.number_of_shares,
-                stock_data.purchase_price
+                stock_data.purchase_price,
+                current_user.id
             )
             database.session.add(new_stock)
+            apply_stock(new_stock)
             database.session.commit()
+            # descarta as tabelas renderizadas com a versão anterior do portifólio
+            fragments.invalidate(portfolio_tag(current_user.id))
 
             flash(f'Nova ação adicionada ({stock_data.stock_symbol})', 'success')
-            current_app.logger.info(f"Added new stock ({request.form['stock_symbol']})!")
+            current_app.logger.info("Added new stock (%s)!", request.form['stock_symbol'])
 
             return redirect(url_for('stocks.list_stocks'))
         except ValidationError as e:
-            print(e)
+            current_app.logger.debug('Invalid stock data: %s', e)
 
     return render_template('stocks/add_stock.html')
 
@@ -94,14 +277,16 @@ def add_stock():
 # ------------
 
 @stocks_blueprint.cli.command('create_default_set')
-def create_default_set():
+@click.option('--user', 'email', required=True, help='Email do usuário dono das ações')
+def create_default_set(email):
     """ Cria três novas ações e adiciona no banco de dados"""
-    stock1 = Stock('HD', '25', '247.29')
-    stock2 = Stock('TWTR', '230', '31.89')
-    stock3 = Stock('DIS', '65', '118.77')
-    database.session.add(stock1)
-    database.session.add(stock2)
-    database.session.add(stock3)
+    user = get_user_by_email(email)
+    stock1 = Stock('HD', '25', '247.29', user.id)
+    stock2 = Stock('TWTR', '230', '31.89', user.id)
+    stock3 = Stock('DIS', '65', '118.77', user.id)
+    for stock in [stock1, stock2, stock3]:
+        database.session.add(stock)
+        apply_stock(stock)
     database.session.commit()
 
 
@@ -109,9 +294,75 @@ def create_default_set():
 @click.argument('symbol')
 @click.argument('number_of_shares')
 @click.argument('purchase_price')
-def create(symbol, number_of_shares, purchase_price):
+@click.option('--user', 'email', required=True, help='Email do usuário dono da ação')
+def create(symbol, number_of_shares, purchase_price, email):
     """Cria uma nova ação passada pela CLI e adiciona no banco de dados"""
-    stock = Stock(symbol, number_of_shares, purchase_price)
+    user = get_user_by_email(email)
+    stock = Stock(symbol, number_of_shares, purchase_price, user.id)
     database.session.add(stock)
+    apply_stock(stock)
+    database.session.commit()
+
+
+@stocks_blueprint.cli.command('import')
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='Formato do arquivo (padrão: deduzido pela extensão)')
+@click.option('--batch-size', type=int,
+              help='Número de linhas por INSERT/commit (padrão: STOCKS_IMPORT_BATCH_SIZE)')
+@click.option('--user', 'email', required=True, help='Email do usuário dono das ações')
+def import_stocks(file, file_format, batch_size, email):
+    """Importa ações de um arquivo CSV ou JSONL (stock_symbol, number_of_shares, purchase_price)"""
+    user_id = get_user_by_email(email).id
+    file_format = file_format or detect_format(file.name)
+    batch_size = batch_size or current_app.config['STOCKS_IMPORT_BATCH_SIZE']
+
+    imported = rejected = 0
+    start = time.perf_counter()
+    for batch in batched(read_rows(file, file_format), batch_size):
+        valid_rows = []
+        for line_number, row in batch:
+            try:
+                if row is None:
+                    raise ValueError('linha mal formatada')
+                stock_data = StockModel(**row)
+            except (ValidationError, ValueError, TypeError) as e:
+                rejected += 1
+                # as rejeições são reportadas à medida que aparecem, sem acumular
+                click.echo(f'Linha {line_number} rejeitada: {_single_line(e)}', err=True)
+                continue
+            valid_rows.append({
+                'stock_symbol': stock_data.stock_symbol,
+                'number_of_shares': stock_data.number_of_shares,
+                'purchase_price': round(stock_data.purchase_price * 100),
+                'user_id': user_id
+            })
+
+        insert_stocks(valid_rows)
+        database.session.commit()
+        imported += len(valid_rows)
+
+    elapsed = time.perf_counter() - start
+    rate = imported / elapsed if elapsed > 0 else float(imported)
+    click.echo(f'{imported} ações importadas, {rejected} linhas rejeitadas '
+               f'em {elapsed:.2f}s ({rate:.0f} linhas/s)')
+
+
+@stocks_blueprint.cli.command('rebuild-positions')
+def rebuild_positions_command():
+    """Recalcula a tabela de posições a partir de todos os lotes de ações"""
+    count = rebuild_positions()
     database.session.commit()
+    click.echo(f'{count} posições recalculadas')
+
+
+def get_user_by_email(email):
+    query = database.select(User).where(User.email == email)
+    user = database.session.execute(query).scalar_one_or_none()
+    if user is None:
+        raise click.BadParameter(f'usuário {email} não encontrado', param_hint='--user')
+    return user
+
 
+def _single_line(error):
+    return ' '.join(str(error).split())
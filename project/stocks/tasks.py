@@ -0,0 +1,39 @@
+"""
+Jobs periódicos do blueprint stocks (ver project/scheduler.py)
+"""
+from datetime import datetime
+from project import database, quotes, scheduler
+from project.models import Position, Quote, upsert
+
+
+@scheduler.job('refresh-quotes', interval='PRICE_REFRESH_INTERVAL')
+def refresh_quotes():
+    """
+    Busca as cotações de todos os tickets em carteira e grava na tabela quotes
+
+    O job é idempotente: cada execução sobrescreve a cotação de cada ticket
+    (upsert pela chave stock_symbol), então rodar duas vezes não gera duplicatas
+    """
+    query = (database.select(Position.stock_symbol)
+             .where(Position.number_of_shares > 0)
+             .distinct())
+    symbols = database.session.execute(query).scalars().all()
+    if not symbols:
+        return
+
+    # descarta as cotações em cache para forçar a consulta ao provider
+    for symbol in symbols:
+        quotes.cache.invalidate(symbol)
+    prices = quotes.get_prices(symbols)
+
+    now = datetime.now()
+    rows = [{'stock_symbol': symbol, 'price': price, 'updated_on': now}
+            for symbol, price in prices.items() if price is not None]
+    if rows:
+        statement = upsert(Quote)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Quote.stock_symbol],
+            set_={'price': statement.excluded.price, 'updated_on': statement.excluded.updated_on}
+        )
+        database.session.execute(statement, rows)
+        database.session.commit()
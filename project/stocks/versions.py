@@ -0,0 +1,106 @@
+"""
+Versão dos portifólios e requisições condicionais (ETag/Last-Modified)
+
+Toda alteração de ações incrementa a versão do portifólio do dono na mesma
+transação: alterações feitas pelo ORM são detectadas no evento after_flush da
+sessão, e inserções em lote (project/stocks/bulk.py) chamam `bump_versions`.
+
+As páginas do portifólio derivam a ETag da versão, então uma requisição com
+If-None-Match de uma página que não mudou é respondida com 304 lendo apenas
+uma linha de portfolio_versions, sem consultar a tabela stocks nem renderizar
+o template. O 304 depende só da ETag: Last-Modified tem resolução de um
+segundo e não distingue duas alterações feitas no mesmo segundo, então é
+enviado apenas como informação (em UTC) e If-Modified-Since é ignorado.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, g, request, session
+from flask_login import current_user
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, func
+from project import database
+from project.models import PortfolioVersion, Quote, Stock, upsert
+
+
+def bump_versions(user_ids, connection=None):
+    """Incrementa a versão dos portifólios de `user_ids` na transação corrente"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    # em UTC, sem fuso (a coluna DateTime do SQLite não guarda o fuso)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    statement = upsert(PortfolioVersion)
+    statement = statement.on_conflict_do_update(
+        index_elements=[PortfolioVersion.user_id],
+        set_={'version': PortfolioVersion.version + 1, 'updated_on': statement.excluded.updated_on}
+    )
+    rows = [{'user_id': user_id, 'version': 1, 'updated_on': now} for user_id in user_ids]
+    (connection or database.session).execute(statement, rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def bump_versions_after_flush(flush_session, flush_context):
+    # new/dirty/deleted ainda refletem o que acabou de ser gravado
+    changed = [instance for instance in (*flush_session.new, *flush_session.dirty, *flush_session.deleted)
+               if isinstance(instance, Stock)]
+    if changed:
+        bump_versions((stock.user_id for stock in changed), flush_session.connection())
+
+
+def portfolio_tag(user_id):
+    """Tag de dependência dos fragmentos de html do portifólio de `user_id`"""
+    return f'portfolio:{user_id}'
+
+
+def portfolio_validators(user_id):
+    """
+    ETag e Last-Modified (em UTC) do portifólio de `user_id` para a requisição atual
+
+    Além da versão, a ETag considera a cotação mais recente gravada (os preços
+    aparecem na página), o intervalo de validade do cache de cotações e os
+    argumentos da URL (página, modo streaming)
+    """
+    version = database.session.get(PortfolioVersion, user_id)
+    quotes_updated_on = database.session.execute(database.select(func.max(Quote.updated_on))).scalar()
+    quotes_period = int(time.time() // current_app.config['QUOTES_CACHE_TTL'])
+
+    key = (f'{user_id}:{version.version if version else 0}:{quotes_updated_on}:{quotes_period}:'
+           f'{request.full_path}')
+    etag = hashlib.sha1(key.encode()).hexdigest()
+    dates = []
+    if version and version.updated_on:
+        dates.append(version.updated_on.replace(tzinfo=timezone.utc))
+    if quotes_updated_on:
+        # as cotações são gravadas no horário local do servidor
+        dates.append(quotes_updated_on.astimezone(timezone.utc))
+    return etag, max(dates) if dates else None
+
+
+def conditional_portfolio(view):
+    """
+    Responde 304 quando o portifólio do usuário não mudou desde a versão que o
+    cliente já possui, antes de executar a view
+    """
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        etag, last_modified = portfolio_validators(current_user.id)
+        # a view usa a ETag como chave dos fragmentos em cache (project/fragments.py)
+        g.portfolio_etag = etag
+        # mensagens flash pendentes só aparecem se a página for renderizada
+        not_modified = not session.get('_flashes') and request.if_none_match.contains_weak(etag)
+        if not_modified:
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        # o navegador pode guardar a página, mas deve revalidá-la sempre
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+    return decorated_view
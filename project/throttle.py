@@ -0,0 +1,167 @@
+"""
+Limite de tentativas de login (token bucket) por IP e por email
+
+Cada chave (o IP do cliente ou o email informado) tem um balde com até
+`attempts` fichas, reabastecido continuamente à taxa de `attempts` por
+`period` segundos. Cada tentativa de login consome uma ficha; sem fichas, a
+tentativa é rejeitada com 429 antes de buscar o usuário e de conferir a senha
+(o hash PBKDF2 é a parte cara do login). Assim um ataque de credential
+stuffing, seja de um IP contra muitos emails ou de muitos IPs contra um email,
+não consome a CPU reservada aos usuários reais.
+
+Os baldes ficam em memória (por processo, LRU limitado a LOGIN_THROTTLE_MAX_KEYS
+chaves) ou, com LOGIN_THROTTLE_STORAGE apontando para um arquivo, em uma tabela
+SQLite compartilhada por todos os processos do servidor.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class MemoryBucketStore:
+    """Baldes em um dict do processo, com limite de tamanho (LRU)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # chave -> (fichas, atualizado em)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """Consome uma ficha de `key`. Retorna 0 se permitido ou os segundos até a próxima ficha"""
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, wait = _take(tokens, updated, capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class SQLiteBucketStore:
+    """
+    Baldes em um arquivo SQLite, compartilhados entre processos
+
+    Cada linha guarda quando o seu balde estaria cheio de novo (expires), o que
+    depende do limitador que a gravou. Linhas vencidas equivalem a baldes
+    cheios e são removidas no máximo uma vez a cada `cleanup_interval` segundos
+    por processo, usando o índice de expires
+    """
+
+    def __init__(self, path, cleanup_interval=60):
+        self.path = path
+        self.cleanup_interval = cleanup_interval
+        self._next_cleanup = 0.0
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+                               'updated REAL NOT NULL, expires REAL NOT NULL DEFAULT 0)')
+            # arquivos criados antes da coluna expires: as linhas antigas vencem já
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(buckets)')}
+            if 'expires' not in columns:
+                connection.execute('ALTER TABLE buckets ADD COLUMN expires REAL NOT NULL DEFAULT 0')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_buckets_expires ON buckets (expires)')
+
+    def _connection(self):
+        # conexões sqlite3 não podem ser compartilhadas entre threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def take(self, key, capacity, rate, now):
+        connection = self._connection()
+        # BEGIN IMMEDIATE serializa leitura e escrita do balde entre processos
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE key = ? AND expires >= ?',
+                                     (key, now)).fetchone()
+            tokens, updated = row if row is not None else (capacity, now)
+            tokens, wait = _take(tokens, updated, capacity, rate, now)
+            connection.execute('INSERT INTO buckets (key, tokens, updated, expires) VALUES (?, ?, ?, ?) '
+                               'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, '
+                               'updated = excluded.updated, expires = excluded.expires',
+                               (key, tokens, now, now + (capacity - tokens) / rate))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if now >= self._next_cleanup:
+            self._next_cleanup = now + self.cleanup_interval
+            self.cleanup(now)
+        return wait
+
+    def cleanup(self, now):
+        """Remove os baldes que já estariam cheios de novo. Retorna quantos foram removidos"""
+        return self._connection().execute('DELETE FROM buckets WHERE expires < ?', (now,)).rowcount
+
+
+def _take(tokens, updated, capacity, rate, now):
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class RateLimiter:
+    """Token bucket de `attempts` tentativas a cada `period` segundos, por chave"""
+
+    def __init__(self, store, attempts, period, clock=time.time):
+        self.store = store
+        self.capacity = attempts
+        self.rate = attempts / period
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.allowed = self.rejected = 0
+
+    def hit(self, key):
+        """Registra uma tentativa de `key`. Retorna 0 se permitida ou os segundos a esperar"""
+        wait = self.store.take(key, self.capacity, self.rate, self._clock())
+        with self._lock:
+            if wait:
+                self.rejected += 1
+            else:
+                self.allowed += 1
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {'allowed': self.allowed, 'rejected': self.rejected}
+
+
+class LoginThrottle:
+    """Extensão Flask com os limitadores de tentativas de login por IP e por email"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        storage = app.config['LOGIN_THROTTLE_STORAGE']
+        if storage == 'memory':
+            store = MemoryBucketStore(app.config['LOGIN_THROTTLE_MAX_KEYS'])
+        else:
+            store = SQLiteBucketStore(storage)
+        app.extensions['login_throttle'] = {
+            'ip': RateLimiter(store, *app.config['LOGIN_THROTTLE_IP_LIMIT']),
+            'email': RateLimiter(store, *app.config['LOGIN_THROTTLE_EMAIL_LIMIT']),
+        }
+
+    def check(self, ip, email):
+        """
+        Registra uma tentativa de login e retorna 0 se ela pode prosseguir ou os
+        segundos até que uma nova tentativa seja aceita
+        """
+        if not current_app.config['LOGIN_THROTTLE_ENABLED']:
+            return 0
+        limiters = current_app.extensions['login_throttle']
+        # o IP é verificado primeiro: um IP bloqueado não consome fichas dos emails
+        wait = limiters['ip'].hit(f'ip:{ip}')
+        if not wait:
+            wait = limiters['email'].hit(f'email:{email.strip().lower()}')
+        return wait
+
+    def stats(self):
+        return {name: limiter.stats() for name, limiter in current_app.extensions['login_throttle'].items()}
@@ -7,6 +7,6 @@ from flask import Blueprint
 
 users_blueprint = Blueprint('users', __name__, template_folder='templates')
 
-from . import routes
+from . import routes, tasks
 
 
@@ -1,15 +1,15 @@
 from . import users_blueprint
+import math
 from datetime import datetime
-from flask import copy_current_request_context, render_template, flash, abort, request, current_app, redirect, url_for
+from flask import make_response, render_template, flash, abort, request, current_app, redirect, url_for
 from flask_login import login_user, current_user, login_required, logout_user
 from flask_mail import Message
 from itsdangerous import URLSafeTimedSerializer
 from itsdangerous.exc import BadSignature
 from .forms import RegistrationForm, LoginForm
 from project.models import User
-from project import database, mail
+from project import database, login_throttle, outbox, passwords
 from sqlalchemy.exc import IntegrityError
-from threading import Thread
 from urllib.parse import urlparse
 
 @users_blueprint.errorhandler(403)
@@ -31,21 +31,13 @@ def register():
             try:
                 new_user = User(form.email.data, form.password.data)
                 database.session.add(new_user)
+                # o email de confirmação é gravado na outbox, na mesma
+                # transação do usuário, e enviado pelo job deliver-mail
+                # (project/outbox.py): o registro não espera o servidor de email
+                outbox.enqueue(generate_confirmation_email(form.email.data))
                 database.session.commit()
                 flash(f'Obrigado por se registrar, {new_user.email}! Por favor, cheque seu email para confirmar o endereço de email.', 'success')
-                current_app.logger.info(f'Registered new user: {form.email.data}')
-                
-                # configura o flask para fazer cópia do contexto para enviar 
-                # o email em outra thread. Só funciona em view functions
-                @copy_current_request_context
-                def send_email(message):
-                    with current_app.app_context():
-                        mail.send(message)
-
-                msg = generate_confirmation_email(form.email.data)
-                # cria a thread e inicia
-                email_thread = Thread(target=send_email, args=[msg])
-                email_thread.start()
+                current_app.logger.info('Registered new user: %s', form.email.data)
 
                 return redirect(url_for('users.login'))
             # email já registrado (email unique)
@@ -64,35 +56,52 @@ def login():
     # current_user é um proxy fornecido pelo flask_login
     if current_user.is_authenticated:
         flash('Você já está logado!')
-        current_app.logger.info(f'Duplicate login attempt by user: {current_user.email}')
+        current_app.logger.info('Duplicate login attempt by user: %s', current_user.email)
         return redirect(url_for('index'))
 
     form = LoginForm()
 
     if request.method == 'POST':
         if form.validate_on_submit():
+            # limita as tentativas por IP e por email antes da parte cara do
+            # login, a conferência do hash da senha (project/throttle.py)
+            wait = login_throttle.check(request.remote_addr, form.email.data)
+            if wait:
+                current_app.logger.warning('Login throttled for %s from IP address: %s', form.email.data, request.remote_addr)
+                flash('ERRO! Muitas tentativas de login. Tente novamente em instantes.', 'error')
+                response = make_response(render_template('users/login.html', form=form), 429)
+                response.headers['Retry-After'] = str(math.ceil(wait))
+                return response
+
             query = database.select(User).where(User.email == form.email.data)
             user = database.session.execute(query).scalar_one()
 
             if user and user.is_password_correct(form.password.data):
                 # credenciais validadas, deixa logar
                 # se usuário não tiver selecionado a opção de manter logado, quando fechar o browser será deslogado
-                
+
+                # hash gerado com outro algoritmo/iterações: aproveita a senha
+                # em texto claro, disponível só agora, para atualizá-lo
+                if passwords.needs_rehash(user.password_hashed):
+                    user.set_password(form.password.data)
+                    database.session.commit()
+                    current_app.logger.info('Rehashed password for user: %s', user.email)
+
                 login_user(user, remember=form.remember_me.data)
                 flash(f'Bem vindo, {current_user.email}!')
-                current_app.logger.info(f'Logged in user: {current_user.email}')
+                current_app.logger.info('Logged in user: %s', current_user.email)
 
                 if not request.args.get('next'):
                     return redirect(url_for('users.user_profile'))
 
                 next_url = request.args.get('next')
-                current_app.logger.debug(f"{next_url}")
-                current_app.logger.debug(f"{urlparse(next_url)}")
+                current_app.logger.debug("%s", next_url)
+                current_app.logger.debug("%s", urlparse(next_url))
                 if urlparse(next_url).scheme != '' or urlparse(next_url).netloc != '':
-                    current_app.logger.info(f'Invalid next path in login request: {next_url}')
+                    current_app.logger.info('Invalid next path in login request: %s', next_url)
                     logout_user()
                     return abort(400)
-                    current_app.logger.info(f'Redirecting after valid login to: {next_url}')
+                    current_app.logger.info('Redirecting after valid login to: %s', next_url)
                 return redirect(url_for('index'))
 
         flash('ERRO! Credenciais inválidas.', 'error')
@@ -103,7 +112,7 @@ def login():
 @users_blueprint.route('/logout')
 @login_required # apenas usuários logados podem acessa a rota
 def logout():
-    current_app.logger.info(f'Logged out user: {current_user.email}')
+    current_app.logger.info('Logged out user: %s', current_user.email)
     logout_user()
     flash('Até a próxima!')
     return redirect(url_for('index'))
@@ -122,7 +131,7 @@ def confirm_email(token):
         email = confirm_serializer.loads(token, salt='email-confirmation-salt', max_age=3600)
     except BadSignature:
         flash('O link de confirmação expirou ou é inválido.', 'error')
-        current_app.logger.info(f'Invalid or expired confirmation link received from IP address: {request.remote_addr}')
+        current_app.logger.info('Invalid or expired confirmation link received from IP address: %s', request.remote_addr)
         return redirect(url_for('users.login'))
 
     query = database.select(User).where(User.email == email)
@@ -130,14 +139,14 @@ def confirm_email(token):
 
     if user.email_confirmed:
         flash('A conta já foi verificada. Faça o login', 'info')
-        current_app.logger.info(f'Confirmation link received for a confirmed user: {user.email}')
+        current_app.logger.info('Confirmation link received for a confirmed user: %s', user.email)
     else:
         user.email_confirmed = True
         user.email_confirmed_on = datetime.now()
         database.session.add(user)
         database.session.commit()
         flash('Obrigado por confirmar seu email!', 'success')
-        current_app.logger.info(f'Email address confirmed for: {user.email}')
+        current_app.logger.info('Email address confirmed for: %s', user.email)
 
     return redirect(url_for('index'))
 
@@ -0,0 +1,11 @@
+"""
+Jobs periódicos do blueprint users (ver project/scheduler.py)
+"""
+from project import scheduler
+from project.outbox import deliver_outbox
+
+
+@scheduler.job('deliver-mail', interval='MAIL_OUTBOX_INTERVAL')
+def deliver_mail():
+    """Envia os emails pendentes da outbox (confirmação de cadastro etc)"""
+    deliver_outbox()
@@ -3,6 +3,7 @@ import pytest
 from project import create_app, database
 from project.models import Stock, User
 from flask import current_app
+from tests.smtp_sink import SMTPSink
 
 
 @pytest.fixture(scope='module')
@@ -67,7 +68,7 @@ def test_client():
 
 @pytest.fixture(scope='module')
 def new_stock():
-    stock = Stock('AAPL', '16', '406.78')
+    stock = Stock('AAPL', '16', '406.78', 17)
     return stock
 
 
@@ -95,3 +96,16 @@ def log_in_default_user(test_client, register_default_user):
     yield
     test_client.get('/users/logout', follow_redirects=True)
 
+
+
+@pytest.fixture(scope='function')
+def smtp_sink(test_client):
+    # aponta o Flask-Mail para um servidor SMTP local (tests/smtp_sink.py)
+    mail_state = test_client.application.extensions['mail']
+    original = (mail_state.server, mail_state.port, mail_state.use_ssl, mail_state.use_tls, mail_state.suppress)
+    sink = SMTPSink().start()
+    mail_state.server, mail_state.port = sink.host, sink.port
+    mail_state.use_ssl = mail_state.use_tls = mail_state.suppress = False
+    yield sink
+    sink.stop()
+    mail_state.server, mail_state.port, mail_state.use_ssl, mail_state.use_tls, mail_state.suppress = original
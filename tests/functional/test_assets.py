@@ -0,0 +1,55 @@
+"""
+Este arquivo (test_assets.py) contém os testes funcionais para os arquivos estáticos com hash
+"""
+import shutil
+import pytest
+
+
+@pytest.fixture
+def built_assets(test_client, tmp_path):
+    # o build é feito em uma cópia da pasta static, sem alterar o projeto
+    app = test_client.application
+    static_folder = app.static_folder
+    shutil.copytree(static_folder, tmp_path / 'static', ignore=shutil.ignore_patterns('dist'))
+    app.static_folder = str(tmp_path / 'static')
+    result = app.test_cli_runner().invoke(args=['assets', 'build'])
+    assert result.exit_code == 0, result.output
+    yield app.extensions['assets']
+    app.static_folder = static_folder
+    app.extensions['assets'] = {}
+
+
+def test_static_url_uses_manifest(test_client, built_assets):
+    """
+    DADA uma aplicação Flask com os arquivos estáticos processados por `flask assets build`
+    QUANDO a página '/' é requisitada
+    ENTÃO checa se o css é referenciado pelo nome com hash
+    """
+    response = test_client.get('/')
+    assert response.status_code == 200
+    assert f'/static/{built_assets["css/base_style.css"]}'.encode() in response.data
+    assert b'/static/css/base_style.css' not in response.data
+
+
+def test_hashed_asset_served_precompressed(test_client, built_assets):
+    """
+    DADA uma aplicação Flask com os arquivos estáticos processados por `flask assets build`
+    QUANDO o css com hash é requisitado com e sem Accept-Encoding: gzip
+    ENTÃO checa se a versão .gz é enviada quando aceita e se o cache é imutável
+    """
+    url = f'/static/{built_assets["css/base_style.css"]}'
+    plain = test_client.get(url)
+    assert plain.status_code == 200
+    assert plain.headers.get('Content-Encoding') is None
+    assert b'body' in plain.data
+
+    compressed = test_client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert compressed.status_code == 200
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.mimetype == 'text/css'
+    assert len(compressed.data) < len(plain.data)
+    assert 'immutable' in compressed.headers['Cache-Control']
+    assert 'max-age=31536000' in compressed.headers['Cache-Control']
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    plain.close()
+    compressed.close()
@@ -0,0 +1,182 @@
+"""
+Este arquivo (test_jobs.py) contém os testes funcionais para os jobs periódicos e as atualizações em tempo real
+"""
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy.exc import OperationalError
+from project import database, live, scheduler
+from project.models import Job, Quote
+from project.live import PortfolioBroker
+from project.scheduler import Scheduler
+
+
+def test_refresh_quotes_job(test_client, register_default_user):
+    """
+    DADA uma aplicação Flask com um usuário que possui ações
+    QUANDO o agendador despacha os jobs vencidos duas vezes seguidas
+    ENTÃO checa se o job refresh-quotes grava as cotações uma única vez e agenda a próxima execução
+    """
+    app = test_client.application
+    runner = app.test_cli_runner()
+    runner.invoke(args=['stocks', 'create', 'AAPL', '10', '400.00', '--user', 'vitor@email.com'])
+    runner.invoke(args=['stocks', 'create', 'NOQT', '10', '1.00', '--user', 'vitor@email.com'])
+
+    assert sorted(scheduler.dispatch(app)) == ['deliver-mail', 'refresh-quotes']
+    assert scheduler.dispatch(app) == []
+
+    with app.app_context():
+        quotes = database.session.execute(database.select(Quote)).scalars().all()
+        assert [(quote.stock_symbol, quote.price) for quote in quotes] == [('AAPL', 45010)]
+        job = database.session.get(Job, 'refresh-quotes')
+        assert job.status == 'idle'
+        assert job.attempts == 0
+        assert job.next_run_on > job.last_started_on
+
+
+def test_list_stocks_reads_stored_quotes(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com cotações gravadas pelo job de atualização
+    QUANDO a página '/stocks/' for requisitada (GET)
+    ENTÃO checa se o preço gravado é usado em vez de consultar o provider
+    """
+    app = test_client.application
+    with app.app_context():
+        quote = database.session.get(Quote, 'AAPL')
+        quote.price = 50000
+        database.session.commit()
+
+    response = test_client.get('/stocks/')
+    assert response.status_code == 200
+    assert b'R$ 500.00' in response.data
+    assert b'R$ 450.10' not in response.data
+
+
+def test_failed_job_backoff(test_client):
+    """
+    DADO um job que sempre falha
+    QUANDO o agendador o executa
+    ENTÃO checa se a falha é registrada e a próxima execução é adiada com backoff exponencial
+    """
+    app = test_client.application
+    failing_scheduler = Scheduler(database=database)
+
+    @failing_scheduler.job('always-fails', interval=60)
+    def always_fails():
+        raise RuntimeError('provider fora do ar')
+
+    assert failing_scheduler.dispatch(app) == ['always-fails']
+    with app.app_context():
+        job = database.session.get(Job, 'always-fails')
+        assert job.status == 'failed'
+        assert job.attempts == 1
+        assert job.last_error == 'provider fora do ar'
+        first_delay = job.next_run_on - job.last_started_on
+
+        # força o job a ficar vencido para executar a segunda tentativa
+        job.next_run_on = None
+        database.session.commit()
+
+    assert failing_scheduler.dispatch(app) == ['always-fails']
+    with app.app_context():
+        job = database.session.get(Job, 'always-fails')
+        assert job.attempts == 2
+        assert job.next_run_on - job.last_started_on > first_delay
+
+
+def test_scheduler_survives_dispatch_errors(test_client, monkeypatch):
+    """
+    DADO um agendador cujo banco falha na primeira reivindicação de jobs
+    QUANDO o loop de agendamento está rodando
+    ENTÃO checa se o erro é registrado e o job é executado no ciclo seguinte
+    """
+    app = test_client.application
+    monkeypatch.setitem(app.config, 'JOBS_POLL_INTERVAL', 0.01)
+    flaky_scheduler = Scheduler(database=database)
+    executed = threading.Event()
+    claim = flaky_scheduler._claim
+    failures = []
+
+    def claim_failing_once(app, spec):
+        if not failures:
+            failures.append(spec.name)
+            raise OperationalError('UPDATE jobs', {}, Exception('database is locked'))
+        return claim(app, spec)
+
+    monkeypatch.setattr(flaky_scheduler, '_claim', claim_failing_once)
+
+    @flaky_scheduler.job('after-locked', interval=60)
+    def after_locked():
+        executed.set()
+
+    thread = flaky_scheduler.start(app)
+    try:
+        assert executed.wait(5)
+    finally:
+        flaky_scheduler.stop()
+        thread.join(5)
+    assert failures == ['after-locked']
+    assert not thread.is_alive()
+
+
+def test_live_portfolio_stream(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado que possui ações
+    QUANDO a rota '/stocks/live' for requisitada (GET) e uma cotação mudar
+    ENTÃO checa se um snapshot é enviado seguido do evento de variação de preço
+    """
+    app = test_client.application
+    app.config['LIVE_POLL_INTERVAL'] = 0.05
+    response = test_client.get('/stocks/live', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    events = iter(response.response)
+    snapshot = next(events).decode()
+    assert snapshot.startswith('event: snapshot')
+    assert '"AAPL":{"shares":10,"price":50000}' in snapshot
+
+    with app.app_context():
+        quote = database.session.get(Quote, 'AAPL')
+        quote.price = 51000
+        quote.updated_on = datetime.now()
+        database.session.commit()
+
+    event = next(events).decode()
+    assert event == 'event: price\ndata: {"symbol":"AAPL","price":51000,"value_delta":10000}\n\n'
+    response.close()
+    assert app.extensions['live']['broker'].stats()['subscribers'] == 0
+
+
+def test_live_publishes_late_committed_older_change(test_client):
+    """
+    DADA uma cotação gravada com updated_on anterior ao da última mudança já publicada
+    QUANDO ela só aparece no banco depois dessa consulta (commit atrasado)
+    ENTÃO checa se a mudança ainda é publicada, uma única vez
+    """
+    app = test_client.application
+    broker = PortfolioBroker()
+    # usuário sem posições no banco: só os eventos de cotação interessam
+    subscriber = broker.subscribe(0, {'EARLY3': 1, 'LATE3': 1}, {'EARLY3': 100, 'LATE3': 100})
+    start = datetime.now()
+    with app.app_context():
+        database.session.add(Quote(stock_symbol='EARLY3', price=100, updated_on=start))
+        database.session.add(Quote(stock_symbol='LATE3', price=100, updated_on=start))
+        database.session.commit()
+
+    # a transação da LATE3 marca o horário primeiro, mas a da EARLY3 é vista antes
+    stamped = start + timedelta(seconds=1)
+    with app.app_context():
+        database.session.get(Quote, 'EARLY3').updated_on = start + timedelta(seconds=2)
+        database.session.get(Quote, 'EARLY3').price = 200
+        database.session.commit()
+    since = live._publish_changes(app, broker, start)
+    assert since == start + timedelta(seconds=2)
+    assert '"symbol":"EARLY3","price":200' in subscriber.next_event(0)
+
+    with app.app_context():
+        database.session.get(Quote, 'LATE3').updated_on = stamped
+        database.session.get(Quote, 'LATE3').price = 300
+        database.session.commit()
+    since = live._publish_changes(app, broker, since)
+    assert '"symbol":"LATE3","price":300' in subscriber.next_event(0)
+    assert subscriber.next_event(0) is None
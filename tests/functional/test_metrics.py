@@ -0,0 +1,127 @@
+"""
+Este arquivo (test_metrics.py) contém os testes funcionais para a rota /metrics
+"""
+import json
+import os
+import re
+import time
+import pytest
+from project import metrics
+
+
+def metric(text, name, **labels):
+    """Valor da amostra `name` com exatamente os `labels` informados"""
+    label_text = ','.join(f'{label}="{value}"' for label, value in labels.items())
+    match = re.search(rf'^{re.escape(name)}{{{re.escape(label_text)}}} (\S+)$', text, re.MULTILINE)
+    assert match is not None, f'{name}{{{label_text}}} não encontrada'
+    return float(match.group(1))
+
+
+def test_metrics_per_endpoint(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado
+    QUANDO algumas páginas são requisitadas e depois a página '/metrics'
+    ENTÃO checa se latência, status e queries são exportados por endpoint
+    """
+    before = test_client.get('/metrics').data.decode()
+    assert test_client.get('/stocks/').status_code == 200
+    assert test_client.get('/stocks/').status_code == 200
+    assert test_client.get('/pagina-inexistente').status_code == 404
+
+    response = test_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.data.decode()
+    assert '# TYPE stonks_request_duration_seconds histogram' in text
+    assert metric(text, 'stonks_request_duration_seconds_count', endpoint='stocks.list_stocks', method='GET') == 2
+    assert metric(text, 'stonks_request_duration_seconds_bucket',
+                  endpoint='stocks.list_stocks', method='GET', le='+Inf') == 2
+    assert metric(text, 'stonks_responses_total', endpoint='stocks.list_stocks', method='GET', status='200') == 2
+    # rotas inexistentes não criam um label por url
+    assert metric(text, 'stonks_responses_total', endpoint='<unmatched>', method='GET', status='404') == 1
+    assert metric(text, 'stonks_db_queries_total', endpoint='stocks.list_stocks', method='GET') > 0
+    # a própria requisição a /metrics está em andamento
+    assert metric(text, 'stonks_requests_in_flight', endpoint='metrics') == 1
+    assert metric(text, 'stonks_cache_requests_total', cache='fragments', result='hits') >= \
+        metric(before, 'stonks_cache_requests_total', cache='fragments', result='hits')
+
+
+@pytest.fixture
+def metrics_dir(test_client, tmp_path):
+    app = test_client.application
+    app.config['METRICS_DIR'] = str(tmp_path)
+    yield tmp_path
+    app.config['METRICS_DIR'] = None
+
+
+def test_metrics_sum_other_processes(test_client, metrics_dir):
+    """
+    DADA uma aplicação Flask com METRICS_DIR contendo o snapshot de outro processo
+    QUANDO a página '/metrics' é requisitada
+    ENTÃO checa se os contadores do outro processo são somados aos do processo atual
+    """
+    def register_count(text):
+        if 'endpoint="users.register",method="POST"' not in text:
+            return 0
+        return metric(text, 'stonks_request_duration_seconds_count', endpoint='users.register', method='POST')
+
+    local = register_count(test_client.get('/metrics').data.decode())
+    buckets = list(test_client.application.config['METRICS_BUCKETS'])
+    other = {
+        'buckets': buckets,
+        'requests': [['users.register', 'POST', [0] * len(buckets) + [1], 12.5, 1, 4]],
+        'responses': [['users.register', 'POST', 302, 1]],
+        'in_flight': {'users.register': 2},
+        'caches': {'quotes': {'hits': 10, 'misses': 0}},
+        'login_attempts': {},
+    }
+    (metrics_dir / 'metrics-999999.json').write_text(json.dumps(other))
+    # arquivos inválidos (sendo gravados) são ignorados
+    (metrics_dir / 'metrics-999998.json').write_text('{')
+
+    text = test_client.get('/metrics').data.decode()
+    assert register_count(text) == local + 1
+    assert metric(text, 'stonks_request_duration_seconds_sum', endpoint='users.register', method='POST') >= 12.5
+    assert metric(text, 'stonks_db_queries_total', endpoint='users.register', method='POST') >= 4
+    assert metric(text, 'stonks_requests_in_flight', endpoint='users.register') == 2
+    assert metric(text, 'stonks_cache_requests_total', cache='quotes', result='hits') >= 10
+
+
+def test_metrics_retire_snapshots_of_finished_processes(test_client, metrics_dir):
+    """
+    DADA uma aplicação Flask com METRICS_DIR contendo o snapshot antigo de um processo encerrado
+    QUANDO o processo atual faz a limpeza dos snapshots e a página '/metrics' é requisitada
+    ENTÃO checa se o arquivo antigo é removido e os seus contadores continuam somados uma única vez
+    """
+    app = test_client.application
+    registry = app.extensions['metrics']
+    buckets = list(app.config['METRICS_BUCKETS'])
+    finished = {
+        'buckets': buckets,
+        'requests': [['about', 'GET', [1] + [0] * len(buckets), 0.001, 1, 0]],
+        'responses': [['about', 'GET', 200, 1]],
+        'in_flight': {},
+        'caches': {'identity': {'hits': 7, 'misses': 0}},
+        'login_attempts': {},
+    }
+    old_path = metrics_dir / 'metrics-999997.json'
+    old_path.write_text(json.dumps(finished))
+    stale = time.time() - app.config['METRICS_RETIRE_AFTER'] - 1
+    os.utime(old_path, (stale, stale))
+    # o snapshot de um processo vivo é recente e fica onde está
+    (metrics_dir / 'metrics-999996.json').write_text(json.dumps({**finished, 'caches': {}}))
+
+    def about_count():
+        return metric(test_client.get('/metrics').data.decode(), 'stonks_request_duration_seconds_count',
+                      endpoint='about', method='GET')
+
+    before = about_count()
+    own_path = str(metrics_dir / f'metrics-{os.getpid()}.json')
+    retired = metrics._absorb_retired(app, registry, own_path)
+    metrics._flush(app, registry, own_path)
+    for path in retired:
+        os.remove(path)
+
+    assert sorted(os.listdir(metrics_dir)) == sorted(['metrics-999996.json', f'metrics-{os.getpid()}.json'])
+    assert about_count() == before
+    assert registry.snapshot()['caches']['identity']['hits'] == 7
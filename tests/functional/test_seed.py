@@ -0,0 +1,68 @@
+"""
+Este arquivo (test_seed.py) contém os testes funcionais para o comando 'flask dev seed'
+"""
+import numpy as np
+from project import database
+from project.models import PortfolioVersion, Position, Stock, User
+from project.seed import zipf_weights
+
+
+def test_zipf_weights():
+    """
+    DADO 100 tickets com expoente de Zipf 1.0
+    QUANDO os pesos são calculados
+    ENTÃO checa se somam 1 e se o primeiro é duas vezes o segundo e dez vezes o décimo
+    """
+    weights = zipf_weights(100, 1.0)
+    assert np.isclose(weights.sum(), 1.0)
+    assert np.isclose(weights[0] / weights[1], 2.0)
+    assert np.isclose(weights[0] / weights[9], 10.0)
+
+
+def test_dev_seed(test_client):
+    """
+    DADA uma aplicação Flask
+    QUANDO o comando 'flask dev seed' for executado com lotes pequenos
+    ENTÃO checa se usuários, lotes, posições e versões foram criados com tickets concentrados
+    """
+    runner = test_client.application.test_cli_runner()
+    result = runner.invoke(args=['dev', 'seed', '--users', '30', '--lots-per-user', '20', '--symbols', '50',
+                                 '--confirmed-ratio', '0.5', '--batch-size', '100'])
+    assert result.exit_code == 0, result.output
+    assert '30 usuários, 600 lotes de 50 tickets' in result.output
+
+    with test_client.application.app_context():
+        users = database.session.execute(
+            database.select(User).where(User.email.like('seed%@example.com'))).scalars().all()
+        assert len(users) == 30
+        assert 0 < sum(user.email_confirmed for user in users) < 30
+        # o hash é o mesmo e a senha funciona no login
+        assert len({user.password_hashed for user in users}) == 1
+        assert users[0].is_password_correct('FlaskIsAwesome123')
+
+        user_ids = [user.id for user in users]
+        counts = database.session.execute(
+            database.select(Stock.stock_symbol, database.func.count())
+            .where(Stock.user_id.in_(user_ids))
+            .group_by(Stock.stock_symbol)
+            .order_by(database.func.count().desc())
+        ).all()
+        assert sum(count for _, count in counts) == 600
+        # Zipf: o ticket mais popular aparece muito mais que a média
+        assert counts[0][1] > 3 * 600 / 50
+
+        shares = database.session.execute(
+            database.select(database.func.sum(Position.number_of_shares)).where(Position.user_id.in_(user_ids))
+        ).scalar_one()
+        assert shares == database.session.execute(
+            database.select(database.func.sum(Stock.number_of_shares)).where(Stock.user_id.in_(user_ids))
+        ).scalar_one()
+        assert database.session.execute(
+            database.select(database.func.count()).select_from(PortfolioVersion)
+            .where(PortfolioVersion.user_id.in_(user_ids))
+        ).scalar_one() == 30
+
+    # executar de novo com o mesmo prefixo não duplica os usuários
+    result = runner.invoke(args=['dev', 'seed', '--users', '5'])
+    assert result.exit_code != 0
+    assert 'já existem 30 usuários' in result.output
@@ -1,6 +1,13 @@
 """
 Este arquivo (test_stocks.py) contém os testes funcionais para o blueprint stocks
 """
+import gzip
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import event as sqlalchemy_event
+from project import database
+from project.history import PriceHistoryStore
+from project.models import Position, Stock
 
 
 def test_index_page(test_client):
@@ -34,9 +41,9 @@ def test_about_page(test_client):
     assert b'Desenvolvido por Vitor' in response.data
 
 
-def test_get_add_stock_page(test_client):
+def test_get_add_stock_page(test_client, log_in_default_user):
     """
-    DADA uma aplicação Flask 
+    DADA uma aplicação Flask com usuário logado
     Quando a página '/add_stock' for requisitada (GET)
     ENTÃO checa se a resposta é valida
     """
@@ -49,9 +56,9 @@ def test_get_add_stock_page(test_client):
     assert 'Preço de compra (R$):' in response.data.decode()
 
 
-def test_post_add_stock_page(test_client):
+def test_post_add_stock_page(test_client, log_in_default_user):
     """
-    DADA uma aplicação Flask 
+    DADA uma aplicação Flask com usuário logado
     QUANDO a página '/add_stock' for requisitada (POST)
     ENTÃO checa se o usuário é redirecionado para a página '/stocks'
     """
@@ -74,3 +81,339 @@ def test_post_add_stock_page(test_client):
     assert b'23' in response.data
     assert b'432.17' in response.data
 
+
+def test_list_stocks_market_value(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado e cotações de mercado disponíveis
+    QUANDO a página '/stocks/' for requisitada (GET)
+    ENTÃO checa se o preço atual e o valor de mercado de cada lote são mostrados
+    """
+    response = test_client.get('/stocks/')
+    assert response.status_code == 200
+    assert 'Preço atual' in response.data.decode()
+    assert 'Valor de mercado' in response.data.decode()
+    assert b'R$ 450.10' in response.data
+    assert b'R$ 10352.30' in response.data
+
+
+
+def test_list_stocks_keyset_pagination(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado e mais ações do que cabem em uma página
+    QUANDO a página '/stocks/' for requisitada (GET) seguindo os cursores
+    ENTÃO checa se cada página mostra as ações seguintes e os links de navegação
+    """
+    test_client.application.config['STOCKS_PER_PAGE'] = 2
+    for symbol in ['MSFT', 'GOOG']:
+        test_client.post('/add_stock',
+                         data={'stock_symbol': symbol,
+                               'number_of_shares': '10',
+                               'purchase_price': '100.00'},
+                         follow_redirects=True)
+
+    response = test_client.get('/stocks/')
+    assert response.status_code == 200
+    assert b'AAPL' in response.data
+    assert b'MSFT' in response.data
+    assert b'GOOG' not in response.data
+    assert b'after=' in response.data
+    assert b'before=' not in response.data
+
+    response = test_client.get('/stocks/?after=2')
+    assert response.status_code == 200
+    assert b'GOOG' in response.data
+    assert b'AAPL' not in response.data
+    assert b'after=' not in response.data
+    assert b'before=3' in response.data
+
+    response = test_client.get('/stocks/?before=3')
+    assert response.status_code == 200
+    assert b'AAPL' in response.data
+    assert b'MSFT' in response.data
+    assert b'GOOG' not in response.data
+    test_client.application.config['STOCKS_PER_PAGE'] = 50
+
+
+def test_list_stocks_streaming(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado e ações cadastradas
+    QUANDO a página '/stocks/?stream=1' for requisitada (GET)
+    ENTÃO checa se todas as ações são enviadas em uma resposta streamed, sem paginação
+    """
+    test_client.application.config['STOCKS_STREAM_BATCH_SIZE'] = 1
+    response = test_client.get('/stocks/?stream=1')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert 'Lista de ações' in response.data.decode()
+    assert b'AAPL' in response.data
+    assert b'MSFT' in response.data
+    assert b'GOOG' in response.data
+    assert b'after=' not in response.data
+    test_client.application.config['STOCKS_STREAM_BATCH_SIZE'] = 500
+
+
+def test_import_stocks_csv(test_client, register_default_user, tmp_path):
+    """
+    DADA uma aplicação Flask e um arquivo CSV com linhas válidas e inválidas
+    QUANDO o comando 'flask stocks import' for executado com lotes pequenos
+    ENTÃO checa se as linhas válidas foram inseridas e as inválidas reportadas
+    """
+    csv_file = tmp_path / 'lots.csv'
+    csv_file.write_text('stock_symbol,number_of_shares,purchase_price\n'
+                        'petr,100,35.10\n'
+                        'VALE,50,61.25\n'
+                        'INVALID1,10,1.00\n'
+                        'ITUB,abc,30.00\n'
+                        'BBAS,20,4.35\n')
+
+    runner = test_client.application.test_cli_runner()
+    result = runner.invoke(args=['stocks', 'import', str(csv_file), '--batch-size', '2',
+                                       '--user', 'vitor@email.com'])
+    assert result.exit_code == 0
+    assert '3 ações importadas, 2 linhas rejeitadas' in result.output
+    assert 'Linha 4 rejeitada' in result.output
+    assert 'Linha 5 rejeitada' in result.output
+
+    with test_client.application.app_context():
+        query = database.select(Stock).where(Stock.stock_symbol.in_(['PETR', 'VALE', 'BBAS', 'ITUB']))
+        stocks = database.session.execute(query).scalars().all()
+        assert sorted(stock.stock_symbol for stock in stocks) == ['BBAS', 'PETR', 'VALE']
+        prices = {stock.stock_symbol: stock.purchase_price for stock in stocks}
+        assert prices['VALE'] == 6125
+        # 4.35 * 100 == 434.99999999999994: o valor é arredondado, não truncado
+        assert prices['BBAS'] == 435
+
+
+def test_import_stocks_jsonl(test_client, register_default_user, tmp_path):
+    """
+    DADA uma aplicação Flask e um arquivo JSONL
+    QUANDO o comando 'flask stocks import' for executado
+    ENTÃO checa se as linhas válidas foram inseridas e linhas mal formatadas rejeitadas
+    """
+    jsonl_file = tmp_path / 'lots.jsonl'
+    jsonl_file.write_text('{"stock_symbol": "WEGE", "number_of_shares": 7, "purchase_price": 40.5}\n'
+                          'not json\n'
+                          '\n'
+                          '{"stock_symbol": "WEGE", "number_of_shares": 3, "purchase_price": 41}\n')
+
+    runner = test_client.application.test_cli_runner()
+    result = runner.invoke(args=['stocks', 'import', str(jsonl_file), '--user', 'vitor@email.com'])
+    assert result.exit_code == 0
+    assert '2 ações importadas, 1 linhas rejeitadas' in result.output
+    assert 'Linha 2 rejeitada' in result.output
+
+    with test_client.application.app_context():
+        query = database.select(Stock).where(Stock.stock_symbol == 'WEGE')
+        assert len(database.session.execute(query).scalars().all()) == 2
+
+
+def test_stocks_pages_not_logged_in(test_client):
+    """
+    DADA uma aplicação Flask sem usuário logado
+    QUANDO as páginas '/stocks/' e '/add_stock' forem requisitadas (GET)
+    ENTÃO checa se o usuário é redirecionado para a página de login
+    """
+    for url in ['/stocks/', '/add_stock']:
+        response = test_client.get(url, follow_redirects=True)
+        assert response.status_code == 200
+        assert b'Login' in response.data
+        assert 'Lista de ações' not in response.data.decode()
+        assert 'Adicione uma ação' not in response.data.decode()
+
+
+def test_list_stocks_only_shows_own_stocks(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com ações de dois usuários diferentes
+    QUANDO a página '/stocks/' for requisitada (GET) pelo usuário logado
+    ENTÃO checa se apenas as ações do usuário logado são mostradas
+    """
+    test_client.post('/users/register',
+                     data={'email': 'outro@email.com',
+                           'password': 'FlaskIsAwesome123'},
+                     follow_redirects=True)
+    runner = test_client.application.test_cli_runner()
+    result = runner.invoke(args=['stocks', 'create', 'NVDA', '5', '480.00', '--user', 'outro@email.com'])
+    assert result.exit_code == 0
+
+    response = test_client.get('/stocks/?stream=1')
+    assert response.status_code == 200
+    assert b'AAPL' in response.data
+    assert b'NVDA' not in response.data
+
+    result = runner.invoke(args=['stocks', 'create', 'NVDA', '5', '480.00', '--user', 'ninguem@email.com'])
+    assert result.exit_code != 0
+    assert 'ninguem@email.com' in result.output
+
+
+def test_list_positions(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado e vários lotes do mesmo ticket
+    QUANDO a página '/stocks/positions' for requisitada (GET)
+    ENTÃO checa se a posição consolidada (total de ações, preço médio e custo) é mostrada
+    """
+    response = test_client.get('/stocks/positions')
+    assert response.status_code == 200
+    assert 'Posições consolidadas' in response.data.decode()
+    assert b'<td>WEGE</td>' in response.data
+    assert b'R$ 40.65' in response.data
+    assert b'R$ 406.50' in response.data
+    assert b'NVDA' not in response.data
+
+
+def test_rebuild_positions(test_client):
+    """
+    DADA uma aplicação Flask com posições mantidas incrementalmente
+    QUANDO o comando 'flask stocks rebuild-positions' for executado
+    ENTÃO checa se o resumo recalculado é igual ao mantido a cada inserção
+    """
+    def positions():
+        with test_client.application.app_context():
+            query = database.select(Position).order_by(Position.user_id, Position.stock_symbol)
+            return [(p.user_id, p.stock_symbol, p.number_of_shares, p.total_cost)
+                    for p in database.session.execute(query).scalars()]
+
+    incremental = positions()
+    assert 'WEGE' in [position[1] for position in incremental]
+
+    runner = test_client.application.test_cli_runner()
+    result = runner.invoke(args=['stocks', 'rebuild-positions'])
+    assert result.exit_code == 0
+    assert f'{len(incremental)} posições recalculadas' in result.output
+    assert positions() == incremental
+
+
+def test_price_history_data(test_client, log_in_default_user, tmp_path):
+    """
+    DADA uma aplicação Flask com usuário logado e histórico de preços gravado
+    QUANDO a rota '/stocks/<symbol>/history' for requisitada (GET) com um intervalo de datas
+    ENTÃO checa se as barras do intervalo são retornadas em JSON
+    """
+    store = PriceHistoryStore(str(tmp_path))
+    dates = np.arange(np.datetime64('2023-01-02'), np.datetime64('2023-01-06'))
+    store.append('PETR', {'date': dates, 'open': [3500, 3510, 3520, 3530], 'high': [3600] * 4,
+                          'low': [3400] * 4, 'close': [3510, 3520, 3530, 3540], 'volume': [10] * 4})
+    test_client.application.extensions['price_history'] = store
+
+    response = test_client.get('/stocks/petr/history?start=2023-01-03&end=2023-01-04')
+    assert response.status_code == 200
+    assert response.json == {'symbol': 'PETR', 'dates': ['2023-01-03', '2023-01-04'],
+                             'close': [35.2, 35.3], 'volume': [10, 10]}
+
+
+def test_price_history_data_invalid_date(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado
+    QUANDO a rota '/stocks/<symbol>/history' for requisitada (GET) com datas inválidas
+    ENTÃO checa se a resposta é 400 em vez de um erro interno
+    """
+    assert test_client.get('/stocks/petr/history?start=banana').status_code == 400
+    assert test_client.get('/stocks/petr/history?start=2023-01-03&end=2023-02-30').status_code == 400
+
+
+def test_list_stocks_conditional_get(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado que já recebeu a página '/stocks/'
+    QUANDO a página for requisitada novamente com If-None-Match, antes e depois de adicionar uma ação
+    ENTÃO checa se a resposta é 304 sem consultar a tabela stocks e 200 depois da alteração
+    """
+    response = test_client.get('/stocks/')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+    assert 'no-cache' in response.headers['Cache-Control']
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with test_client.application.app_context():
+        engine = database.engine
+    sqlalchemy_event.listen(engine, 'before_cursor_execute', record_statement)
+    try:
+        response = test_client.get('/stocks/', headers={'If-None-Match': etag})
+    finally:
+        sqlalchemy_event.remove(engine, 'before_cursor_execute', record_statement)
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert not [statement for statement in statements if 'FROM stocks' in statement]
+
+    # outra página do portifólio tem outra ETag
+    response = test_client.get('/stocks/?stream=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'AAPL' in response.data
+
+    test_client.post('/add_stock',
+                     data={'stock_symbol': 'ITSA', 'number_of_shares': '1', 'purchase_price': '10.00'},
+                     follow_redirects=True)
+    response = test_client.get('/stocks/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_list_stocks_last_modified_is_utc(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado que acabou de alterar o portifólio
+    QUANDO a página '/stocks/' for requisitada só com If-Modified-Since, no mesmo segundo de uma nova alteração
+    ENTÃO checa se Last-Modified está em UTC e a resposta é 200, já que só a ETag decide o 304
+    """
+    test_client.post('/add_stock',
+                     data={'stock_symbol': 'BBDC', 'number_of_shares': '1', 'purchase_price': '15.00'},
+                     follow_redirects=True)
+    response = test_client.get('/stocks/')
+    assert response.status_code == 200
+    assert abs(response.last_modified - datetime.now(timezone.utc)) < timedelta(minutes=1)
+
+    last_modified = response.headers['Last-Modified']
+    test_client.post('/add_stock',
+                     data={'stock_symbol': 'BBDC', 'number_of_shares': '2', 'purchase_price': '15.00'},
+                     follow_redirects=True)
+    response = test_client.get('/stocks/', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert b'BBDC' in response.data
+
+
+def test_list_stocks_fragment_cache(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado
+    QUANDO a página '/stocks/' é requisitada duas vezes e depois de adicionar uma ação
+    ENTÃO checa se a tabela é servida do cache de fragmentos e renderizada de novo após a alteração
+    """
+    fragments = test_client.application.extensions['fragments']
+    fragments.clear()
+
+    first = test_client.get('/stocks/')
+    second = test_client.get('/stocks/')
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert fragments.stats()['stocks_table']['hits'] >= 1
+
+    misses = fragments.stats()['stocks_table']['misses']
+    test_client.post('/add_stock',
+                     data={'stock_symbol': 'BBAS', 'number_of_shares': '3', 'purchase_price': '50.00'},
+                     follow_redirects=True)
+    response = test_client.get('/stocks/')
+    assert b'BBAS' in response.data
+    assert fragments.stats()['stocks_table']['misses'] > misses
+
+
+def test_list_stocks_compressed(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask com usuário logado
+    QUANDO a página '/stocks/' (normal e em streaming) é requisitada com Accept-Encoding: gzip
+    ENTÃO checa se o html é comprimido e se a ETag fraca ainda permite responder 304
+    """
+    response = test_client.get('/stocks/', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'AAPL' in gzip.decompress(response.data)
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+
+    response = test_client.get('/stocks/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = test_client.get('/stocks/?stream=1', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'AAPL' in gzip.decompress(response.data)
@@ -1,7 +1,12 @@
-from project import mail, database
-from project.models import User
+from project import database, login_throttle
+from sqlalchemy import event as sqlalchemy_event
+from project.models import OutboxMessage, User
+from project.outbox import deliver_outbox, enqueue
+from flask_mail import Message
 from itsdangerous import URLSafeTimedSerializer
+from datetime import datetime
 from flask import current_app
+from werkzeug.security import generate_password_hash
 
 
 def test_get_registration_page(test_client):
@@ -24,18 +29,21 @@ def test_valid_registration(test_client):
     QUANDO a rota '/users/register' for requisitada (POST)
     ENTÃO checa se a resposta é válida, o usuário foi registrado e se um email foi enfileirado para ser enviado
     """
-    with mail.record_messages() as outbox:
-        response = test_client.post('/users/register',
-                                    data={'email': 'vitor@email.com',
-                                          'password': 'FlaskIsAwesome123'},
-                                    follow_redirects=True)
-        assert response.status_code == 200
-        assert b'Obrigado por se registrar, vitor@email.com!' in response.data
-        assert 'Stonks - Portifólio de investimentos' in response.data.decode()
+    response = test_client.post('/users/register',
+                                data={'email': 'vitor@email.com',
+                                      'password': 'FlaskIsAwesome123'},
+                                follow_redirects=True)
+    assert response.status_code == 200
+    assert b'Obrigado por se registrar, vitor@email.com!' in response.data
+    assert 'Stonks - Portifólio de investimentos' in response.data.decode()
+    with test_client.application.app_context():
+        outbox = database.session.execute(
+            database.select(OutboxMessage).where(OutboxMessage.recipients == 'vitor@email.com')).scalars().all()
         assert len(outbox) == 1
+        assert outbox[0].status == 'pending'
         assert outbox[0].subject == 'Stonks - Confirme seu endereço de email'
         assert outbox[0].sender == 'almeidavitor.dev@gmail.com'
-        assert outbox[0].recipients[0] == 'vitor@email.com'
+        assert outbox[0].recipients == 'vitor@email.com'
         assert 'http://localhost/users/confirm/' in outbox[0].html
 
 
@@ -322,3 +330,145 @@ def test_login_with_next_invalid_path(test_client, register_default_user):
     assert b'Meu perfil' not in response.data
     assert b'Bem vindo, vitor@email.com!' not in response.data
 
+
+
+def test_load_user_cached(test_client, log_in_default_user):
+    """
+    DADA uma aplicação Flask configurada para testes com usuário logado
+    QUANDO páginas autenticadas são requisitadas antes e depois de alterar o usuário
+    ENTÃO checa se a tabela users não é consultada enquanto a identidade está no cache
+    e se a alteração a remove do cache
+    """
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    test_client.get('/users/profile')
+    with test_client.application.app_context():
+        engine = database.engine
+    sqlalchemy_event.listen(engine, 'before_cursor_execute', record_statement)
+    try:
+        response = test_client.get('/users/profile')
+        assert response.status_code == 200
+        assert b'Email: vitor@email.com' in response.data
+        assert not [statement for statement in statements if 'FROM users' in statement]
+
+        with test_client.application.app_context():
+            user = database.session.execute(
+                database.select(User).where(User.email == 'vitor@email.com')).scalar_one()
+            user.email_confirmed = not user.email_confirmed
+            database.session.commit()
+        statements.clear()
+        test_client.get('/users/profile')
+        assert [statement for statement in statements if 'FROM users' in statement]
+    finally:
+        sqlalchemy_event.remove(engine, 'before_cursor_execute', record_statement)
+
+
+def test_login_rehashes_password(test_client, register_default_user):
+    """
+    DADA uma aplicação Flask com um usuário cujo hash foi gerado com menos iterações que as configuradas
+    QUANDO o usuário faz login
+    ENTÃO checa se o hash é regerado com os parâmetros atuais
+    """
+    with test_client.application.app_context():
+        user = database.session.execute(
+            database.select(User).where(User.email == 'vitor@email.com')).scalar_one()
+        user.password_hashed = generate_password_hash('FlaskIsAwesome123', 'pbkdf2:sha256:500')
+        database.session.commit()
+
+    response = test_client.post('/users/login',
+                                data={'email': 'vitor@email.com', 'password': 'FlaskIsAwesome123'},
+                                follow_redirects=True)
+    assert response.status_code == 200
+    assert b'Bem vindo, vitor@email.com!' in response.data
+    test_client.get('/users/logout', follow_redirects=True)
+
+    with test_client.application.app_context():
+        user = database.session.execute(
+            database.select(User).where(User.email == 'vitor@email.com')).scalar_one()
+        assert user.password_hashed.startswith('pbkdf2:sha256:1000$')
+        assert user.is_password_correct('FlaskIsAwesome123')
+
+
+def test_outbox_delivery_reuses_connection(test_client, smtp_sink):
+    """
+    DADA uma aplicação Flask com três emails na outbox e um servidor SMTP local
+    QUANDO a outbox é processada
+    ENTÃO checa se os três emails são enviados pela mesma conexão e marcados como enviados
+    """
+    app = test_client.application
+    with app.app_context():
+        database.session.execute(database.delete(OutboxMessage))
+        for index in range(3):
+            enqueue(Message(subject=f'Email {index}', sender='stonks@email.com',
+                            recipients=[f'user{index}@email.com'], html=f'<p>{index}</p>'))
+        database.session.commit()
+
+        assert deliver_outbox() == 3
+        assert deliver_outbox() == 0
+        statuses = database.session.execute(database.select(OutboxMessage.status)).scalars().all()
+        assert statuses == ['sent'] * 3
+
+    assert smtp_sink.connections == 1
+    assert [recipients for _, recipients, _ in smtp_sink.messages] == [[f'user{index}@email.com'] for index in range(3)]
+    assert smtp_sink.messages[0][2]['Subject'] == 'Email 0'
+
+
+def test_outbox_delivery_retry(test_client, smtp_sink):
+    """
+    DADA uma aplicação Flask com um email na outbox para um destinatário recusado pelo servidor
+    QUANDO a outbox é processada
+    ENTÃO checa se o email é reagendado com backoff e marcado como failed após o número máximo de tentativas
+    """
+    app = test_client.application
+    smtp_sink.reject.add('invalido@email.com')
+    with app.app_context():
+        database.session.execute(database.delete(OutboxMessage))
+        outbox_message = enqueue(Message(subject='Recusado', sender='stonks@email.com',
+                                         recipients=['invalido@email.com'], body='oi'))
+        database.session.commit()
+
+        assert deliver_outbox() == 0
+        database.session.refresh(outbox_message)
+        assert outbox_message.status == 'pending'
+        assert outbox_message.attempts == 1
+        assert outbox_message.next_attempt_on > datetime.now()
+        assert deliver_outbox() == 0  # ainda não venceu
+
+        for _ in range(app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] - 1):
+            outbox_message.next_attempt_on = datetime.now()
+            database.session.commit()
+            deliver_outbox()
+        database.session.refresh(outbox_message)
+        assert outbox_message.status == 'failed'
+        assert 'invalido@email.com' in outbox_message.last_error
+
+
+def test_login_throttled_before_password_check(test_client, register_default_user, monkeypatch):
+    """
+    DADA uma aplicação Flask com limite de 5 tentativas de login por email
+    QUANDO são feitas 7 tentativas com a senha errada para o mesmo email
+    ENTÃO checa se as duas últimas são rejeitadas com 429 sem conferir a senha
+    """
+    app = test_client.application
+    app.config['LOGIN_THROTTLE_ENABLED'] = True
+    login_throttle.init_app(app)
+    checks = []
+    original = User.is_password_correct
+    monkeypatch.setattr(User, 'is_password_correct',
+                        lambda self, password: checks.append(password) or original(self, password))
+    try:
+        responses = [test_client.post('/users/login',
+                                      data={'email': 'vitor@email.com', 'password': 'SenhaErrada123'})
+                     for _ in range(7)]
+        assert [response.status_code for response in responses] == [200] * 5 + [429] * 2
+        assert len(checks) == 5
+        assert int(responses[-1].headers['Retry-After']) > 0
+        assert b'Muitas tentativas de login' in responses[-1].data
+        with app.app_context():
+            assert login_throttle.stats() == {'ip': {'allowed': 7, 'rejected': 0},
+                                              'email': {'allowed': 5, 'rejected': 2}}
+    finally:
+        app.config['LOGIN_THROTTLE_ENABLED'] = False
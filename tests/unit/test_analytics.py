@@ -0,0 +1,59 @@
+"""
+Este arquivo (test_analytics.py) contém os testes unitários para o módulo de análises de portifólio
+"""
+import numpy as np
+from project.analytics import (correlation_matrix, covariance_matrix, daily_returns, drawdowns,
+                               holdings_from_lots, max_drawdown, portfolio_returns,
+                               position_weights, volatility)
+
+
+def test_holdings_from_lots():
+    """
+    DADOS lotes de ações com tickets repetidos
+    QUANDO os lotes são agregados
+    ENTÃO checa se o total de ações e o custo total de cada ticket estão corretos
+    """
+    holdings = holdings_from_lots(['VALE', 'PETR', 'VALE'], [10, 100, 30], [6000, 3510, 6200])
+    assert list(holdings.symbols) == ['PETR', 'VALE']
+    assert list(holdings.shares) == [100, 40]
+    assert list(holdings.total_cost) == [351000, 246000]
+
+
+def test_position_weights():
+    """
+    DADAS posições e preços atuais
+    QUANDO os pesos são calculados
+    ENTÃO checa se cada peso é proporcional ao valor da posição e a soma é 1
+    """
+    weights = position_weights([10, 30], [300, 100])
+    assert np.allclose(weights, [0.5, 0.5])
+    assert np.allclose(position_weights([0, 0], [100, 100]), [0, 0])
+
+
+def test_returns_volatility_and_covariance():
+    """
+    DADA uma matriz de fechamentos (dias x tickets)
+    QUANDO retornos, volatilidade, covariância e correlação são calculados
+    ENTÃO checa se os resultados são iguais aos das funções de referência do NumPy
+    """
+    rng = np.random.default_rng(42)
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.01, size=(250, 4)), axis=0)
+    returns = daily_returns(closes)
+
+    assert returns.shape == (249, 4)
+    assert np.isclose(returns[0, 0], closes[1, 0] / closes[0, 0] - 1)
+    assert np.allclose(volatility(returns), returns.std(axis=0, ddof=1) * np.sqrt(252))
+    assert np.allclose(covariance_matrix(returns, periods_per_year=1), np.cov(returns, rowvar=False))
+    assert np.allclose(correlation_matrix(returns), np.corrcoef(returns, rowvar=False))
+    assert np.allclose(portfolio_returns(returns, [0.25] * 4), returns.mean(axis=1))
+
+
+def test_drawdowns():
+    """
+    DADA uma série de valores de um portifólio
+    QUANDO os drawdowns são calculados
+    ENTÃO checa a queda de cada ponto em relação ao topo anterior e a maior queda
+    """
+    values = np.array([100, 120, 90, 130, 117])
+    assert np.allclose(drawdowns(values), [0, 0, -0.25, 0, -0.1])
+    assert np.isclose(max_drawdown(values), -0.25)
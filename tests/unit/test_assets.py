@@ -0,0 +1,47 @@
+"""
+Este arquivo (test_assets.py) contém os testes unitários para o build dos arquivos estáticos
+"""
+import gzip
+import json
+from project.assets import build_assets, load_manifest
+
+
+def test_build_assets(tmp_path):
+    """
+    DADA uma pasta static com um css e uma imagem
+    QUANDO o build é executado
+    ENTÃO checa se os arquivos com hash, o .gz do css e o manifest são gerados
+    """
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'img').mkdir()
+    css = b'body { color: black; }\n' * 50
+    (tmp_path / 'css' / 'base_style.css').write_bytes(css)
+    (tmp_path / 'img' / 'logo.png').write_bytes(b'\x89PNG' + bytes(100))
+
+    manifest = build_assets(str(tmp_path))
+
+    hashed_css = manifest['css/base_style.css']
+    assert hashed_css.startswith('dist/css/base_style.') and hashed_css.endswith('.css')
+    assert (tmp_path / hashed_css).read_bytes() == css
+    assert gzip.decompress((tmp_path / (hashed_css + '.gz')).read_bytes()) == css
+    # imagens já são comprimidas
+    assert not (tmp_path / (manifest['img/logo.png'] + '.gz')).exists()
+    assert json.loads((tmp_path / 'dist' / 'manifest.json').read_text()) == manifest
+    assert load_manifest(str(tmp_path)) == manifest
+
+
+def test_build_assets_hash_changes_with_content(tmp_path):
+    """
+    DADA uma pasta static com um css já processado pelo build
+    QUANDO o conteúdo do css muda e o build é executado de novo
+    ENTÃO checa se o nome muda e o arquivo do build anterior é mantido
+    """
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'base_style.css').write_text('a {}')
+    first = build_assets(str(tmp_path), sources=('css',))['css/base_style.css']
+    (tmp_path / 'css' / 'base_style.css').write_text('b {}')
+    second = build_assets(str(tmp_path), sources=('css',))['css/base_style.css']
+
+    assert first != second
+    assert (tmp_path / first).exists() and (tmp_path / second).exists()
+    assert load_manifest(str(tmp_path / 'missing')) == {}
@@ -0,0 +1,93 @@
+"""
+Este arquivo (test_compression.py) contém os testes unitários para o middleware de compressão
+"""
+import gzip
+import zlib
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+from project.compression import CompressionMiddleware, compress_chunks
+
+
+def make_client(body, mimetype='text/html', min_size=100, **headers):
+    def app(environ, start_response):
+        response = Response(body, mimetype=mimetype, headers=headers)
+        return response(environ, start_response)
+    return Client(CompressionMiddleware(app, min_size=min_size))
+
+
+def test_compress_gzip():
+    """
+    DADA uma aplicação WSGI que retorna um html grande com ETag
+    QUANDO a resposta é pedida com Accept-Encoding: gzip
+    ENTÃO checa se ela é comprimida, sem Content-Length e com ETag fraca
+    """
+    html = '<tr><td>PETR4</td></tr>' * 200
+    client = make_client(html, ETag='"abc"')
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"abc"'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.get_data()).decode() == html
+
+
+def test_compress_deflate_negotiation():
+    """
+    DADA uma aplicação WSGI que retorna um html grande
+    QUANDO o cliente recusa gzip e aceita deflate
+    ENTÃO checa se a resposta usa deflate (formato zlib)
+    """
+    html = '<p>Stonks</p>' * 100
+    response = make_client(html).get('/', headers={'Accept-Encoding': 'gzip;q=0, deflate'})
+    assert response.headers['Content-Encoding'] == 'deflate'
+    assert zlib.decompress(response.get_data()).decode() == html
+
+
+def test_no_compression_below_threshold_or_other_types():
+    """
+    DADA uma aplicação WSGI com uma resposta pequena, uma imagem e um cliente sem Accept-Encoding
+    QUANDO as respostas são pedidas
+    ENTÃO checa se nenhuma delas é comprimida
+    """
+    assert 'Content-Encoding' not in make_client('<p>oi</p>').get(
+        '/', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in make_client(b'\x89PNG' * 100, mimetype='image/png').get(
+        '/', headers={'Accept-Encoding': 'gzip'}).headers
+    assert 'Content-Encoding' not in make_client('<p>Stonks</p>' * 100).get('/').headers
+
+
+def test_compress_streamed_response():
+    """
+    DADA uma aplicação WSGI que gera a resposta em vários pedaços, sem Content-Length
+    QUANDO a resposta é pedida com Accept-Encoding: gzip
+    ENTÃO checa se cada pedaço é comprimido e enviado sem esperar o fim da resposta
+    """
+    generated = []
+
+    def rows():
+        for i in range(50):
+            generated.append(i)
+            yield f'<tr><td>{i}</td></tr>\n'
+
+    client = make_client(rows())
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    stream = iter(response.response)
+    first = next(stream)
+    assert first and len(generated) < 50
+    data = first + b''.join(stream)
+    response.close()
+    assert gzip.decompress(data).decode() == ''.join(f'<tr><td>{i}</td></tr>\n' for i in range(50))
+
+
+def test_compress_chunks_sync_flush():
+    """
+    DADOS pedaços de texto
+    QUANDO são comprimidos com compress_chunks
+    ENTÃO checa se a saída acumulada até cada pedaço já pode ser descomprimida
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    output = compress_chunks([b'primeiro ', b'segundo'], 'gzip')
+    assert decompressor.decompress(next(output)) == b'primeiro '
+    assert decompressor.decompress(next(output)) == b'segundo'
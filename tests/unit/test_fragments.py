@@ -0,0 +1,73 @@
+"""
+Este arquivo (test_fragments.py) contém os testes unitários para o cache de fragmentos de html
+"""
+from project.fragments import FragmentCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fragment_cache_hit_and_ttl():
+    """
+    DADO um cache de fragmentos com TTL de 300 segundos
+    QUANDO o mesmo fragmento é pedido antes e depois do TTL expirar
+    ENTÃO checa se ele só é renderizado novamente depois da expiração
+    """
+    clock = FakeClock()
+    cache = FragmentCache(ttl=300, clock=clock)
+    renders = []
+
+    def render():
+        renders.append(1)
+        return '<p>Sobre</p>'
+
+    assert cache.get_or_render('about', render, args=('Vitor',)) == '<p>Sobre</p>'
+    assert cache.get_or_render('about', render, args=('Vitor',)) == '<p>Sobre</p>'
+    assert len(renders) == 1
+    # outros argumentos são outro fragmento
+    cache.get_or_render('about', render, args=('Ana',))
+    assert len(renders) == 2
+
+    clock.now = 301
+    cache.get_or_render('about', render, args=('Vitor',))
+    assert len(renders) == 3
+    assert cache.stats() == {'about': {'hits': 1, 'misses': 3, 'hit_rate': 0.25}}
+
+
+def test_fragment_cache_lru_eviction():
+    """
+    DADO um cache de fragmentos com no máximo 2 entradas
+    QUANDO um terceiro fragmento é adicionado
+    ENTÃO checa se o fragmento usado há mais tempo é descartado
+    """
+    cache = FragmentCache(maxsize=2)
+    cache.get_or_render('index', lambda: 'index')
+    cache.get_or_render('404', lambda: '404')
+    cache.get_or_render('index', lambda: 'index')  # index passa a ser o mais recente
+    cache.get_or_render('405', lambda: '405')
+
+    assert cache.evictions == 1
+    assert cache.get_or_render('index', lambda: 'novo') == 'index'
+    assert cache.get_or_render('404', lambda: 'novo') == 'novo'
+
+
+def test_fragment_cache_invalidate_by_tag():
+    """
+    DADO um cache com fragmentos que dependem do portifólio de dois usuários
+    QUANDO a tag do portifólio de um deles é invalidada
+    ENTÃO checa se apenas os fragmentos desse usuário são renderizados novamente
+    """
+    cache = FragmentCache()
+    cache.get_or_render('stocks_table', lambda: 'página 1', args=(1, 'a'), depends_on=['portfolio:1'])
+    cache.get_or_render('stocks_table', lambda: 'página 2', args=(1, 'b'), depends_on=['portfolio:1'])
+    cache.get_or_render('stocks_table', lambda: 'outro', args=(2, 'a'), depends_on=['portfolio:2'])
+
+    assert cache.invalidate('portfolio:1') == 2
+    assert cache.invalidate('portfolio:1') == 0
+    assert cache.get_or_render('stocks_table', lambda: 'nova', args=(1, 'a'), depends_on=['portfolio:1']) == 'nova'
+    assert cache.get_or_render('stocks_table', lambda: 'nova', args=(2, 'a'), depends_on=['portfolio:2']) == 'outro'
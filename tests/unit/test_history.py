@@ -0,0 +1,114 @@
+"""
+Este arquivo (test_history.py) contém os testes unitários para o armazenamento do histórico de preços
+"""
+import threading
+import numpy as np
+import pytest
+from project.history import BAR_DTYPE, PriceHistoryStore
+
+
+def make_bars(start, days, first_close=1000):
+    dates = np.arange(np.datetime64(start, 'D'), np.datetime64(start, 'D') + np.timedelta64(days, 'D'))
+    close = first_close + np.arange(days)
+    return {'date': dates, 'open': close, 'high': close + 5, 'low': close - 5,
+            'close': close, 'volume': np.full(days, 100)}
+
+
+def test_append_and_read_range(tmp_path):
+    """
+    DADO um histórico de preços com 10 dias de barras
+    QUANDO um intervalo de datas é lido
+    ENTÃO checa se apenas as barras do intervalo são retornadas, sem cópia dos dados
+    """
+    store = PriceHistoryStore(str(tmp_path))
+    assert store.append('petr4', make_bars('2023-01-01', 10)) == 10
+
+    bars = store.read('PETR4', '2023-01-03', '2023-01-05')
+    assert bars.dtype == BAR_DTYPE
+    assert list(bars['close']) == [1002, 1003, 1004]
+    assert isinstance(bars, np.memmap)
+    assert np.shares_memory(bars, store.read('PETR4'))
+    assert len(store.read('PETR4', start='2023-01-08')) == 3
+    assert len(store.read('VALE3')) == 0
+
+
+def test_append_only_updates(tmp_path):
+    """
+    DADO um histórico de preços existente
+    QUANDO novas barras diárias são adicionadas (inclusive por outra instância do store)
+    ENTÃO checa se o arquivo e o índice crescem e barras antigas ou repetidas são rejeitadas
+    """
+    store = PriceHistoryStore(str(tmp_path))
+    store.append('PETR4', make_bars('2023-01-01', 5))
+    assert len(store.read('PETR4')) == 5
+
+    store.append('PETR4', make_bars('2023-01-06', 2, first_close=2000))
+    assert list(store.read('PETR4')['close'][-2:]) == [2000, 2001]
+    assert store.info('PETR4') == {'rows': 7, 'first': '2023-01-01', 'last': '2023-01-07'}
+
+    with pytest.raises(ValueError):
+        store.append('PETR4', make_bars('2023-01-07', 1))
+
+    reopened = PriceHistoryStore(str(tmp_path))
+    assert reopened.symbols() == ['PETR4']
+    assert len(reopened.read('PETR4')) == 7
+
+
+def test_interrupted_append_is_discarded(tmp_path):
+    """
+    DADO um histórico cujo último append gravou as barras mas caiu antes de atualizar o índice
+    QUANDO o histórico é lido e as mesmas datas são adicionadas de novo
+    ENTÃO checa se as barras órfãs são ignoradas na leitura e descartadas no append, sem datas repetidas
+    """
+    store = PriceHistoryStore(str(tmp_path))
+    store.append('PETR4', make_bars('2023-01-01', 5))
+    # simula a queda: barras no arquivo, índice sem elas
+    with open(tmp_path / 'PETR4.bars', 'ab') as file:
+        file.write(np.array([tuple(bar) for bar in zip(*make_bars('2023-01-06', 2).values())],
+                            dtype=BAR_DTYPE).tobytes())
+
+    reopened = PriceHistoryStore(str(tmp_path))
+    assert len(reopened.read('PETR4')) == 5
+    reopened.append('PETR4', make_bars('2023-01-06', 3, first_close=2000))
+    bars = reopened.read('PETR4')
+    assert len(bars) == 8
+    assert len(np.unique(bars['date'])) == 8
+    assert list(bars['close'][-3:]) == [2000, 2001, 2002]
+
+
+def test_concurrent_appends_from_separate_stores(tmp_path):
+    """
+    DADAS duas instâncias do store (como em dois processos) no mesmo diretório
+    QUANDO ambas adicionam barras a tickets diferentes ao mesmo tempo
+    ENTÃO checa se o índice final conta todas as barras dos dois tickets
+    """
+    def append_days(symbol):
+        store = PriceHistoryStore(str(tmp_path))
+        start = np.datetime64('2023-01-01', 'D')
+        for day in range(50):
+            store.append(symbol, make_bars(start + np.timedelta64(day, 'D'), 1))
+
+    threads = [threading.Thread(target=append_days, args=(symbol,)) for symbol in ('PETR4', 'VALE3')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store = PriceHistoryStore(str(tmp_path))
+    assert store.info('PETR4')['rows'] == store.info('VALE3')['rows'] == 50
+    assert len(store.read('PETR4')) == len(store.read('VALE3')) == 50
+
+
+def test_close_matrix(tmp_path):
+    """
+    DADOS históricos de dois tickets com dias diferentes
+    QUANDO a matriz de fechamentos é montada
+    ENTÃO checa se apenas os dias em comum são mantidos, com uma coluna por ticket
+    """
+    store = PriceHistoryStore(str(tmp_path))
+    store.append('PETR4', make_bars('2023-01-01', 5))
+    store.append('VALE3', make_bars('2023-01-03', 5, first_close=5000))
+
+    dates, closes = store.close_matrix(['PETR4', 'VALE3'])
+    assert [str(date) for date in dates] == ['2023-01-03', '2023-01-04', '2023-01-05']
+    assert closes.tolist() == [[1002, 5000], [1003, 5001], [1004, 5002]]
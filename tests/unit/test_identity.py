@@ -0,0 +1,49 @@
+"""
+Este arquivo (test_identity.py) contém os testes unitários para o cache de identidades do user_loader
+"""
+from project.identity import IdentityCache, UserIdentity
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_identity_cache_ttl_and_invalidate():
+    """
+    DADO um cache de identidades com TTL de 30 segundos
+    QUANDO uma identidade é consultada antes e depois do TTL e após ser invalidada
+    ENTÃO checa se ela só é retornada enquanto válida
+    """
+    clock = FakeClock()
+    cache = IdentityCache(ttl=30, clock=clock)
+    identity = UserIdentity(1, 'vitor@email.com', True)
+    cache.set(identity)
+
+    assert cache.get(1) is identity
+    assert identity.get_id() == '1' and identity.is_authenticated
+    clock.now = 31
+    assert cache.get(1) is None
+
+    cache.set(identity)
+    cache.invalidate({1})
+    assert cache.get(1) is None
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'size': 0}
+
+
+def test_identity_cache_lru_eviction():
+    """
+    DADO um cache de identidades com no máximo 2 entradas
+    QUANDO uma terceira identidade é adicionada
+    ENTÃO checa se a usada há mais tempo é descartada
+    """
+    cache = IdentityCache(maxsize=2)
+    for user_id in (1, 2):
+        cache.set(UserIdentity(user_id, f'{user_id}@email.com', False))
+    cache.get(1)
+    cache.set(UserIdentity(3, '3@email.com', False))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
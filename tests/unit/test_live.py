@@ -0,0 +1,93 @@
+"""
+Este arquivo (test_live.py) contém os testes unitários para o broker de atualizações em tempo real
+"""
+import json
+from project.live import PortfolioBroker
+
+
+def parse(event):
+    event_type, data = event.strip().split('\n')
+    return event_type.removeprefix('event: '), json.loads(data.removeprefix('data: '))
+
+
+def test_price_tick_fan_out():
+    """
+    DADO um broker com assinantes que possuem e que não possuem um ticket
+    QUANDO o preço do ticket muda
+    ENTÃO checa se apenas quem possui o ticket recebe o evento, com a variação da sua posição
+    """
+    broker = PortfolioBroker()
+    holder = broker.subscribe(1, {'PETR4': 100}, {'PETR4': 3500})
+    other_holder = broker.subscribe(2, {'PETR4': 10, 'VALE3': 5}, {})
+    not_holder = broker.subscribe(3, {'VALE3': 5}, {'VALE3': 6000})
+
+    assert broker.publish_price('PETR4', 3600) == 2
+    assert parse(holder.next_event(0)) == ('price', {'symbol': 'PETR4', 'price': 3600, 'value_delta': 10000})
+    assert parse(other_holder.next_event(0))[1]['value_delta'] == 1000
+    assert not_holder.next_event(0) is None
+
+    # preço repetido não gera evento
+    assert broker.publish_price('PETR4', 3600) == 0
+    assert broker.stats()['published'] == 1
+
+
+def test_holdings_change():
+    """
+    DADO um assinante com uma posição
+    QUANDO a quantidade de ações do usuário muda
+    ENTÃO checa se o evento traz a variação do valor e os próximos ticks usam a nova quantidade
+    """
+    broker = PortfolioBroker()
+    subscriber = broker.subscribe(1, {'PETR4': 100}, {'PETR4': 3500})
+
+    assert broker.publish_holdings(1, 'PETR4', 150) == 1
+    assert parse(subscriber.next_event(0))[1] == {'symbol': 'PETR4', 'shares': 150, 'price': 3500,
+                                                  'value_delta': 175000}
+    assert broker.publish_holdings(1, 'PETR4', 150) == 0
+
+    broker.publish_price('PETR4', 3510)
+    assert parse(subscriber.next_event(0))[1]['value_delta'] == 1500
+
+
+def test_slow_consumer_is_dropped():
+    """
+    DADO um assinante que não consome os eventos
+    QUANDO a sua fila enche
+    ENTÃO checa se ele é descartado sem afetar os demais assinantes
+    """
+    broker = PortfolioBroker(max_queue=2)
+    slow = broker.subscribe(1, {'PETR4': 1}, {'PETR4': 100})
+    fast = broker.subscribe(2, {'PETR4': 1}, {})
+
+    for price in range(101, 106):
+        broker.publish_price('PETR4', price)
+        fast.next_event(0)
+
+    assert slow.dropped
+    assert not fast.dropped
+    assert broker.stats() == {'subscribers': 1, 'published': 5, 'delivered': 7, 'dropped': 1}
+
+
+
+def test_holdings_updated_under_broker_lock():
+    """
+    DADO um assinante cujas posições só podem ser alteradas com o lock do broker
+    QUANDO ele recebe uma posição nova e depois se desconecta
+    ENTÃO checa se a posição foi alterada sob o lock e o assinante não fica no índice por ticket
+    """
+    broker = PortfolioBroker()
+    subscriber = broker.subscribe(1, {'PETR4': 100}, {'PETR4': 3500})
+
+    class LockedHoldings(dict):
+        # unsubscribe percorre as posições sob o lock: alterações fora dele
+        # podem quebrar a iteração ou deixar o assinante em _by_symbol
+        def __setitem__(self, symbol, shares):
+            assert broker._lock.locked()
+            super().__setitem__(symbol, shares)
+
+    subscriber.holdings = LockedHoldings(subscriber.holdings)
+    assert broker.publish_holdings(1, 'VALE3', 10) == 1
+    assert subscriber.holdings == {'PETR4': 100, 'VALE3': 10}
+
+    broker.unsubscribe(subscriber)
+    assert broker.symbols() == []
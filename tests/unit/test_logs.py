@@ -0,0 +1,93 @@
+"""
+Este arquivo (test_logs.py) contém os testes unitários para o logging em fila
+"""
+import json
+import logging
+import sys
+from flask import Flask
+from project.logs import JsonFormatter, LocalQueueHandler, build_file_handler, queued_handler
+
+
+def log_config(tmp_path, log_format='text'):
+    return {'LOG_FILE': str(tmp_path / 'app.log'), 'LOG_FORMAT': log_format, 'LOG_ROTATION': 'size',
+            'LOG_MAX_BYTES': 1024 * 1024, 'LOG_BACKUP_COUNT': 2, 'LOG_ROTATION_WHEN': 'midnight'}
+
+
+def test_json_formatter():
+    """
+    DADO um registro de log com argumentos e uma exceção
+    QUANDO ele é formatado pelo JsonFormatter
+    ENTÃO checa se a saída é um objeto JSON em uma linha com a mensagem montada
+    """
+    try:
+        raise ValueError('preço inválido')
+    except ValueError:
+        record = logging.LogRecord('project', logging.ERROR, 'routes.py', 42,
+                                   'Added new stock (%s)!', ('AAPL',), exc_info=sys.exc_info())
+
+    line = JsonFormatter().format(record)
+    entry = json.loads(line)
+    assert '\n' not in line
+    assert entry['level'] == 'ERROR'
+    assert entry['logger'] == 'project'
+    assert entry['message'] == 'Added new stock (AAPL)!'
+    assert entry['line'] == 42
+    assert 'ValueError: preço inválido' in entry['exception']
+
+
+def test_queued_handler_writes_in_background(tmp_path):
+    """
+    DADO um logger com o handler em fila gravando JSON lines
+    QUANDO mensagens são logadas dentro de uma requisição e o handler é fechado
+    ENTÃO checa se todas foram gravadas no arquivo, com os dados da requisição
+    """
+    handler = queued_handler(build_file_handler(log_config(tmp_path, 'json')))
+    logger = logging.getLogger('tests.logs')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    app = Flask(__name__)
+    with app.test_request_context('/stocks/', method='POST'):
+        for index in range(100):
+            logger.info('Message %d', index)
+        logger.debug('Suppressed %s', 'message')
+    logger.removeHandler(handler)
+    handler.close()
+
+    entries = [json.loads(line) for line in (tmp_path / 'app.log').read_text(encoding='utf-8').splitlines()]
+    assert [entry['message'] for entry in entries] == [f'Message {index}' for index in range(100)]
+    assert entries[0]['method'] == 'POST'
+    assert entries[0]['path'] == '/stocks/'
+
+
+def test_queued_handler_resolves_arguments_on_emit(tmp_path):
+    """
+    DADO um argumento de log que muda depois da chamada
+    QUANDO a mensagem é gravada pela thread de fundo
+    ENTÃO checa se o texto gravado é o do momento da chamada
+    """
+    handler = queued_handler(build_file_handler(log_config(tmp_path)))
+    logger = logging.getLogger('tests.logs.args')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    values = ['antes']
+    logger.info('Value: %s', values)
+    values[0] = 'depois'
+    logger.removeHandler(handler)
+    handler.close()
+
+    assert 'INFO: Value: [\'antes\']' in (tmp_path / 'app.log').read_text(encoding='utf-8')
+
+
+def test_app_logger_uses_single_queue_handler(test_client):
+    """
+    DADO a aplicação configurada
+    QUANDO o logger da aplicação é inspecionado
+    ENTÃO checa se há um único handler em fila, mesmo com várias aplicações criadas nos testes
+    """
+    handlers = [handler for handler in test_client.application.logger.handlers if isinstance(handler, LocalQueueHandler)]
+    assert len(handlers) == 1
+    assert handlers[0].listener is not None
@@ -0,0 +1,47 @@
+"""
+Este arquivo (test_metrics.py) contém os testes unitários para as métricas das requisições
+"""
+from project.metrics import MetricsRegistry, merge_snapshots, render
+
+
+def test_registry_histogram_and_render():
+    """
+    DADO um registro de métricas com buckets de 0.1 e 1 segundo
+    QUANDO três requisições de um endpoint terminam com latências diferentes
+    ENTÃO checa se o histograma exportado é cumulativo e se status e queries são contados
+    """
+    registry = MetricsRegistry(buckets=(1.0, 0.1))
+    for duration, status in ((0.05, 200), (0.5, 200), (3.0, 500)):
+        registry.begin('stocks.list_stocks')
+        registry.end('stocks.list_stocks', 'GET', status, duration, queries=2)
+    registry.begin('users.login')
+
+    text = render(merge_snapshots([registry.snapshot()]))
+    assert 'stonks_request_duration_seconds_bucket{endpoint="stocks.list_stocks",method="GET",le="0.1"} 1' in text
+    assert 'stonks_request_duration_seconds_bucket{endpoint="stocks.list_stocks",method="GET",le="1.0"} 2' in text
+    assert 'stonks_request_duration_seconds_bucket{endpoint="stocks.list_stocks",method="GET",le="+Inf"} 3' in text
+    assert 'stonks_request_duration_seconds_count{endpoint="stocks.list_stocks",method="GET"} 3' in text
+    assert 'stonks_responses_total{endpoint="stocks.list_stocks",method="GET",status="500"} 1' in text
+    assert 'stonks_db_queries_total{endpoint="stocks.list_stocks",method="GET"} 6' in text
+    assert 'stonks_requests_in_flight{endpoint="stocks.list_stocks"} 0' in text
+    assert 'stonks_requests_in_flight{endpoint="users.login"} 1' in text
+
+
+def test_merge_snapshots_of_processes():
+    """
+    DADO os snapshots de dois processos
+    QUANDO eles são somados
+    ENTÃO checa se contadores, buckets e estatísticas dos caches são somados
+    """
+    first, second = MetricsRegistry(buckets=(0.1,)), MetricsRegistry(buckets=(0.1,))
+    for registry, duration in ((first, 0.01), (second, 0.2)):
+        registry.begin('index')
+        registry.end('index', 'GET', 200, duration, queries=0)
+    snapshots = [{**first.snapshot(), 'caches': {'quotes': {'hits': 3, 'misses': 1}}},
+                 {**second.snapshot(), 'caches': {'quotes': {'hits': 2, 'misses': 0}}}]
+
+    merged = merge_snapshots(snapshots)
+    assert merged['requests'][('index', 'GET')][0] == [1, 1]
+    assert merged['requests'][('index', 'GET')][2] == 2
+    assert merged['responses'][('index', 'GET', 200)] == 2
+    assert merged['caches']['quotes'] == {'hits': 5, 'misses': 1}
@@ -6,11 +6,12 @@ def test_new_stock(new_stock):
     """
     DADO um modelo Stock
     QUANDO um novo objeto Stock é criado
-    ENTÃO checa se os campos ticket, numero de ações e preço de compra estão definidos corretamente
+    ENTÃO checa se os campos ticket, numero de ações, preço de compra e id do usuário estão definidos corretamente
     """
     assert new_stock.stock_symbol == 'AAPL'
     assert new_stock.number_of_shares == 16
     assert new_stock.purchase_price == 40678
+    assert new_stock.user_id == 17
 
 
 def test_new_user(new_user):
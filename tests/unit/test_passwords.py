@@ -0,0 +1,49 @@
+"""
+Este arquivo (test_passwords.py) contém os testes unitários para o hash de senhas em um pool de processos
+"""
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+from project.passwords import PasswordHasher, PasswordHashingBusy
+
+
+def test_password_hasher_method_and_rehash():
+    """
+    DADO um PasswordHasher configurado com pbkdf2:sha256 e 1000 iterações
+    QUANDO uma senha é transformada em hash e conferida
+    ENTÃO checa se o hash usa os parâmetros configurados e se hashes antigos precisam ser regerados
+    """
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=0)
+    password_hash = hasher.hash('FlaskIsAwesome123')
+
+    assert password_hash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(password_hash, 'FlaskIsAwesome123')
+    assert not hasher.verify(password_hash, 'senha-errada')
+    assert not hasher.needs_rehash(password_hash)
+    assert hasher.needs_rehash(generate_password_hash('FlaskIsAwesome123', 'pbkdf2:sha256:500'))
+
+
+def test_password_hasher_process_pool():
+    """
+    DADO um PasswordHasher com um processo no pool
+    QUANDO uma senha é transformada em hash
+    ENTÃO checa se o hash calculado no outro processo é válido
+    """
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1)
+    try:
+        password_hash = hasher.hash('FlaskIsAwesome123')
+    finally:
+        hasher.shutdown()
+    assert check_password_hash(password_hash, 'FlaskIsAwesome123')
+
+
+def test_password_hasher_busy():
+    """
+    DADO um PasswordHasher sem vagas livres no pool
+    QUANDO uma senha é transformada em hash
+    ENTÃO checa se PasswordHashingBusy (503) é lançada após o timeout da fila
+    """
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, queue_size=0, queue_timeout=0.01)
+    hasher._slots.acquire()
+    with pytest.raises(PasswordHashingBusy) as error:
+        hasher.hash('FlaskIsAwesome123')
+    assert error.value.code == 503
@@ -0,0 +1,96 @@
+"""
+Este arquivo (test_queries.py) contém os testes unitários para o log de queries lentas e o detector de N+1
+"""
+import logging
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Integer, String, text
+from sqlalchemy.orm import mapped_column
+from project.queries import QueryMonitor, statement_shape
+
+
+@pytest.fixture
+def monitored_app():
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        QUERY_MONITOR_ENABLED=True,
+        SLOW_QUERY_THRESHOLD=None,
+        SLOW_QUERY_EXPLAIN=True,
+        SLOW_QUERY_LOG_PARAMETERS=True,
+        N_PLUS_ONE_THRESHOLD=5,
+    )
+    database = SQLAlchemy(app)
+
+    class Ticker(database.Model):
+        __tablename__ = 'tickers'
+        id = mapped_column(Integer(), primary_key=True)
+        symbol = mapped_column(String(), index=True)
+
+    QueryMonitor(app, database)
+
+    @app.route('/one-by-one/<int:count>')
+    def one_by_one(count):
+        # uma query por id: o padrão N+1
+        for ticker_id in range(count):
+            database.session.get(Ticker, ticker_id)
+        return 'ok'
+
+    with app.app_context():
+        database.create_all()
+        database.session.add_all([Ticker(symbol=f'SYM{index}') for index in range(10)])
+        database.session.commit()
+    app.database = database
+    return app
+
+
+def test_statement_shape():
+    """
+    DADO statements que diferem apenas nos valores
+    QUANDO eles são normalizados
+    ENTÃO checa se têm o mesmo formato
+    """
+    assert statement_shape('SELECT * FROM stocks\n WHERE id IN (?, ?, ?) LIMIT 50') == \
+        statement_shape('SELECT * FROM stocks WHERE id IN (?, ?) LIMIT 10')
+    assert statement_shape('SELECT anon_1.id FROM t AS anon_1') == 'SELECT anon_1.id FROM t AS anon_1'
+
+
+def test_n_plus_one_logged(monitored_app, caplog):
+    """
+    DADO uma aplicação com N_PLUS_ONE_THRESHOLD = 5
+    QUANDO uma requisição faz uma query por item para 3 e para 8 itens
+    ENTÃO checa se só a requisição com 8 repetições é logada
+    """
+    client = monitored_app.test_client()
+    with caplog.at_level(logging.WARNING, logger='project.queries'):
+        assert client.get('/one-by-one/3').status_code == 200
+        assert not caplog.records
+        assert client.get('/one-by-one/8').status_code == 200
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert 'Possível N+1 em GET /one-by-one/8' in message
+    assert 'executado 8 vezes' in message
+    assert 'FROM tickers' in message
+
+
+def test_slow_query_logged_with_plan(monitored_app, caplog):
+    """
+    DADO uma aplicação com limite de query lenta igual a zero
+    QUANDO uma query é executada
+    ENTÃO checa se ela é logada com os parâmetros e o plano de execução
+    """
+    monitor = monitored_app.extensions['query_monitor']
+    monitor.threshold = 0
+    with monitored_app.app_context(), caplog.at_level(logging.WARNING, logger='project.queries'):
+        rows = monitored_app.database.session.execute(
+            text('SELECT id FROM tickers WHERE symbol = :symbol'), {'symbol': 'SYM3'}).all()
+
+    # o EXPLAIN não consome o resultado da query original
+    assert len(rows) == 1
+    assert monitor.slow_queries == 1
+    message = caplog.records[0].getMessage()
+    assert 'Query lenta' in message
+    assert "'SYM3'" in message
+    assert 'ix_tickers_symbol' in message
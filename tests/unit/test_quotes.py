@@ -0,0 +1,261 @@
+"""
+Este arquivo (test_quotes.py) contém os testes unitários para o cache de cotações
+"""
+import threading
+import time
+import pytest
+from project.quotes import FileQuoteProvider, QuoteCache, QuoteProvider, SimulatedQuoteProvider
+
+
+class CountingProvider(QuoteProvider):
+    """Provider que conta as consultas e demora `delay` segundos para responder"""
+
+    def __init__(self, delay=0):
+        self.calls = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def get_quote(self, symbol, timeout=None):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return 3620
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_quote_cache_hit_and_ttl():
+    """
+    DADO um cache de cotações com TTL de 60 segundos
+    QUANDO o mesmo ticket é pedido antes e depois do TTL expirar
+    ENTÃO checa se o provider só é consultado novamente depois da expiração
+    """
+    provider = CountingProvider()
+    clock = FakeClock()
+    cache = QuoteCache(provider, ttl=60, clock=clock)
+
+    assert cache.get('petr4') == 3620
+    assert cache.get('PETR4') == 3620
+    assert provider.calls == 1
+
+    clock.now = 61
+    assert cache.get('PETR4') == 3620
+    assert provider.calls == 2
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_quote_cache_lru_eviction():
+    """
+    DADO um cache de cotações com no máximo 2 entradas
+    QUANDO um terceiro ticket é adicionado
+    ENTÃO checa se o ticket usado há mais tempo é descartado
+    """
+    provider = CountingProvider()
+    cache = QuoteCache(provider, maxsize=2)
+
+    cache.get('PETR4')
+    cache.get('VALE3')
+    cache.get('PETR4')  # PETR4 passa a ser o mais recente
+    cache.get('ITUB4')  # descarta VALE3
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size'] == 2
+
+    calls = provider.calls
+    cache.get('PETR4')
+    assert provider.calls == calls
+    cache.get('VALE3')
+    assert provider.calls == calls + 1
+
+
+def test_quote_cache_coalesces_concurrent_requests():
+    """
+    DADO um cache de cotações na frente de um provider lento
+    QUANDO 50 threads pedem o mesmo ticket ao mesmo tempo
+    ENTÃO checa se apenas uma consulta chega ao provider
+    """
+    provider = CountingProvider(delay=0.2)
+    cache = QuoteCache(provider)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get('PETR4'))) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [3620] * 50
+    assert provider.calls == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['coalesced'] + cache.stats()['hits'] == 49
+
+
+def test_quote_cache_does_not_store_errors():
+    """
+    DADO um provider que falha
+    QUANDO um ticket é pedido duas vezes
+    ENTÃO checa se o erro é propagado e o provider é consultado nas duas vezes
+    """
+    class FailingProvider(QuoteProvider):
+        calls = 0
+
+        def get_quote(self, symbol, timeout=None):
+            self.calls += 1
+            raise ConnectionError('fonte indisponível')
+
+    provider = FailingProvider()
+    cache = QuoteCache(provider)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            cache.get('PETR4')
+    assert provider.calls == 2
+
+
+def test_file_quote_provider(tmp_path):
+    """
+    DADO um arquivo CSV de cotações
+    QUANDO o FileQuoteProvider é consultado
+    ENTÃO checa se os preços são convertidos para inteiros (x100) e tickets desconhecidos retornam None
+    """
+    quotes_file = tmp_path / 'quotes.csv'
+    quotes_file.write_text('symbol,price\npetr4,36.20\nVALE3,60\n')
+    provider = FileQuoteProvider(str(quotes_file))
+    assert provider.get_quote('PETR4') == 3620
+    assert provider.get_quote('vale3') == 6000
+    assert provider.get_quote('ITUB4') is None
+    assert FileQuoteProvider(str(tmp_path / 'missing.json')).get_quote('PETR4') is None
+
+
+def test_quote_cache_get_many_concurrent():
+    """
+    DADO um cache de cotações na frente de um provider com latência de 100ms
+    QUANDO 20 tickets distintos (com repetições) são pedidos com get_many
+    ENTÃO checa se cada ticket é consultado uma vez e as consultas ocorrem em paralelo
+    """
+    provider = CountingProvider(delay=0.1)
+    cache = QuoteCache(provider, max_workers=20)
+    symbols = [f'S{i}' for i in range(20)] * 3
+
+    start = time.perf_counter()
+    prices = cache.get_many(symbols)
+    elapsed = time.perf_counter() - start
+
+    assert prices == {f'S{i}': 3620 for i in range(20)}
+    assert provider.calls == 20
+    assert elapsed < 1.0
+
+
+def test_quote_cache_get_many_partial_failure():
+    """
+    DADO um provider que falha para um ticket e demora demais para outro
+    QUANDO os preços de um portifólio são pedidos com get_many
+    ENTÃO checa se os tickets com problema ficam com preço None e os demais são retornados
+    """
+    class FlakyProvider(QuoteProvider):
+        def get_quote(self, symbol, timeout=None):
+            if symbol == 'FAIL':
+                raise ConnectionError('fonte indisponível')
+            if symbol == 'SLOW':
+                time.sleep(0.5)
+            return 100
+
+    cache = QuoteCache(FlakyProvider(), fetch_timeout=0.2)
+    prices = cache.get_many(['PETR4', 'FAIL', 'SLOW', 'vale3'])
+    assert prices == {'PETR4': 100, 'FAIL': None, 'SLOW': None, 'VALE3': 100}
+
+
+def test_quote_cache_get_many_timeout_cancels_queued_fetches():
+    """
+    DADO um provider lento e um pool de 4 threads
+    QUANDO um lote de 40 tickets estoura o timeout e um lote pequeno é pedido em seguida
+    ENTÃO checa se as buscas que ficaram na fila são canceladas e o lote pequeno é precificado
+    """
+    provider = CountingProvider(delay=0.2)
+    cache = QuoteCache(provider, max_workers=4)
+    prices = cache.get_many([f'S{i}' for i in range(40)], timeout=0.3)
+    assert None in prices.values()
+
+    assert cache.get_many(['ZZZ'], timeout=0.5) == {'ZZZ': 3620}
+    # só as buscas já em andamento no primeiro lote chegaram ao provider
+    assert provider.calls < 20
+
+
+class BlockingProvider(QuoteProvider):
+    """Provider que trava no ticket STUCK até `release` ser sinalizado"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def get_quote(self, symbol, timeout=None):
+        self.calls.append(symbol)
+        if symbol == 'STUCK' and not self.release.wait(timeout):
+            raise TimeoutError(symbol)
+        return 100
+
+
+def test_quote_cache_stuck_symbol_does_not_exhaust_pool():
+    """
+    DADO um provider que trava em um ticket e um pool de 4 threads
+    QUANDO mais de 4 portifólios com esse ticket são precificados em sequência
+    ENTÃO checa se o ticket travado fica sem preço e os demais continuam sendo precificados
+    """
+    provider = BlockingProvider()
+    cache = QuoteCache(provider, max_workers=4, fetch_timeout=0.1)
+    try:
+        for index in range(8):
+            prices = cache.get_many(['STUCK', f'FINE{index}'])
+            assert prices == {'STUCK': None, f'FINE{index}': 100}
+    finally:
+        provider.release.set()
+
+
+def test_quote_cache_abandons_call_past_deadline():
+    """
+    DADO um provider cuja primeira busca trava e ignora o timeout
+    QUANDO o ticket é pedido durante e depois do prazo dessa busca
+    ENTÃO checa se quem espera desiste no prazo e o pedido seguinte tenta de novo em vez de esperar
+    """
+    class HangingOnceProvider(BlockingProvider):
+        def get_quote(self, symbol, timeout=None):
+            self.calls.append(symbol)
+            if len(self.calls) == 1:
+                self.release.wait()
+            return 100
+
+    provider = HangingOnceProvider()
+    cache = QuoteCache(provider, fetch_timeout=0.1)
+    leader = threading.Thread(target=cache.get, args=('STUCK',))
+    try:
+        leader.start()
+        while not provider.calls:
+            time.sleep(0.01)
+        start = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            cache.get('STUCK')
+        assert time.perf_counter() - start < 0.5
+        assert provider.calls == ['STUCK']
+
+        # passado o prazo, a busca travada não é mais compartilhada
+        assert cache.get('STUCK') == 100
+        assert provider.calls == ['STUCK', 'STUCK']
+    finally:
+        provider.release.set()
+        leader.join()
+
+
+def test_simulated_quote_provider_is_deterministic():
+    """
+    DADO o provider de cotações simulado
+    QUANDO o mesmo ticket é consultado duas vezes
+    ENTÃO checa se o mesmo preço é retornado
+    """
+    provider = SimulatedQuoteProvider(latency=0)
+    assert provider.get_quote('PETR4') == provider.get_quote('petr4')
+    assert provider.get_quote('PETR4') >= 1000
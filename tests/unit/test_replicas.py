@@ -0,0 +1,172 @@
+"""
+Este arquivo (test_replicas.py) contém os testes unitários para o roteamento de leituras para réplicas
+"""
+import sqlite3
+import time
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Integer, String, insert, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import mapped_column
+from config import TestingConfig
+from project import create_app, database
+from project.models import Quote
+from project.replicas import STICKY_KEY, ReadReplicas, RoutingSession, reading
+
+
+def create_replicated_app(primary_uri, replica_uri):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=primary_uri,
+        SQLALCHEMY_REPLICA_URIS=[replica_uri],
+        REPLICA_STICKY_SECONDS=5,
+    )
+    database = SQLAlchemy(session_options={'class_': RoutingSession})
+
+    class Ticker(database.Model):
+        __tablename__ = 'tickers'
+        id = mapped_column(Integer(), primary_key=True)
+        symbol = mapped_column(String())
+
+    ReadReplicas(app, database)
+    database.init_app(app)
+
+    @app.route('/symbols')
+    def symbols():
+        with reading(database.session) as session:
+            return ','.join(session.execute(database.select(Ticker.symbol).order_by(Ticker.id)).scalars())
+
+    @app.route('/symbols', methods=['POST'])
+    def add_symbol():
+        database.session.add(Ticker(symbol='NEW'))
+        database.session.commit()
+        return 'ok'
+
+    with app.app_context():
+        database.create_all()
+        database.session.add(Ticker(symbol='PRIMARY'))
+        database.session.commit()
+    app.database, app.Ticker = database, Ticker
+    return app
+
+
+@pytest.fixture
+def two_files_app(tmp_path):
+    # réplica em outro arquivo, com dados diferentes: mostra de onde veio cada leitura
+    app = create_replicated_app(f"sqlite:///{tmp_path / 'primary.db'}", f"sqlite:///{tmp_path / 'replica.db'}")
+    with app.app_context():
+        replica = app.database.engines['replica0']
+        app.database.metadata.create_all(replica)
+        with replica.begin() as connection:
+            connection.execute(insert(app.Ticker), [{'symbol': 'REPLICA'}])
+    return app
+
+
+def test_reads_routed_to_replica(two_files_app):
+    """
+    DADO uma aplicação com um banco principal e uma réplica
+    QUANDO SELECTs são executados dentro e fora de `reading` e depois de uma escrita
+    ENTÃO checa se só os de dentro vão à réplica até a sessão escrever
+    """
+    database, Ticker = two_files_app.database, two_files_app.Ticker
+    query = database.select(Ticker.symbol)
+    with two_files_app.app_context():
+        assert database.session.execute(query).scalars().all() == ['PRIMARY']
+        with reading(database.session) as session:
+            assert session.execute(query).scalars().all() == ['REPLICA']
+            # a escrita vai ao principal e a sessão passa a ler dele
+            session.add(Ticker(symbol='NEW'))
+            session.flush()
+            assert session.execute(query.order_by(Ticker.id)).scalars().all() == ['PRIMARY', 'NEW']
+        database.session.rollback()
+
+    with two_files_app.app_context():
+        with reading(database.session) as session:
+            assert session.execute(query).scalars().all() == ['REPLICA']
+
+
+def test_read_your_writes_after_commit(two_files_app):
+    """
+    DADO uma aplicação com réplica e REPLICA_STICKY_SECONDS = 5
+    QUANDO um cliente grava e depois lê, antes e depois do intervalo
+    ENTÃO checa se ele lê do principal logo após a escrita e volta à réplica depois
+    """
+    client = two_files_app.test_client()
+    assert client.get('/symbols').text == 'REPLICA'
+
+    assert client.post('/symbols').text == 'ok'
+    assert client.get('/symbols').text == 'PRIMARY,NEW'
+    # outro cliente, sem escritas, continua lendo da réplica
+    assert two_files_app.test_client().get('/symbols').text == 'REPLICA'
+
+    # passado o intervalo, o cliente volta para a réplica
+    with client.session_transaction() as session:
+        assert session[STICKY_KEY] > time.time() + 4
+        session[STICKY_KEY] = time.time() - 1
+    assert client.get('/symbols').text == 'REPLICA'
+
+
+def test_read_only_connection_to_same_file(tmp_path):
+    """
+    DADO uma réplica que é uma conexão somente leitura ao arquivo do banco principal
+    QUANDO a aplicação lê e grava dentro de `reading`
+    ENTÃO checa se as leituras enxergam os commits e as escritas nunca usam a réplica
+    """
+    path = tmp_path / 'app.db'
+    app = create_replicated_app(f'sqlite:///{path}', f'sqlite:///file:{path}?mode=ro&uri=true')
+    database, Ticker = app.database, app.Ticker
+    with app.app_context():
+        with reading(database.session) as session:
+            assert session.execute(database.select(Ticker.symbol)).scalars().all() == ['PRIMARY']
+            assert session.get_bind(clause=database.select(Ticker)) is database.engines['replica0']
+            session.add(Ticker(symbol='NEW'))
+            session.commit()
+
+        with pytest.raises(OperationalError, match='readonly'):
+            with database.engines['replica0'].begin() as connection:
+                connection.execute(insert(Ticker), [{'symbol': 'FAIL'}])
+
+    with app.app_context():
+        with reading(database.session) as session:
+            assert session.execute(database.select(Ticker.symbol)).scalars().all() == ['PRIMARY', 'NEW']
+
+
+class ReadOnlyReplicaConfig(TestingConfig):
+    # URIs definidas em cada teste (tmp_path)
+    SQLALCHEMY_DATABASE_URI = None
+    SQLALCHEMY_REPLICA_URIS = []
+
+
+def test_project_app_with_read_only_replica(tmp_path, monkeypatch):
+    """
+    DADO a aplicação do projeto (create_app, com as PRAGMAs do SQLite) e uma réplica
+        somente leitura apontando para um arquivo que ainda não está em modo WAL
+    QUANDO uma leitura é feita dentro de `reading` e depois uma escrita no principal
+    ENTÃO checa se a leitura usa a réplica sem tentar alterar o arquivo e a escrita usa WAL
+    """
+    path = tmp_path / 'app.db'
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('CREATE TABLE quotes (stock_symbol VARCHAR PRIMARY KEY, price INTEGER, updated_on DATETIME)')
+        connection.execute("INSERT INTO quotes (stock_symbol, price) VALUES ('PETR4', 3620)")
+    connection.close()
+    monkeypatch.setattr(ReadOnlyReplicaConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{path}')
+    monkeypatch.setattr(ReadOnlyReplicaConfig, 'SQLALCHEMY_REPLICA_URIS', [f'sqlite:///file:{path}?mode=ro&uri=true'])
+    monkeypatch.setenv('CONFIG_TYPE', f'{__name__}.ReadOnlyReplicaConfig')
+    app = create_app()
+    query = select(Quote.stock_symbol).order_by(Quote.stock_symbol)
+
+    with app.app_context():
+        with reading(database.session) as session:
+            assert session.get_bind(clause=query) is database.engines['replica0']
+            assert session.execute(query).scalars().all() == ['PETR4']
+        database.session.add(Quote(stock_symbol='VALE3', price=6800))
+        database.session.commit()
+        with database.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+
+    with app.app_context():
+        with reading(database.session) as session:
+            assert session.execute(query).scalars().all() == ['PETR4', 'VALE3']
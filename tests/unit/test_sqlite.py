@@ -0,0 +1,62 @@
+"""
+Este arquivo (test_sqlite.py) contém os testes unitários para as PRAGMAs das conexões SQLite
+"""
+import sqlite3
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from project.sqlite import SQLitePragmas
+
+
+def test_pragmas_applied_to_new_connections(tmp_path):
+    """
+    DADO uma aplicação com SQLITE_PRAGMAS configuradas e um banco em arquivo
+    QUANDO conexões do pool são abertas
+    ENTÃO checa se cada uma usa WAL, synchronous NORMAL, busy_timeout e cache_size configurados
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}",
+        SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 2, 'max_overflow': 0},
+        # a ordem do dict não importa: journal_mode é aplicado primeiro
+        SQLITE_PRAGMAS={'synchronous': 'NORMAL', 'busy_timeout': 1234, 'cache_size': -2048, 'journal_mode': 'WAL'},
+    )
+    database = SQLAlchemy(app)
+    SQLitePragmas(app, database)
+
+    with app.app_context():
+        engine = database.engine
+        with engine.connect() as first, engine.connect() as second:
+            for connection in (first, second):
+                assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+                # 1 = NORMAL
+                assert connection.execute(text('PRAGMA synchronous')).scalar() == 1
+                assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 1234
+                assert connection.execute(text('PRAGMA cache_size')).scalar() == -2048
+        assert engine.pool.size() == 2
+
+
+def test_write_pragmas_skipped_on_read_only_connections(tmp_path):
+    """
+    DADO um banco em arquivo fora do modo WAL e um bind somente leitura (mode=ro) para ele
+    QUANDO uma conexão somente leitura é aberta
+    ENTÃO checa se ela recebe apenas as PRAGMAs de leitura e o arquivo continua sem WAL
+    """
+    path = tmp_path / 'app.db'
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}',
+        SQLALCHEMY_BINDS={'reports': f'sqlite:///file:{path}?mode=ro&uri=true'},
+        SQLITE_PRAGMAS={'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 1234},
+    )
+    database = SQLAlchemy(app)
+    SQLitePragmas(app, database)
+
+    with app.app_context():
+        # o arquivo precisa existir para a conexão somente leitura
+        with sqlite3.connect(path) as connection:
+            connection.execute('CREATE TABLE tickers (symbol TEXT)')
+        connection.close()
+        with database.engines['reports'].connect() as connection:
+            assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 1234
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'delete'
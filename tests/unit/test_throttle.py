@@ -0,0 +1,108 @@
+"""
+Este arquivo (test_throttle.py) contém os testes unitários para o limite de tentativas de login
+"""
+import pytest
+from project.throttle import MemoryBucketStore, RateLimiter, SQLiteBucketStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / 'throttle.db'))
+
+
+def test_rate_limiter_token_bucket(store):
+    """
+    DADO um limitador de 5 tentativas a cada 60 segundos
+    QUANDO uma chave faz 6 tentativas seguidas e depois espera 12 segundos
+    ENTÃO checa se a sexta é rejeitada com o tempo de espera e se uma ficha é reposta
+    """
+    clock = FakeClock()
+    limiter = RateLimiter(store, attempts=5, period=60, clock=clock)
+
+    assert [limiter.hit('email:vitor@email.com') for _ in range(5)] == [0] * 5
+    assert limiter.hit('email:vitor@email.com') == pytest.approx(12)
+    # outras chaves têm o próprio balde
+    assert limiter.hit('email:outro@email.com') == 0
+
+    clock.now += 12
+    assert limiter.hit('email:vitor@email.com') == 0
+    assert limiter.hit('email:vitor@email.com') > 0
+    assert limiter.stats() == {'allowed': 7, 'rejected': 2}
+
+
+def test_sqlite_bucket_store_shared(tmp_path):
+    """
+    DADOS dois limitadores (como em dois processos) usando o mesmo arquivo SQLite
+    QUANDO as tentativas são divididas entre eles
+    ENTÃO checa se o limite vale para a soma das tentativas
+    """
+    clock = FakeClock()
+    path = str(tmp_path / 'throttle.db')
+    first = RateLimiter(SQLiteBucketStore(path), attempts=3, period=60, clock=clock)
+    second = RateLimiter(SQLiteBucketStore(path), attempts=3, period=60, clock=clock)
+
+    assert first.hit('ip:10.0.0.1') == 0
+    assert second.hit('ip:10.0.0.1') == 0
+    assert first.hit('ip:10.0.0.1') == 0
+    assert second.hit('ip:10.0.0.1') > 0
+
+
+def test_sqlite_bucket_store_limiters_with_different_periods(tmp_path):
+    """
+    DADOS um limitador por IP de 60 segundos e um por email de 600 segundos no mesmo arquivo SQLite
+    QUANDO o email esgota as fichas e, 100 segundos depois, um IP faz uma tentativa
+    ENTÃO checa se o balde do email, ainda não reabastecido, continua bloqueando
+    """
+    clock = FakeClock()
+    store = SQLiteBucketStore(str(tmp_path / 'throttle.db'), cleanup_interval=0)
+    ip_limiter = RateLimiter(store, attempts=30, period=60, clock=clock)
+    email_limiter = RateLimiter(store, attempts=2, period=600, clock=clock)
+
+    assert [email_limiter.hit('email:vitor@email.com') for _ in range(2)] == [0, 0]
+    clock.now += 100
+    assert ip_limiter.hit('ip:10.0.0.1') == 0
+    assert email_limiter.hit('email:vitor@email.com') == pytest.approx(200)
+
+
+def test_sqlite_bucket_store_cleanup(tmp_path):
+    """
+    DADO um armazenamento SQLite com baldes cheios de novo e baldes ainda reabastecendo
+    QUANDO a limpeza é executada
+    ENTÃO checa se só os baldes vencidos são removidos, usando o índice de expiração
+    """
+    clock = FakeClock()
+    store = SQLiteBucketStore(str(tmp_path / 'throttle.db'), cleanup_interval=3600)
+    limiter = RateLimiter(store, attempts=2, period=60, clock=clock)
+    limiter.hit('ip:10.0.0.1')
+    clock.now += 20
+    limiter.hit('ip:10.0.0.2')
+
+    # 30s é o tempo para a primeira repor a ficha; a segunda ainda não está cheia
+    assert store.cleanup(clock.now + 20) == 1
+    plan = store._connection().execute('EXPLAIN QUERY PLAN DELETE FROM buckets WHERE expires < 0').fetchall()
+    assert 'ix_buckets_expires' in str(plan)
+
+
+def test_memory_bucket_store_max_keys():
+    """
+    DADO um armazenamento em memória com no máximo 2 chaves
+    QUANDO uma terceira chave é usada
+    ENTÃO checa se a chave usada há mais tempo é descartada (volta com o balde cheio)
+    """
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryBucketStore(max_keys=2), attempts=1, period=60, clock=clock)
+    assert limiter.hit('a') == 0
+    assert limiter.hit('b') == 0
+    assert limiter.hit('c') == 0
+    assert limiter.hit('a') == 0
+    assert limiter.hit('c') > 0